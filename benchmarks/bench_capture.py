@@ -0,0 +1,81 @@
+"""Compare the seleniumwire and CDP browser capture backends on local session pages.
+
+Usage::
+
+    python benchmarks/bench_capture.py --pages 20 --backends seleniumwire cdp
+
+Requires Chrome and chromedriver. Pages are resolved with ``http_first``
+disabled so every page goes through the browser. Prints one JSON document
+with per-page latency (mean/p50/p95), peak RSS and peak open file
+descriptors of this process tree for each backend.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fixtures import PLAYER_MARKUP, generate_hls_stream, serve_directory, write_session_page  # noqa: E402
+from measure import ResourceSampler, latency_summary  # noqa: E402
+
+from download_m3u8.capture import CAPTURE_BACKENDS  # noqa: E402
+from download_m3u8.collector import get_m3u8_url  # noqa: E402
+from download_m3u8.driver_pool import DriverPool  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark seleniumwire vs CDP m3u8 capture")
+    parser.add_argument("--pages", type=int, default=20, help="Session pages to resolve per backend")
+    parser.add_argument("--delay-ms", type=int, default=200, help="Delay before the page requests its m3u8")
+    parser.add_argument("--backends", nargs="+", default=list(CAPTURE_BACKENDS), choices=CAPTURE_BACKENDS)
+    parser.add_argument("--headful", action="store_true", help="Run Chrome with a visible window")
+    args = parser.parse_args()
+
+    players = list(PLAYER_MARKUP)
+    with tempfile.TemporaryDirectory(prefix="bench-capture-") as workdir:
+        root = Path(workdir)
+        generate_hls_stream(root, "stream", duration=8, segment_seconds=4)
+        results = {}
+        with serve_directory(root) as base_url:
+            pages = [
+                write_session_page(
+                    root / "sessions",
+                    f"session{index}",
+                    f"{base_url}/stream/master.m3u8?session={index}",
+                    player=players[index % len(players)],
+                    delay_ms=args.delay_ms,
+                )
+                for index in range(args.pages)
+            ]
+
+            for backend in args.backends:
+                latencies: List[float] = []
+                resolved = 0
+                started = time.perf_counter()
+                with ResourceSampler() as sampler:
+                    with DriverPool(size=1, headless=not args.headful, max_pages=0, capture=backend) as pool:
+                        for page in pages:
+                            page_started = time.perf_counter()
+                            m3u8_url = get_m3u8_url(f"{base_url}/sessions/{page.name}", pool=pool, http_first=False)
+                            latencies.append(time.perf_counter() - page_started)
+                            resolved += bool(m3u8_url)
+                results[backend] = {
+                    "wall_seconds": round(time.perf_counter() - started, 3),
+                    "resolved": resolved,
+                    "pages": len(pages),
+                    "latency": latency_summary(latencies),
+                    **sampler.as_dict(),
+                }
+
+    print(json.dumps({"benchmark": "capture_backends", "params": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
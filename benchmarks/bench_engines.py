@@ -0,0 +1,74 @@
+"""Compare the ffmpeg and native download engines against a local, throttled HLS server.
+
+Usage::
+
+    python benchmarks/bench_engines.py --streams 4 --duration 300 --bandwidth 2000000
+
+Prints one JSON document with wall time and throughput per engine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fixtures import generate_hls_stream, serve_directory  # noqa: E402
+
+from download_m3u8.downloader import ENGINES, download_from_csv  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ffmpeg vs native HLS download engines")
+    parser.add_argument("--streams", type=int, default=4, help="Number of generated streams")
+    parser.add_argument("--duration", type=float, default=300.0, help="Seconds of audio per stream")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server latency per request (s)")
+    parser.add_argument("--bandwidth", type=int, default=2_000_000, help="Per-connection bytes/sec (0 = unlimited)")
+    parser.add_argument("--threads", type=int, default=2, help="download_from_csv max_threads")
+    parser.add_argument("--segment-concurrency", type=int, default=8, help="Native engine segments in flight")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-engines-") as workdir:
+        root = Path(workdir)
+        media_root = root / "media"
+        masters = [
+            generate_hls_stream(media_root, f"stream{index}", duration=args.duration) for index in range(args.streams)
+        ]
+        results = {}
+        with serve_directory(media_root, latency=args.latency, bytes_per_second=args.bandwidth) as base_url:
+            csv_path = root / "tasks.csv"
+            lines = ["file,m3u8"]
+            lines += [f"{master.parent.name},{base_url}/{master.parent.name}/master.m3u8" for master in masters]
+            csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+            for engine in args.engines:
+                output_dir = root / f"out-{engine}"
+                started = time.perf_counter()
+                stats = download_from_csv(
+                    str(csv_path),
+                    max_threads=args.threads,
+                    output_dir=str(output_dir),
+                    engine=engine,
+                    segment_concurrency=args.segment_concurrency,
+                )
+                elapsed = time.perf_counter() - started
+                total_bytes = sum(path.stat().st_size for path in output_dir.glob("*.aac"))
+                results[engine] = {
+                    "wall_seconds": round(elapsed, 3),
+                    "successful": stats.successful,
+                    "failed": stats.failed,
+                    "output_bytes": total_bytes,
+                    "throughput_bytes_per_second": round(total_bytes / elapsed, 1) if elapsed else None,
+                }
+
+    print(json.dumps({"benchmark": "download_engines", "params": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
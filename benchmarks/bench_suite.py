@@ -0,0 +1,223 @@
+"""End-to-end benchmark suite over local session pages and generated HLS streams.
+
+Usage::
+
+    python benchmarks/bench_suite.py --pages 50 --streams 4 --duration 120 --output results.json
+
+Runs ``get_m3u8_url``, ``process_csv``, ``download_aac_from_m3u8`` and
+``download_from_csv`` against a local HTTP server (configurable latency,
+per-connection bandwidth and shared uplink) and reports throughput, p50/p95
+latency, peak RSS and peak open file descriptors of the process tree for each. Session pages embed their
+stream the way JW Player, video.js and plain ``<video>`` pages do, so they
+resolve over HTTP without a browser. The JSON document includes the git
+commit so runs can be compared across commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fixtures import PLAYER_MARKUP, generate_hls_stream, serve_directory, write_session_page  # noqa: E402
+from measure import ResourceSampler, latency_summary  # noqa: E402
+
+from download_m3u8.collector import get_m3u8_url  # noqa: E402
+from download_m3u8.downloader import ENGINES, download_aac_from_m3u8, download_from_csv  # noqa: E402
+from download_m3u8.httpclient import HttpClient  # noqa: E402
+from download_m3u8.tasks import process_csv  # noqa: E402
+
+BENCHMARKS = ("get_m3u8_url", "process_csv", "download_aac_from_m3u8", "download_from_csv")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextlib.contextmanager
+def _quiet(enabled: bool):
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _timed(calls: List[Callable[[], Any]]) -> List[float]:
+    latencies = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark m3u8 resolution and download end to end")
+    parser.add_argument("--pages", type=int, default=50, help="Synthetic session pages")
+    parser.add_argument("--streams", type=int, default=4, help="Generated HLS streams")
+    parser.add_argument("--duration", type=float, default=120.0, help="Seconds of audio per stream")
+    parser.add_argument("--segment-seconds", type=float, default=4.0, help="HLS segment length")
+    parser.add_argument("--bitrate", default="128k", help="AAC bitrate of generated streams (sets segment size)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Server latency per request (s)")
+    parser.add_argument("--bandwidth", type=int, default=0, help="Per-connection bytes/sec (0 = unlimited)")
+    parser.add_argument("--uplink", type=int, default=0, help="Bytes/sec shared by all connections (0 = unlimited)")
+    parser.add_argument("--workers", type=int, default=4, help="process_csv max_workers")
+    parser.add_argument("--threads", type=int, default=4, help="download_from_csv max_threads")
+    parser.add_argument("--engine", default="native", choices=ENGINES)
+    parser.add_argument("--adaptive", action="store_true", help="download_from_csv with adaptive concurrency")
+    parser.add_argument("--only", nargs="+", default=list(BENCHMARKS), choices=BENCHMARKS)
+    parser.add_argument("--output", type=Path, help="Also write the JSON document to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the library's progress output")
+    args = parser.parse_args()
+
+    players = list(PLAYER_MARKUP)
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-suite-") as workdir:
+        root = Path(workdir)
+        streams = [
+            generate_hls_stream(
+                root / "media",
+                f"stream{index}",
+                duration=args.duration,
+                segment_seconds=args.segment_seconds,
+                bitrate=args.bitrate,
+            )
+            for index in range(args.streams)
+        ]
+        with serve_directory(
+            root / "media", latency=args.latency, bytes_per_second=args.bandwidth, total_bytes_per_second=args.uplink
+        ) as base_url:
+            master_urls = [f"{base_url}/{master.parent.name}/master.m3u8" for master in streams]
+            pages = [
+                write_session_page(
+                    root / "media" / "sessions",
+                    f"session{index}",
+                    master_urls[index % len(master_urls)],
+                    player=players[index % len(players)],
+                    discoverable=True,
+                )
+                for index in range(args.pages)
+            ]
+            page_urls = [f"{base_url}/sessions/{page.name}" for page in pages]
+
+            with _quiet(not args.verbose):
+                if "get_m3u8_url" in args.only:
+                    client = HttpClient()
+                    with ResourceSampler() as sampler:
+                        started = time.perf_counter()
+                        latencies = _timed(
+                            [lambda url=url: get_m3u8_url(url, http_client=client) for url in page_urls]
+                        )
+                        elapsed = time.perf_counter() - started
+                    client.close()
+                    results["get_m3u8_url"] = {
+                        "wall_seconds": round(elapsed, 3),
+                        "pages_per_second": round(len(page_urls) / elapsed, 2),
+                        "latency": latency_summary(latencies),
+                        **sampler.as_dict(),
+                    }
+
+                if "process_csv" in args.only:
+                    csv_path = root / "sessions.csv"
+                    lines = ["file,url"] + [f"{page.stem},{url}" for page, url in zip(pages, page_urls)]
+                    csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                    with ResourceSampler() as sampler:
+                        started = time.perf_counter()
+                        process_csv(
+                            str(csv_path),
+                            max_workers=args.workers,
+                            output_file=str(root / "resolved.csv"),
+                            use_cache=False,
+                        )
+                        elapsed = time.perf_counter() - started
+                    results["process_csv"] = {
+                        "wall_seconds": round(elapsed, 3),
+                        "rows_per_second": round(len(page_urls) / elapsed, 2),
+                        **sampler.as_dict(),
+                    }
+
+                if "download_aac_from_m3u8" in args.only:
+                    output_dir = root / "out-single"
+                    with ResourceSampler() as sampler:
+                        started = time.perf_counter()
+                        latencies = _timed(
+                            [
+                                lambda url=url, index=index: download_aac_from_m3u8(
+                                    url, f"stream{index}", output_dir=str(output_dir), engine=args.engine
+                                )
+                                for index, url in enumerate(master_urls)
+                            ]
+                        )
+                        elapsed = time.perf_counter() - started
+                    total_bytes = sum(path.stat().st_size for path in output_dir.glob("*.aac"))
+                    results["download_aac_from_m3u8"] = {
+                        "wall_seconds": round(elapsed, 3),
+                        "output_bytes": total_bytes,
+                        "throughput_bytes_per_second": round(total_bytes / elapsed, 1),
+                        "latency": latency_summary(latencies),
+                        **sampler.as_dict(),
+                    }
+
+                if "download_from_csv" in args.only:
+                    csv_path = root / "streams.csv"
+                    lines = ["file,m3u8"] + [f"stream{index},{url}" for index, url in enumerate(master_urls)]
+                    csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                    output_dir = root / "out-batch"
+                    with ResourceSampler() as sampler:
+                        started = time.perf_counter()
+                        stats = download_from_csv(
+                            str(csv_path),
+                            max_threads=args.threads,
+                            output_dir=str(output_dir),
+                            engine=args.engine,
+                            adaptive=args.adaptive,
+                        )
+                        elapsed = time.perf_counter() - started
+                    total_bytes = sum(path.stat().st_size for path in output_dir.glob("*.aac"))
+                    results["download_from_csv"] = {
+                        "wall_seconds": round(elapsed, 3),
+                        "successful": stats.successful,
+                        "failed": stats.failed,
+                        "output_bytes": total_bytes,
+                        "throughput_bytes_per_second": round(total_bytes / elapsed, 1),
+                        **sampler.as_dict(),
+                    }
+
+    params = {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+    document = {
+        "benchmark": "suite",
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
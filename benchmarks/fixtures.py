@@ -0,0 +1,189 @@
+"""Local fixtures for benchmarks: generated HLS streams served over a throttled HTTP server."""
+
+from __future__ import annotations
+
+import base64
+import contextlib
+import functools
+import os
+import subprocess
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+def generate_hls_stream(
+    directory: Path,
+    name: str,
+    *,
+    duration: float = 120.0,
+    segment_seconds: float = 4.0,
+    bitrate: str = "128k",
+    sample_rate: int = 44100,
+    channels: int = 1,
+    codec: str = "aac",
+) -> Path:
+    """Encode a sine-wave stream (AAC unless ``codec`` says otherwise) into TS segments plus playlists."""
+    stream_dir = directory / name
+    stream_dir.mkdir(parents=True, exist_ok=True)
+    media_playlist = stream_dir / "audio.m3u8"
+    if not media_playlist.exists():
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                f"sine=frequency=440:duration={duration}",
+                "-ar",
+                str(sample_rate),
+                "-ac",
+                str(channels),
+                "-c:a",
+                codec,
+                "-b:a",
+                bitrate,
+                "-f",
+                "hls",
+                "-hls_time",
+                str(segment_seconds),
+                "-hls_playlist_type",
+                "vod",
+                "-hls_segment_filename",
+                str(stream_dir / "seg_%05d.ts"),
+                str(media_playlist),
+            ],
+            check=True,
+        )
+    master = stream_dir / "master.m3u8"
+    master.write_text(
+        "#EXTM3U\n"
+        '#EXT-X-STREAM-INF:BANDWIDTH=140000,CODECS="mp4a.40.2"\n'
+        "audio.m3u8\n",
+        encoding="utf-8",
+    )
+    return master
+
+
+PLAYER_MARKUP = {
+    "jwplayer": '<div id="player" class="jwplayer"></div>',
+    "videojs": '<video id="player" class="video-js vjs-tech"></video>',
+    "video": '<video id="player"></video>',
+}
+
+
+def write_session_page(
+    directory: Path,
+    name: str,
+    m3u8_url: str,
+    *,
+    player: str = "video",
+    delay_ms: int = 200,
+    discoverable: bool = False,
+) -> Path:
+    """
+    Write a session page whose player requests ``m3u8_url`` from JavaScript after ``delay_ms``.
+
+    By default the URL is base64-encoded in the page so only a real browser
+    (not the HTTP resolver) can discover it, which keeps browser capture
+    benchmarks honest. ``discoverable`` embeds it the way real players do
+    (a ``jwplayer().setup`` call or a ``<source>`` tag) so the HTTP resolver
+    can find it without a browser.
+    """
+    encoded = base64.b64encode(m3u8_url.encode("utf-8")).decode("ascii")
+    markup = PLAYER_MARKUP[player]
+    if discoverable and player == "jwplayer":
+        markup += f'<script>jwplayer("player").setup({{"file": "{m3u8_url}"}});</script>'
+    elif discoverable:
+        markup = markup.replace("></video>", f'><source src="{m3u8_url}" type="application/x-mpegURL"></video>')
+    page = directory / f"{name}.html"
+    page.parent.mkdir(parents=True, exist_ok=True)
+    page.write_text(
+        "<!doctype html><html><body>"
+        f"{markup}"
+        f'<script>setTimeout(function () {{ fetch(atob("{encoded}")); }}, {delay_ms});</script>'
+        "</body></html>\n",
+        encoding="utf-8",
+    )
+    return page
+
+
+class SharedBandwidth:
+    """Bandwidth shared by every connection of a server, like a saturated uplink."""
+
+    def __init__(self, bytes_per_second: int) -> None:
+        self.bytes_per_second = bytes_per_second
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def consume(self, size: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._next_free = max(now, self._next_free) + size / self.bytes_per_second
+            delay = self._next_free - now
+        time.sleep(delay)
+
+
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    """Static file handler with keep-alive, fixed per-request latency, per-connection and shared bandwidth."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    bytes_per_second = 0
+    uplink: Optional[SharedBandwidth] = None
+
+    def log_message(self, *_args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def copyfile(self, source, outputfile) -> None:
+        chunk_size = 16 * 1024
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            if self.bytes_per_second:
+                time.sleep(len(chunk) / self.bytes_per_second)
+            if self.uplink is not None:
+                self.uplink.consume(len(chunk))
+
+
+@contextlib.contextmanager
+def serve_directory(
+    directory: Path,
+    *,
+    latency: float = 0.0,
+    bytes_per_second: int = 0,
+    total_bytes_per_second: int = 0,
+) -> Iterator[str]:
+    """
+    Serve ``directory`` on an ephemeral localhost port and yield its base URL.
+
+    ``bytes_per_second`` caps each connection; ``total_bytes_per_second`` caps
+    all connections together.
+    """
+    uplink = SharedBandwidth(total_bytes_per_second) if total_bytes_per_second else None
+    handler = type(
+        "FixtureHandler",
+        (ThrottledHandler,),
+        {"latency": latency, "bytes_per_second": bytes_per_second, "uplink": uplink},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=os.fspath(directory)))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
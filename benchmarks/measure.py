@@ -0,0 +1,97 @@
+"""Measurement helpers shared by the benchmarks: percentiles and process-tree RSS/fd sampling."""
+
+from __future__ import annotations
+
+import os
+import statistics
+import threading
+from typing import Dict, List, Optional
+
+from download_m3u8.driver_pool import _process_tree_rss
+
+
+def _children_by_parent() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as handle:
+                stat = handle.read()
+        except OSError:
+            continue
+        children.setdefault(int(stat[stat.rfind(")") + 2 :].split()[1]), []).append(int(entry))
+    return children
+
+
+def process_tree_fds(root_pid: int) -> int:
+    """Count open file descriptors of ``root_pid`` and its descendants (Linux only)."""
+    children = _children_by_parent()
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            total += len(os.listdir(f"/proc/{pid}/fd"))
+        except OSError:
+            pass
+        stack.extend(children.get(pid, []))
+    return total
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, Optional[float]]:
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return round(value, 4) if value is not None else None
+
+    return {
+        "count": len(latencies),
+        "mean_seconds": rounded(statistics.mean(latencies)) if latencies else None,
+        "p50_seconds": rounded(percentile(latencies, 0.50)),
+        "p95_seconds": rounded(percentile(latencies, 0.95)),
+        "max_seconds": rounded(max(latencies)) if latencies else None,
+    }
+
+
+class ResourceSampler:
+    """
+    Sample RSS and open file descriptors of this process tree in the background.
+
+    Children such as ffmpeg, chromedriver and Chrome are included, so the
+    peaks reflect everything a benchmark run started.
+    """
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_fds = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _sample(self) -> None:
+        pid = os.getpid()
+        self.peak_rss = max(self.peak_rss, _process_tree_rss(pid))
+        self.peak_fds = max(self.peak_fds, process_tree_fds(pid))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1), "peak_open_fds": self.peak_fds}
@@ -1,17 +1,43 @@
 """High-level helpers for collecting and downloading m3u8 streams."""
 
+from .cache import ResolutionCache
 from .collector import clear_seleniumwire_cache, get_m3u8_url, increase_file_limit
 from .downloader import DownloadStats, download_aac_from_m3u8, download_from_csv
+from .driver_pool import DriverPool
+from .index import DownloadIndex
+from .metrics import Metrics, configure_metrics, get_metrics
+from .pipeline import run_pipeline
+from .planner import DownloadPlan, plan_downloads
+from .profiles import TranscodePool
+from .retry import CircuitBreaker, RetryPolicy
 from .tasks import process_csv
+from .worker import enqueue_tasks, run_worker
+from .workqueue import SqliteWorkQueue, WorkQueue
 
 __all__ = [
+    "CircuitBreaker",
+    "DownloadIndex",
+    "DownloadPlan",
     "DownloadStats",
+    "DriverPool",
+    "Metrics",
+    "ResolutionCache",
+    "RetryPolicy",
+    "SqliteWorkQueue",
+    "TranscodePool",
+    "WorkQueue",
     "clear_seleniumwire_cache",
+    "configure_metrics",
     "download_aac_from_m3u8",
     "download_from_csv",
+    "enqueue_tasks",
     "get_m3u8_url",
+    "get_metrics",
     "increase_file_limit",
+    "plan_downloads",
     "process_csv",
+    "run_pipeline",
+    "run_worker",
 ]
 
 __version__ = "0.1.0"
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from typing import Callable, List, Optional
+
+from .httpclient import HttpError
+from .metrics import get_metrics
+from .progress import FfmpegError, _format_bytes
+
+THROTTLE_STATUSES = frozenset({429, 503})
+
+
+def is_throttle(exc: BaseException) -> bool:
+    """
+    True when ``exc`` means the server asked us to slow down (HTTP 429/503).
+
+    ffmpeg failures are judged by the statuses of their ``HTTP error`` lines
+    (:attr:`FfmpegError.http_statuses`, which :func:`is_transient` uses too).
+    """
+    if isinstance(exc, HttpError):
+        return exc.status in THROTTLE_STATUSES
+    if isinstance(exc, FfmpegError):
+        return bool(exc.http_statuses & THROTTLE_STATUSES)
+    return False
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD controller for the number of downloads running at once.
+
+    Every ``interval`` seconds the scheduler calls :meth:`adjust`, which reads
+    the run's cumulative byte count from ``total_bytes`` (usually
+    :meth:`ProgressTracker.total_bytes`). The limit grows by one while the
+    aggregate throughput of each window beats the previous one by more than
+    ``plateau_tolerance``, and is multiplied by ``decrease_factor`` when:
+
+    - throughput stopped rising after the last increase (a plateau: more
+      parallel downloads only split the same bandwidth),
+    - the server answered 429/503 (:meth:`record_throttle`), or
+    - the median segment latency (:meth:`record_latency`) rose above
+      ``latency_tolerance`` times the lowest median seen so far.
+
+    After a plateau the last limit that still raised throughput is kept as
+    the knee, and the next window jumps straight back to it (like TCP's slow
+    start threshold) before probing upward one step at a time again, so the
+    limit settles in a narrow sawtooth around the knee of the throughput
+    curve. Throttling and latency backoffs forget the knee. The limit always
+    stays between ``floor`` and ``ceiling``. The first window after a change
+    (while the new downloads start up) and windows in which fewer jobs were
+    queued than the limit (the tail of a run) are not judged on throughput. Each decision
+    is logged and exported as the ``download_concurrency`` gauge and the
+    ``concurrency_changes`` counter (labelled with direction and reason).
+    """
+
+    def __init__(
+        self,
+        total_bytes: Callable[[], int],
+        *,
+        ceiling: int,
+        initial: int = 2,
+        floor: int = 1,
+        interval: float = 5.0,
+        decrease_factor: float = 0.7,
+        plateau_tolerance: float = 0.05,
+        latency_tolerance: float = 1.5,
+        log: Callable[[str], None] = print,
+    ) -> None:
+        if ceiling < 1:
+            raise ValueError("ceiling must be at least 1")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1")
+        self.total_bytes = total_bytes
+        self.ceiling = ceiling
+        self.floor = max(1, min(floor, ceiling))
+        self.interval = interval
+        self.decrease_factor = decrease_factor
+        self.plateau_tolerance = plateau_tolerance
+        self.latency_tolerance = latency_tolerance
+        self.log = log
+        self._limit = max(self.floor, min(initial, ceiling))
+        self._lock = threading.Lock()
+        self._throttled = 0
+        self._latencies: List[float] = []
+        self._baseline_latency: Optional[float] = None
+        self._window_start = time.monotonic()
+        self._window_bytes: Optional[int] = None
+        self._previous_throughput: Optional[float] = None
+        self._last_change = "start"
+        self._knee: Optional[int] = None
+        self._settling = False
+        get_metrics().gauge("download_concurrency", self._limit)
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def record_throttle(self) -> None:
+        with self._lock:
+            self._throttled += 1
+
+    def due(self) -> bool:
+        return time.monotonic() - self._window_start >= self.interval
+
+    def adjust(self, *, saturated: bool = True) -> int:
+        """
+        Close the current window and return the (possibly changed) limit.
+
+        ``saturated`` tells whether there were enough jobs to fill the limit.
+        """
+        total_bytes = self.total_bytes()
+        now = time.monotonic()
+        with self._lock:
+            elapsed = now - self._window_start
+            throttled, self._throttled = self._throttled, 0
+            latencies, self._latencies = self._latencies, []
+        previous_bytes = self._window_bytes
+        self._window_start = now
+        self._window_bytes = total_bytes
+        if previous_bytes is None or elapsed <= 0:
+            return self._limit
+
+        throughput = (total_bytes - previous_bytes) / elapsed
+        latency = statistics.median(latencies) if latencies else None
+        get_metrics().observe("window_throughput_bytes", throughput)
+
+        if throttled:
+            self._knee = None
+            return self._decrease(f"throttled ({throttled}x 429/503)", "throttled")
+        if latency is not None:
+            if self._baseline_latency is None or latency < self._baseline_latency:
+                self._baseline_latency = latency
+            elif latency > self._baseline_latency * self.latency_tolerance:
+                self._knee = None
+                return self._decrease(f"segment latency {latency:.2f}s vs {self._baseline_latency:.2f}s", "latency")
+        if self._settling or not saturated:
+            self._settling = False
+            return self._limit
+
+        previous = self._previous_throughput
+        self._previous_throughput = throughput
+        rising = previous is None or throughput > previous * (1 + self.plateau_tolerance)
+        if self._last_change == "up" and not rising:
+            self._knee = self._limit - 1
+            detail = f"throughput plateau ({_format_bytes(throughput)}/s vs {_format_bytes(previous)}/s)"
+            return self._decrease(detail, "plateau")
+        if self._limit >= self.ceiling:
+            self._last_change = "hold"
+            return self._limit
+        if self._knee is not None and self._limit < self._knee:
+            reason, new_limit = "recover", self._knee
+        else:
+            reason, new_limit = "probe" if previous is None else "rising", self._limit + 1
+        return self._change(new_limit, "up", reason, f"{reason}, throughput {_format_bytes(throughput)}/s")
+
+    def _decrease(self, detail: str, reason: str) -> int:
+        # The next window runs at a new limit; don't judge it against this one.
+        self._previous_throughput = None
+        new_limit = max(self.floor, int(self._limit * self.decrease_factor))
+        if new_limit == self._limit:
+            self._last_change = "hold"
+            return self._limit
+        return self._change(new_limit, "down", reason, detail)
+
+    def _change(self, new_limit: int, direction: str, reason: str, detail: str) -> int:
+        metrics = get_metrics()
+        self.log(f"[*] Concurrency {self._limit} -> {new_limit}: {detail}")
+        metrics.incr("concurrency_changes", direction=direction, reason=reason)
+        metrics.gauge("download_concurrency", new_limit)
+        self._limit = new_limit
+        self._last_change = direction
+        self._settling = True
+        return new_limit
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 6 * 3600
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def default_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "download_m3u8" / "resolutions.sqlite3"
+
+
+def normalize_session_url(url: str) -> str:
+    """Canonical cache key: lower-cased host, no fragment or tracking params, sorted query."""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(_TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+
+@dataclass
+class CacheEntry:
+    session_url: str
+    m3u8_url: Optional[str]
+    resolver: str
+    resolved_at: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.m3u8_url)
+
+
+class ResolutionCache:
+    """
+    SQLite-backed cache of session URL -> m3u8 resolutions.
+
+    Successful resolutions live for ``ttl`` seconds; failures are cached too
+    but expire after the shorter ``negative_ttl`` so dead pages are retried
+    occasionally without being hammered on every run.
+    """
+
+    def __init__(
+        self,
+        path: Optional[os.PathLike] = None,
+        *,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+    ) -> None:
+        self.path = Path(path) if path else default_cache_path()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS resolutions (
+                    session_key TEXT PRIMARY KEY,
+                    session_url TEXT NOT NULL,
+                    m3u8_url TEXT,
+                    resolver TEXT NOT NULL,
+                    resolved_at REAL NOT NULL,
+                    error TEXT
+                )
+                """
+            )
+
+    def __enter__(self) -> "ResolutionCache":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def get(self, session_url: str) -> Optional[CacheEntry]:
+        """Return the cached entry for ``session_url`` if it has not expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_url, m3u8_url, resolver, resolved_at, error FROM resolutions WHERE session_key = ?",
+                (normalize_session_url(session_url),),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        lifetime = self.ttl if entry.ok else self.negative_ttl
+        if time.time() - entry.resolved_at > lifetime:
+            return None
+        return entry
+
+    def put_success(self, session_url: str, m3u8_url: str, resolver: str) -> None:
+        self._put(CacheEntry(session_url, m3u8_url, resolver, time.time()))
+
+    def put_failure(self, session_url: str, resolver: str, error: str = "") -> None:
+        self._put(CacheEntry(session_url, None, resolver, time.time(), error or "not found"))
+
+    def prune(self, *, everything: bool = False) -> int:
+        """Delete expired entries (or all of them) and return how many were removed."""
+        now = time.time()
+        with self._lock, self._conn:
+            if everything:
+                cursor = self._conn.execute("DELETE FROM resolutions")
+            else:
+                cursor = self._conn.execute(
+                    """
+                    DELETE FROM resolutions
+                    WHERE (m3u8_url IS NOT NULL AND m3u8_url != '' AND resolved_at < ?)
+                       OR ((m3u8_url IS NULL OR m3u8_url = '') AND resolved_at < ?)
+                    """,
+                    (now - self.ttl, now - self.negative_ttl),
+                )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _put(self, entry: CacheEntry) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO resolutions (session_key, session_url, m3u8_url, resolver, resolved_at, error)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    normalize_session_url(entry.session_url),
+                    entry.session_url,
+                    entry.m3u8_url,
+                    entry.resolver,
+                    entry.resolved_at,
+                    entry.error,
+                ),
+            )
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+PRIORITY_KEYWORDS = (
+    "cdn.jwplayer.com/manifests",
+    "/media/",
+    "/manifest",
+    "/master",
+)
+# A candidate matching one of these cannot be beaten by a later request, so page watching may stop.
+HIGH_PRIORITY_KEYWORDS = PRIORITY_KEYWORDS[:1]
+
+
+def _candidates_from_url(url: str) -> List[str]:
+    """Extract candidate m3u8 urls from a single observed request url."""
+    candidates: List[str] = []
+    if ".m3u8" in url:
+        candidates.append(url)
+
+    if "jwplayer" in url and "ping.gif" in url and "mu=" in url:
+        try:
+            query_params = parse_qs(urlparse(url).query)
+            if "mu" in query_params:
+                embedded = query_params["mu"][0]
+                candidates.append(embedded)
+                print(f"[*] 從JWPlayer參數提取到m3u8: {embedded}")
+        except Exception as exc:
+            print(f"[!] 從URL參數提取m3u8失敗: {exc}")
+
+    return candidates
+
+
+def _analyze_url_request(request) -> List[str]:
+    """Extract candidate m3u8 urls from a seleniumwire request."""
+    if not getattr(request, "response", None):
+        return []
+    return _candidates_from_url(request.url)
+
+
+def _is_high_priority(candidate: str) -> bool:
+    return any(keyword in candidate for keyword in HIGH_PRIORITY_KEYWORDS)
+
+
+def _prioritize_candidates(candidates: Iterable[str]) -> Optional[str]:
+    for keyword in PRIORITY_KEYWORDS:
+        for candidate in candidates:
+            if keyword in candidate:
+                print(f"[*] 選擇匹配 {keyword} 的m3u8: {candidate}")
+                return candidate
+
+    for candidate in candidates:
+        lowered = candidate.lower()
+        if "ping" not in lowered and "analytics" not in lowered and "track" not in lowered:
+            print(f"[*] 選擇非追蹤m3u8: {candidate}")
+            return candidate
+
+    fallback = next(iter(candidates), None)
+    if fallback:
+        print(f"[*] 使用第一個找到的m3u8: {fallback}")
+    return fallback
+
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+CAPTURE_BACKENDS = ("seleniumwire", "cdp")
+
+_CDP_EVENTS = ("Network.responseReceived",)
+
+
+@dataclass
+class CapturedRequest:
+    """
+    A network request observed through Chrome DevTools performance logs.
+
+    Mirrors the two attributes of a seleniumwire request that the candidate
+    logic reads (``url`` and a truthy ``response``), so both backends share
+    :func:`_analyze_url_request`.
+    """
+
+    url: str
+    response: Optional[Dict[str, Any]] = None
+
+
+def requests_from_performance_log(entries: Iterable[Dict[str, Any]]) -> List[CapturedRequest]:
+    """Convert ``driver.get_log("performance")`` entries into :class:`CapturedRequest` objects."""
+    captured: List[CapturedRequest] = []
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get("method") not in _CDP_EVENTS:
+            continue
+        response = message.get("params", {}).get("response") or {}
+        url = response.get("url")
+        if url:
+            captured.append(CapturedRequest(url=url, response=response))
+    return captured
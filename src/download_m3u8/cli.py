@@ -1,24 +1,99 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 import typer
 
-from .downloader import download_from_csv
+from .cache import ResolutionCache
+from .capture import CAPTURE_BACKENDS
+from .downloader import ENGINES, download_from_csv
+from .metrics import configure_metrics
+from .pipeline import run_pipeline
+from .profiles import COPY_PROFILE, PROFILES, parse_profiles
+from .splitter import DEFAULT_SPLIT_THRESHOLD
 from .tasks import process_csv
+from .worker import enqueue_tasks, run_worker
+from .workqueue import DEFAULT_LEASE_SECONDS, STAGES, SqliteWorkQueue
 
 app = typer.Typer(help="Collect m3u8 URLs and download AAC files using a single CLI.")
 
 
+def _validate_engine(value: str) -> str:
+    if value not in ENGINES:
+        raise typer.BadParameter(f"必須是 {', '.join(ENGINES)} 之一")
+    return value
+
+
+def _validate_profiles(value: List[str]) -> List[str]:
+    try:
+        return [profile.name for profile in parse_profiles(value)]
+    except ValueError:
+        raise typer.BadParameter(f"必須是 {COPY_PROFILE}、{'、'.join(PROFILES)} 之一（可用逗號分隔多個）") from None
+
+
+def _validate_capture(value: str) -> str:
+    if value not in CAPTURE_BACKENDS:
+        raise typer.BadParameter(f"必須是 {', '.join(CAPTURE_BACKENDS)} 之一")
+    return value
+
+
+@app.callback()
+def main_options(
+    ctx: typer.Context,
+    metrics: Optional[str] = typer.Option(
+        None,
+        "--metrics",
+        help="輸出結構化指標：jsonl:<路徑>（每個事件一行）或 prometheus:<路徑>（Prometheus textfile）；預設不輸出",
+    ),
+) -> None:
+    """Collect m3u8 URLs and download AAC files using a single CLI."""
+    try:
+        configured = configure_metrics(metrics)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc), param_hint="--metrics") from exc
+    ctx.call_on_close(configured.close)
+
+
 @app.command()
 def collect(
-    csv: Path = typer.Argument(..., exists=True, readable=True, help="來源 CSV 檔案"),
-    output: Optional[Path] = typer.Option(None, "--output", "-o", help="輸出 CSV 檔案（預設覆寫來源）"),
+    csv: Path = typer.Argument(..., exists=True, readable=True, help="來源檔案（CSV、JSONL 或 SQLite）"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="輸出檔案（依副檔名輸出 CSV、JSONL 或 SQLite；預設覆寫來源）"),
     workers: int = typer.Option(2, "--workers", "-w", min=1, show_default=True, help="並行處理線程數"),
-    save_interval: int = typer.Option(5, "--save-interval", "-s", min=1, show_default=True, help="每隔多少筆儲存一次"),
+    save_interval: int = typer.Option(5, "--save-interval", "-s", min=1, show_default=True, help="每隔多少筆把暫存輸出 (.tmp) 寫入磁碟；輸出檔在全部完成後才取代，中斷後依日誌續傳"),
     start_from: int = typer.Option(0, "--start-from", "-f", min=0, show_default=True, help="從第幾筆資料開始"),
     max_retries: int = typer.Option(3, "--max-retries", "-r", min=1, show_default=True, help="單筆任務最大重試次數"),
+    max_pages_per_driver: int = typer.Option(
+        25, "--max-pages-per-driver", min=1, show_default=True, help="每個 Chrome driver 處理多少頁後重啟"
+    ),
+    max_driver_memory: int = typer.Option(
+        1024, "--max-driver-memory", min=0, show_default=True, help="driver 記憶體上限 (MB)，超過即重啟；0 表示不檢查"
+    ),
+    http_first: bool = typer.Option(
+        True, "--http-first/--no-http-first", show_default=True, help="先以 HTTP 解析頁面原始碼，找不到才啟動瀏覽器"
+    ),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", show_default=True, help="使用 m3u8 解析快取"),
+    refresh_cache: bool = typer.Option(False, "--refresh-cache", help="忽略既有快取並重新解析（結果仍寫回快取）"),
+    cache_path: Optional[Path] = typer.Option(None, "--cache-path", help="快取資料庫路徑（預設 ~/.cache/download_m3u8）"),
+    rate_limit: Optional[float] = typer.Option(
+        None, "--rate-limit", min=0.01, help="每個主機每秒最多載入幾個頁面（預設不限制）"
+    ),
+    capture: str = typer.Option(
+        "seleniumwire",
+        "--capture",
+        callback=_validate_capture,
+        show_default=True,
+        help="瀏覽器網路擷取方式：seleniumwire（代理）或 cdp（DevTools 網路事件，無代理）",
+    ),
+    processes: bool = typer.Option(
+        False, "--processes", help="每個 worker 以獨立行程執行並擁有自己的瀏覽器（記憶體洩漏不互相影響）"
+    ),
+    max_tasks_per_worker: int = typer.Option(
+        50, "--max-tasks-per-worker", min=0, show_default=True, help="--processes 模式下每個行程處理多少筆後重啟；0 表示不限"
+    ),
+    max_worker_memory: int = typer.Option(
+        2048, "--max-worker-memory", min=0, show_default=True, help="--processes 模式下行程（含瀏覽器）記憶體上限 (MB)；0 表示不檢查"
+    ),
 ) -> None:
     """批量抓取 m3u8 連結並寫回 CSV。"""
     process_csv(
@@ -28,12 +103,34 @@ def collect(
         start_from=start_from,
         max_retries=max_retries,
         output_file=str(output) if output else None,
+        max_pages_per_driver=max_pages_per_driver,
+        max_driver_memory_mb=max_driver_memory,
+        http_first=http_first,
+        use_cache=use_cache,
+        cache_path=str(cache_path) if cache_path else None,
+        refresh_cache=refresh_cache,
+        rate_limit=rate_limit,
+        capture=capture,
+        use_processes=processes,
+        max_tasks_per_worker=max_tasks_per_worker,
+        max_worker_memory_mb=max_worker_memory,
     )
 
 
+@app.command("prune-cache")
+def prune_cache(
+    cache_path: Optional[Path] = typer.Option(None, "--cache-path", help="快取資料庫路徑（預設 ~/.cache/download_m3u8）"),
+    everything: bool = typer.Option(False, "--all", help="清除所有快取而非僅過期項目"),
+) -> None:
+    """清除過期（或全部）的 m3u8 解析快取。"""
+    with ResolutionCache(cache_path) as cache:
+        removed = cache.prune(everything=everything)
+    print(f"[*] 已清除 {removed} 筆快取記錄: {cache.path}")
+
+
 @app.command()
 def download(
-    csv: Path = typer.Argument(..., exists=True, readable=True, help="包含 m3u8 欄位的 CSV 檔案"),
+    csv: Path = typer.Argument(..., exists=True, readable=True, help="包含 m3u8 欄位的 CSV、JSONL 或 SQLite 檔案"),
     output_dir: Path = typer.Option(Path("output"), "--output-dir", "-o", help="下載輸出目錄"),
     max_threads: Optional[int] = typer.Option(
         None,
@@ -42,12 +139,304 @@ def download(
         min=1,
         help="下載時使用的最大線程數（預設為 CPU 核心數與 8 的最小值）",
     ),
+    engine: str = typer.Option(
+        "ffmpeg",
+        "--engine",
+        "-e",
+        callback=_validate_engine,
+        show_default=True,
+        help="下載引擎：ffmpeg（單一 ffmpeg 行程）或 native（內建並行分段下載）",
+    ),
+    segment_concurrency: int = typer.Option(
+        8, "--segment-concurrency", min=1, show_default=True, help="native 引擎每個檔案同時下載的分段數"
+    ),
+    prefer_audio_only: bool = typer.Option(
+        True,
+        "--prefer-audio-only/--no-prefer-audio-only",
+        show_default=True,
+        help="master playlist 優先選擇純音訊版本，否則選擇含 AAC 的最低頻寬版本",
+    ),
+    max_bandwidth: Optional[int] = typer.Option(
+        None, "--max-bandwidth", min=1, help="可選版本的最大 BANDWIDTH（bits/s）"
+    ),
+    per_host_limit: Optional[int] = typer.Option(
+        None, "--per-host-limit", min=1, help="同一 CDN 主機同時下載的最大數量（預設不另外限制）"
+    ),
+    stall_timeout: float = typer.Option(
+        120.0, "--stall-timeout", min=0, show_default=True, help="ffmpeg 多少秒沒有進度即終止並重試（0 表示停用）"
+    ),
+    progress_interval: float = typer.Option(
+        10.0, "--progress-interval", min=1, show_default=True, help="進度與吞吐量報告間隔（秒）"
+    ),
+    max_retries: int = typer.Option(
+        3, "--max-retries", "-r", min=1, show_default=True, help="每個檔案遇到暫時性錯誤時的最大嘗試次數"
+    ),
+    verify_hash: bool = typer.Option(
+        False, "--verify-hash", help="略過已完成檔案前也重新計算 SHA-256 比對（較慢；預設只比對大小與長度）"
+    ),
+    adaptive: bool = typer.Option(
+        False,
+        "--adaptive",
+        help="依實測吞吐量自動調整同時下載數（AIMD）；--max-threads 變成上限（預設 32）",
+    ),
+    outputs: List[str] = typer.Option(
+        [],
+        "--output-profile",
+        "-p",
+        callback=_validate_profiles,
+        help=f"除了 AAC 之外另外轉出的格式（可重複指定或以逗號分隔）：{'、'.join(PROFILES)}",
+    ),
+    transcode_workers: Optional[int] = typer.Option(
+        None, "--transcode-workers", min=1, help="同時進行轉檔的 ffmpeg 行程數（預設為 CPU 核心數；與下載並行數分開計算）"
+    ),
+    split_chunks: int = typer.Option(
+        0,
+        "--split-chunks",
+        min=0,
+        show_default=True,
+        help="把長串流切成幾段分段範圍並行下載後無損合併（ffmpeg 引擎；0 表示不切）",
+    ),
+    split_threshold: float = typer.Option(
+        DEFAULT_SPLIT_THRESHOLD,
+        "--split-threshold",
+        min=0,
+        show_default=True,
+        help="長度超過多少秒的串流才切段（0 表示只切佇列中最後一個工作）",
+    ),
+    preflight: bool = typer.Option(
+        True,
+        "--preflight/--no-preflight",
+        show_default=True,
+        help="下載前先並行讀取所有播放清單：依長度由長到短排序，並略過失效或過期的連結",
+    ),
+    plan: bool = typer.Option(False, "--plan", help="只列出預估的總大小與下載時間（依 --max-threads），不實際下載"),
 ) -> None:
     """根據 CSV 內容下載 AAC 檔案。"""
     download_from_csv(
         str(csv),
         max_threads=max_threads,
         output_dir=str(output_dir),
+        engine=engine,
+        segment_concurrency=segment_concurrency,
+        prefer_audio_only=prefer_audio_only,
+        max_bandwidth=max_bandwidth,
+        per_host_limit=per_host_limit,
+        stall_timeout=stall_timeout,
+        progress_interval=progress_interval,
+        max_retries=max_retries,
+        verify_hash=verify_hash,
+        adaptive=adaptive,
+        outputs=outputs,
+        transcode_workers=transcode_workers,
+        split_chunks=split_chunks,
+        split_threshold=split_threshold,
+        preflight=preflight,
+        plan_only=plan,
+    )
+
+
+@app.command()
+def run(
+    csv: Path = typer.Argument(..., exists=True, readable=True, help="來源檔案（CSV、JSONL 或 SQLite）"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="輸出檔案（依副檔名輸出 CSV、JSONL 或 SQLite；預設覆寫來源）"),
+    output_dir: Path = typer.Option(Path("output"), "--output-dir", "-d", help="下載輸出目錄"),
+    collect_workers: int = typer.Option(2, "--collect-workers", "-w", min=1, show_default=True, help="解析 m3u8 的並行線程數"),
+    download_workers: int = typer.Option(4, "--download-workers", "-t", min=1, show_default=True, help="同時下載的檔案數"),
+    queue_size: int = typer.Option(
+        8, "--queue-size", min=1, show_default=True, help="已解析但尚未下載的最大筆數；滿了會暫停解析"
+    ),
+    save_interval: int = typer.Option(5, "--save-interval", "-s", min=1, show_default=True, help="每隔多少筆把暫存輸出 (.tmp) 寫入磁碟；輸出檔在全部完成後才取代，中斷後依日誌續傳"),
+    max_retries: int = typer.Option(3, "--max-retries", "-r", min=1, show_default=True, help="單筆任務最大重試次數"),
+    http_first: bool = typer.Option(
+        True, "--http-first/--no-http-first", show_default=True, help="先以 HTTP 解析頁面原始碼，找不到才啟動瀏覽器"
+    ),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", show_default=True, help="使用 m3u8 解析快取"),
+    cache_path: Optional[Path] = typer.Option(None, "--cache-path", help="快取資料庫路徑（預設 ~/.cache/download_m3u8）"),
+    rate_limit: Optional[float] = typer.Option(
+        None, "--rate-limit", min=0.01, help="每個主機每秒最多載入幾個頁面（預設不限制）"
+    ),
+    capture: str = typer.Option(
+        "seleniumwire",
+        "--capture",
+        callback=_validate_capture,
+        show_default=True,
+        help="瀏覽器網路擷取方式：seleniumwire（代理）或 cdp（DevTools 網路事件，無代理）",
+    ),
+    processes: bool = typer.Option(
+        False, "--processes", help="每個 worker 以獨立行程執行並擁有自己的瀏覽器（記憶體洩漏不互相影響）"
+    ),
+    max_tasks_per_worker: int = typer.Option(
+        50, "--max-tasks-per-worker", min=0, show_default=True, help="--processes 模式下每個行程處理多少筆後重啟；0 表示不限"
+    ),
+    max_worker_memory: int = typer.Option(
+        2048, "--max-worker-memory", min=0, show_default=True, help="--processes 模式下行程（含瀏覽器）記憶體上限 (MB)；0 表示不檢查"
+    ),
+    engine: str = typer.Option(
+        "ffmpeg", "--engine", "-e", callback=_validate_engine, show_default=True, help="下載引擎：ffmpeg 或 native"
+    ),
+    segment_concurrency: int = typer.Option(
+        8, "--segment-concurrency", min=1, show_default=True, help="native 引擎每個檔案同時下載的分段數"
+    ),
+    prefer_audio_only: bool = typer.Option(
+        True, "--prefer-audio-only/--no-prefer-audio-only", show_default=True, help="master playlist 優先選擇純音訊版本"
+    ),
+    max_bandwidth: Optional[int] = typer.Option(
+        None, "--max-bandwidth", min=1, help="可選版本的最大 BANDWIDTH（bits/s）"
+    ),
+    stall_timeout: float = typer.Option(
+        120.0, "--stall-timeout", min=0, show_default=True, help="ffmpeg 多少秒沒有進度即終止並重試（0 表示停用）"
+    ),
+    progress_interval: float = typer.Option(
+        10.0, "--progress-interval", min=1, show_default=True, help="進度與吞吐量報告間隔（秒）"
+    ),
+    verify_hash: bool = typer.Option(
+        False, "--verify-hash", help="略過已完成檔案前也重新計算 SHA-256 比對（較慢；預設只比對大小與長度）"
+    ),
+) -> None:
+    """邊解析 m3u8 邊下載：解析完成的資料立即進入下載佇列。"""
+    run_pipeline(
+        str(csv),
+        output_file=str(output) if output else None,
+        output_dir=str(output_dir),
+        collect_workers=collect_workers,
+        download_workers=download_workers,
+        queue_size=queue_size,
+        save_interval=save_interval,
+        max_retries=max_retries,
+        http_first=http_first,
+        use_cache=use_cache,
+        cache_path=str(cache_path) if cache_path else None,
+        rate_limit=rate_limit,
+        capture=capture,
+        use_processes=processes,
+        max_tasks_per_worker=max_tasks_per_worker,
+        max_worker_memory_mb=max_worker_memory,
+        engine=engine,
+        segment_concurrency=segment_concurrency,
+        prefer_audio_only=prefer_audio_only,
+        max_bandwidth=max_bandwidth,
+        stall_timeout=stall_timeout,
+        progress_interval=progress_interval,
+        verify_hash=verify_hash,
+    )
+
+
+def _validate_stage(value: str) -> str:
+    if value not in STAGES:
+        raise typer.BadParameter(f"必須是 {', '.join(STAGES)} 之一")
+    return value
+
+
+def _validate_stages(value: List[str]) -> List[str]:
+    return [_validate_stage(stage) for stage in value]
+
+
+@app.command()
+def enqueue(
+    queue: Path = typer.Argument(..., help="共用工作佇列（SQLite 檔案，可放在多台機器共用的目錄）"),
+    csv: Path = typer.Argument(..., exists=True, readable=True, help="來源檔案（CSV、JSONL 或 SQLite）"),
+    stage: str = typer.Option(
+        "collect",
+        "--stage",
+        callback=_validate_stage,
+        show_default=True,
+        help="加入的階段：collect（依 url 欄位解析 m3u8）或 download（依 file 與 m3u8 欄位下載）",
+    ),
+    then_download: bool = typer.Option(
+        True, "--then-download/--no-then-download", show_default=True, help="collect 完成後自動加入下載工作"
+    ),
+    max_attempts: int = typer.Option(
+        3, "--max-attempts", min=1, show_default=True, help="每個工作最多被領取幾次（含 worker 中斷後重新領取）"
+    ),
+) -> None:
+    """把來源檔案的資料加入共用工作佇列（已存在的工作會略過）。"""
+    with SqliteWorkQueue(queue) as work_queue:
+        added = enqueue_tasks(
+            work_queue, str(csv), stage=stage, then_download=then_download, max_attempts=max_attempts
+        )
+        counts = work_queue.counts()
+    print(f"[*] 已加入 {added['collect']} 筆解析工作、{added['download']} 筆下載工作: {queue}")
+    for (job_stage, status), count in sorted(counts.items()):
+        print(f"[*] {job_stage:<8} {status:<8} {count}")
+
+
+@app.command()
+def worker(
+    queue: Path = typer.Argument(..., help="共用工作佇列（SQLite 檔案）"),
+    stages: List[str] = typer.Option(
+        list(STAGES), "--stage", callback=_validate_stages, show_default=True, help="處理哪些階段（可重複指定）"
+    ),
+    worker_id: Optional[str] = typer.Option(None, "--worker-id", help="worker 名稱（預設為 主機名稱:PID）"),
+    collect_workers: int = typer.Option(1, "--collect-workers", "-w", min=1, show_default=True, help="解析 m3u8 的並行線程數"),
+    download_workers: int = typer.Option(2, "--download-workers", "-t", min=1, show_default=True, help="同時下載的檔案數"),
+    lease_seconds: float = typer.Option(
+        DEFAULT_LEASE_SECONDS,
+        "--lease-seconds",
+        min=5,
+        show_default=True,
+        help="工作租約長度（秒）；worker 每隔三分之一租約送出心跳，逾期未續約的工作會交給其他 worker",
+    ),
+    wait: bool = typer.Option(False, "--wait", help="佇列清空後繼續等待新工作，而非結束"),
+    poll_interval: float = typer.Option(5.0, "--poll-interval", min=0.1, show_default=True, help="沒有工作時的輪詢間隔（秒）"),
+    output_dir: Path = typer.Option(Path("output"), "--output-dir", "-d", help="下載輸出目錄（多台機器時應為共用目錄）"),
+    max_retries: int = typer.Option(3, "--max-retries", "-r", min=1, show_default=True, help="單一 worker 內遇到暫時性錯誤的最大嘗試次數"),
+    http_first: bool = typer.Option(
+        True, "--http-first/--no-http-first", show_default=True, help="先以 HTTP 解析頁面原始碼，找不到才啟動瀏覽器"
+    ),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", show_default=True, help="使用 m3u8 解析快取"),
+    cache_path: Optional[Path] = typer.Option(None, "--cache-path", help="快取資料庫路徑（預設 ~/.cache/download_m3u8）"),
+    capture: str = typer.Option(
+        "seleniumwire",
+        "--capture",
+        callback=_validate_capture,
+        show_default=True,
+        help="瀏覽器網路擷取方式：seleniumwire（代理）或 cdp（DevTools 網路事件，無代理）",
+    ),
+    engine: str = typer.Option(
+        "ffmpeg", "--engine", "-e", callback=_validate_engine, show_default=True, help="下載引擎：ffmpeg 或 native"
+    ),
+    segment_concurrency: int = typer.Option(
+        8, "--segment-concurrency", min=1, show_default=True, help="native 引擎每個檔案同時下載的分段數"
+    ),
+    prefer_audio_only: bool = typer.Option(
+        True, "--prefer-audio-only/--no-prefer-audio-only", show_default=True, help="master playlist 優先選擇純音訊版本"
+    ),
+    max_bandwidth: Optional[int] = typer.Option(
+        None, "--max-bandwidth", min=1, help="可選版本的最大 BANDWIDTH（bits/s）"
+    ),
+    stall_timeout: float = typer.Option(
+        120.0, "--stall-timeout", min=0, show_default=True, help="ffmpeg 多少秒沒有進度即終止並重試（0 表示停用）"
+    ),
+    progress_interval: float = typer.Option(
+        10.0, "--progress-interval", min=1, show_default=True, help="進度與吞吐量報告間隔（秒）"
+    ),
+    verify_hash: bool = typer.Option(
+        False, "--verify-hash", help="略過已完成檔案前也重新計算 SHA-256 比對（較慢；預設只比對大小與長度）"
+    ),
+) -> None:
+    """從共用工作佇列領取解析與下載工作；可在多台機器上同時執行。"""
+    run_worker(
+        str(queue),
+        stages=stages,
+        worker_id=worker_id,
+        collect_workers=collect_workers,
+        download_workers=download_workers,
+        lease_seconds=lease_seconds,
+        wait=wait,
+        poll_interval=poll_interval,
+        output_dir=str(output_dir),
+        max_retries=max_retries,
+        http_first=http_first,
+        use_cache=use_cache,
+        cache_path=str(cache_path) if cache_path else None,
+        capture=capture,
+        engine=engine,
+        segment_concurrency=segment_concurrency,
+        prefer_audio_only=prefer_audio_only,
+        max_bandwidth=max_bandwidth,
+        stall_timeout=stall_timeout,
+        progress_interval=progress_interval,
+        verify_hash=verify_hash,
     )
 
 
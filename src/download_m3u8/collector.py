@@ -1,20 +1,22 @@
 from __future__ import annotations
 
-import concurrent.futures
 import datetime
 import gc
 import os
 import shutil
 import tempfile
 import time
-from typing import Iterable, List, Optional
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 import resource
-from seleniumwire import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+
+from .cache import ResolutionCache
+from .candidates import _analyze_url_request, _is_high_priority, _prioritize_candidates
+from .driver_pool import DriverPool, PooledDriver
+from .httpclient import HttpClient
+from .metrics import get_metrics
+from .resolver import resolve_via_http
 
 CACHE_DIRS: List[str] = [
     os.path.join("/tmp", ".seleniumwire"),
@@ -36,17 +38,15 @@ def increase_file_limit() -> None:
         print(f"[!] 增加文件描述符限制失敗: {exc}")
 
 
-def _create_seleniumwire_dirs() -> None:
-    for cache_dir in CACHE_DIRS:
-        try:
-            os.makedirs(cache_dir, exist_ok=True)
-            os.chmod(cache_dir, 0o755)
-        except Exception as exc:
-            print(f"[!] 無法創建目錄 {cache_dir}: {exc}")
-
-
 def clear_seleniumwire_cache() -> None:
-    """Remove Selenium Wire cache directories to avoid stale files."""
+    """
+    Remove Selenium Wire's shared default storage directories.
+
+    Only for manual cleanup of leftovers from old runs: nothing calls it
+    automatically, because :class:`DriverPool` gives each driver its own
+    storage directory and wiping the shared ones could pull files from under
+    a driver of another process that is still running.
+    """
     for cache_dir in CACHE_DIRS:
         if os.path.exists(cache_dir):
             print(f"[*] 正在清理 Selenium Wire 緩存: {cache_dir}")
@@ -68,53 +68,18 @@ def clear_seleniumwire_cache() -> None:
             print(f"[!] 無法創建目錄 {cache_dir}: {exc}")
 
 
-def _build_chrome_options(headless: bool) -> Options:
-    chrome_options = Options()
-    if headless:
-        chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--log-level=3")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-browser-side-navigation")
-    chrome_options.add_argument("--disable-infobars")
-    chrome_options.add_argument("--disable-popup-blocking")
-    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
-    return chrome_options
-
-
-def _analyze_url_request(request) -> List[str]:
-    """Extract candidate m3u8 urls from a seleniumwire request."""
-    candidates: List[str] = []
-    if not getattr(request, "response", None):
-        return candidates
-
-    if ".m3u8" in request.url:
-        candidates.append(request.url)
-
-    if "jwplayer" in request.url and "ping.gif" in request.url and "mu=" in request.url:
-        try:
-            from urllib.parse import parse_qs, urlparse
-
-            parsed_url = urlparse(request.url)
-            query_params = parse_qs(parsed_url.query)
-            if "mu" in query_params:
-                embedded = query_params["mu"][0]
-                candidates.append(embedded)
-                print(f"[*] 從JWPlayer參數提取到m3u8: {embedded}")
-        except Exception as exc:
-            print(f"[!] 從URL參數提取m3u8失敗: {exc}")
-
-    return candidates
-
-
 def get_m3u8_url(
     session_url: str,
     *,
     headless: bool = True,
-    wait_timeout: int = 10,
-    max_requests_to_scan: int = 100,
+    wait_timeout: float = 10,
+    poll_interval: float = 0.2,
+    pool: Optional[DriverPool] = None,
+    http_first: bool = True,
+    http_client: Optional[HttpClient] = None,
+    cache: Optional[ResolutionCache] = None,
+    refresh_cache: bool = False,
+    capture: str = "seleniumwire",
 ) -> Optional[str]:
     """
     Extract the first plausible m3u8 URL from a conference session page.
@@ -126,80 +91,176 @@ def get_m3u8_url(
     headless:
         Whether to run Chrome in headless mode.
     wait_timeout:
-        Seconds to wait for player elements to appear.
-    max_requests_to_scan:
-        Maximum seleniumwire requests to inspect for performance reasons.
+        Hard deadline in seconds for watching the page's network traffic,
+        counted from when the page finished loading. Watching ends earlier
+        once a high-priority candidate is seen.
+    poll_interval:
+        Seconds between checks of newly captured requests.
+    pool:
+        Driver pool to lease a warm browser from. When omitted a throwaway
+        driver is started for this call and quit afterwards.
+    http_first:
+        Try :func:`resolve_via_http` on the raw page HTML before starting
+        Selenium; the browser is only used when that finds nothing.
+    http_client:
+        Shared keep-alive client for the HTTP stage.
+    cache:
+        Persistent resolution cache to consult before resolving and to
+        populate afterwards, including negative results.
+    refresh_cache:
+        Ignore existing cache entries but still record the new result.
+    capture:
+        Network capture backend for the throwaway driver used when no
+        ``pool`` is given (``"seleniumwire"`` or ``"cdp"``).
+
+    Returns ``None`` when the page loaded but no m3u8 was found. Browser and
+    driver errors are raised so callers can retry them.
     """
 
+    metrics = get_metrics()
+    if cache is not None and not refresh_cache:
+        entry = cache.get(session_url)
+        metrics.incr("cache_lookups", result="miss" if entry is None else "hit" if entry.ok else "negative")
+        if entry is not None:
+            if entry.ok:
+                print(f"[*] 使用快取的m3u8 ({entry.resolver}): {entry.m3u8_url}")
+                return entry.m3u8_url
+            print(f"[*] 快取顯示此頁面近期解析失敗，跳過: {entry.error}")
+            return None
+
     start_time = time.time()
     print(f"[*] 開始時間: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-    increase_file_limit()
-    _create_seleniumwire_dirs()
-    clear_seleniumwire_cache()
-
-    custom_storage_path = os.path.join(tempfile.gettempdir(), "seleniumwire_custom_storage")
-    os.makedirs(custom_storage_path, exist_ok=True)
-    os.chmod(custom_storage_path, 0o755)
-
-    seleniumwire_options = {
-        "disable_encoding": True,
-        "verify_ssl": False,
-        "suppress_connection_errors": True,
-        "connection_timeout": 10,
-        "connection_keep_alive": False,
-        "max_threads": 4,
-        "pool_connections": 10,
-        "pool_maxsize": 10,
-        "request_storage_base_dir": custom_storage_path,
-    }
-
-    driver = None
     m3u8_url: Optional[str] = None
-
-    try:
-        driver = webdriver.Chrome(options=_build_chrome_options(headless), seleniumwire_options=seleniumwire_options)
-        driver.set_page_load_timeout(20)
-        driver.scopes = [r".*\.m3u8.*", r".*/manifest.*", r".*jwplayer.*", r".*media.*"]
-
-        print("[*] 正在載入網頁...")
-        driver.get(session_url)
+    resolver = "selenium"
+
+    if http_first:
+        with metrics.span("http_resolve") as span:
+            m3u8_url = resolve_via_http(session_url, client=http_client)
+            span["outcome"] = "found" if m3u8_url else "miss"
+        if m3u8_url:
+            resolver = "http"
+            elapsed = time.time() - start_time
+            print(f"[*] HTTP 快速解析取得m3u8: {m3u8_url} (耗時 {elapsed:.2f} 秒)")
+        else:
+            print("[*] HTTP 快速解析未找到m3u8，改用瀏覽器")
+
+    if not m3u8_url:
+        owned_pool: Optional[DriverPool] = None
+        if pool is None:
+            increase_file_limit()
+            owned_pool = pool = DriverPool(size=1, headless=headless, max_pages=1, capture=capture)
 
         try:
-            WebDriverWait(driver, wait_timeout).until(
-                EC.any_of(
-                    EC.presence_of_element_located((By.TAG_NAME, "video")),
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".jwplayer")),
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".vjs-tech")),
+            with pool.lease() as pooled:
+                page = _extract_from_page(
+                    pooled,
+                    session_url,
+                    wait_timeout=wait_timeout,
+                    poll_interval=poll_interval,
                 )
-            )
-            print("[*] 偵測到影片元素")
-            time.sleep(2)
+            m3u8_url = page.m3u8_url
         except Exception as exc:
-            print(f"[!] 等待影片載入時發生錯誤: {exc}")
-            print("[*] 繼續檢查網絡請求...")
-            time.sleep(2)
-
-        print("[*] 搜尋m3u8連結...")
-        requests_to_analyze = (
-            driver.requests[-max_requests_to_scan:]
-            if len(driver.requests) > max_requests_to_scan
-            else driver.requests
-        )
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            candidate_batches = executor.map(_analyze_url_request, requests_to_analyze)
+            print(f"[!] 獲取m3u8時發生錯誤: {exc}")
+            metrics.timing("resolve", time.time() - start_time, resolver=resolver, outcome="error")
+            raise
+        finally:
+            end_time = time.time()
+            elapsed = end_time - start_time
+            print(f"[*] 結束時間: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"[*] 總耗時: {elapsed:.2f} 秒")
+
+            if owned_pool is not None:
+                owned_pool.close()
+            gc.collect()
+
+    metrics.timing("resolve", time.time() - start_time, resolver=resolver, outcome="found" if m3u8_url else "miss")
+
+    # Only "page loaded but nothing found" is negatively cached; browser or
+    # network errors are raised above and must not poison the cache.
+    if cache is not None:
+        if m3u8_url:
+            cache.put_success(session_url, m3u8_url, resolver)
+        else:
+            cache.put_failure(session_url, resolver, "no m3u8 found")
+    return m3u8_url
+
+
+@dataclass
+class PageCapture:
+    """Outcome of watching one page: the chosen URL and how long discovery took."""
+
+    m3u8_url: Optional[str]
+    candidates: List[str] = field(default_factory=list)
+    first_candidate_after: Optional[float] = None
+    elapsed: float = 0.0
+
+
+def _extract_from_page(
+    pooled: PooledDriver,
+    session_url: str,
+    *,
+    wait_timeout: float,
+    poll_interval: float = 0.2,
+    settle_time: float = 1.0,
+) -> PageCapture:
+    """
+    Load ``session_url`` and watch its network traffic for m3u8 candidates.
+
+    Requests are checked as they arrive (every ``poll_interval`` seconds).
+    Watching stops as soon as a high-priority candidate appears, otherwise
+    ``settle_time`` seconds after the first candidate (to let a better one
+    show up), and in any case ``wait_timeout`` seconds after the page
+    finished loading. The page scripts are only queried when no request
+    matched.
+    """
+    driver = pooled.driver
+    metrics = get_metrics()
+    started = time.time()
+    candidates: List[str] = []
+    first_candidate_after: Optional[float] = None
+    settle_at: Optional[float] = None
 
-        m3u8_candidates = [candidate for batch in candidate_batches for candidate in batch]
-        gc.collect()
+    print("[*] 正在載入網頁...")
+    with metrics.span("page_load", capture=pooled.capture):
+        driver.get(session_url)
+    # Page loads are bounded by DriverPool.page_load_timeout; watching always gets the full window.
+    deadline = time.time() + wait_timeout
+
+    print("[*] 監看網路請求中的m3u8連結...")
+    with metrics.span("request_scan", capture=pooled.capture) as span:
+        while True:
+            for request in pooled.poll_requests():
+                for candidate in _analyze_url_request(request):
+                    if candidate in candidates:
+                        continue
+                    candidates.append(candidate)
+                    if first_candidate_after is None:
+                        first_candidate_after = time.time() - started
+                        settle_at = min(deadline, time.time() + settle_time)
+            now = time.time()
+            if any(_is_high_priority(candidate) for candidate in candidates):
+                span["outcome"] = "high_priority"
+                break
+            if settle_at is not None and now >= settle_at:
+                span["outcome"] = "settled"
+                break
+            if now >= deadline:
+                span["outcome"] = "timeout"
+                break
+            time.sleep(poll_interval)
+    if first_candidate_after is not None:
+        metrics.observe("first_candidate_seconds", first_candidate_after, capture=pooled.capture)
 
-        if m3u8_candidates:
-            print(f"[*] 找到 {len(m3u8_candidates)} 個可能的m3u8連結")
-            m3u8_url = _prioritize_candidates(m3u8_candidates)
+    m3u8_url: Optional[str] = None
+    if candidates:
+        print(f"[*] 找到 {len(candidates)} 個可能的m3u8連結（首個於 {first_candidate_after:.2f} 秒出現）")
+        m3u8_url = _prioritize_candidates(candidates)
 
-        if not m3u8_url:
-            print("[*] 嘗試從JS獲取m3u8...")
-            try:
+    if not m3u8_url:
+        print("[*] 嘗試從JS獲取m3u8...")
+        try:
+            with metrics.span("js_fallback") as span:
                 video_sources = driver.execute_script(
                     """
                     const sources = [];
@@ -226,54 +287,17 @@ def get_m3u8_url(
                     return sources;
                     """
                 )
-                if video_sources:
-                    m3u8_url = video_sources[0]
-                    print(f"[*] 從JS提取到m3u8: {m3u8_url}")
-            except Exception as exc:
-                print(f"[!] JS提取m3u8失敗: {exc}")
-
-        return m3u8_url
-    except Exception as exc:
-        print(f"[!] 獲取m3u8時發生錯誤: {exc}")
-        return None
-    finally:
-        end_time = time.time()
-        elapsed = end_time - start_time
-        print(f"[*] 結束時間: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"[*] 總耗時: {elapsed:.2f} 秒")
-
-        if driver:
-            try:
-                del driver.requests
-                driver.quit()
-            except Exception as exc:  # pragma: no cover - best effort cleanup
-                print(f"[!] 關閉 driver 時發生錯誤: {exc}")
-
-        gc.collect()
-        clear_seleniumwire_cache()
-
-
-def _prioritize_candidates(candidates: Iterable[str]) -> Optional[str]:
-    prioritized_keywords = [
-        "cdn.jwplayer.com/manifests",
-        "/media/",
-        "/manifest",
-        "/master",
-    ]
-    for keyword in prioritized_keywords:
-        for candidate in candidates:
-            if keyword in candidate:
-                print(f"[*] 選擇匹配 {keyword} 的m3u8: {candidate}")
-                return candidate
-
-    for candidate in candidates:
-        lowered = candidate.lower()
-        if "ping" not in lowered and "analytics" not in lowered and "track" not in lowered:
-            print(f"[*] 選擇非追蹤m3u8: {candidate}")
-            return candidate
-
-    fallback = next(iter(candidates), None)
-    if fallback:
-        print(f"[*] 使用第一個找到的m3u8: {fallback}")
-    return fallback
-
+                span["outcome"] = "found" if video_sources else "miss"
+            if video_sources:
+                m3u8_url = video_sources[0]
+                first_candidate_after = time.time() - started
+                print(f"[*] 從JS提取到m3u8: {m3u8_url}")
+        except Exception as exc:
+            print(f"[!] JS提取m3u8失敗: {exc}")
+
+    return PageCapture(
+        m3u8_url=m3u8_url,
+        candidates=candidates,
+        first_candidate_after=first_candidate_after,
+        elapsed=time.time() - started,
+    )
@@ -1,14 +1,33 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
+import functools
+import itertools
 import os
-import queue
-import subprocess
 import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .adaptive import AdaptiveConcurrency, is_throttle
+from .hls import resolve_media_url
+from .httpclient import HttpClient
+from .index import DownloadIndex
+from .manifest import DownloadManifest, manifest_path_for
+from .metrics import get_metrics
+from .native import NativeEngineUnsupported, download_native
+from .planner import plan_downloads, print_plan
+from .profiles import OutputProfile, TranscodePool, parse_profiles, run_transcode
+from .progress import FfmpegError, ProgressTracker, run_ffmpeg_with_progress
+from .retry import CircuitBreaker, RetryPolicy
+from .scheduler import DownloadSlots, host_of, run_fair
+from .sources import open_task_source
+from .splitter import DEFAULT_SPLIT_THRESHOLD, download_split, plan_split
+
+ENGINES = ("ffmpeg", "native")
+DEFAULT_ADAPTIVE_CEILING = 32
 
 
 def _safe_print(lock: threading.Lock, message: str) -> None:
@@ -16,87 +35,354 @@ def _safe_print(lock: threading.Lock, message: str) -> None:
         print(message)
 
 
+def output_path_for(output_dir: str, output_filename: str) -> Path:
+    safe_filename = output_filename.replace("/", "_").replace("\\", "_").replace(":", "_")
+    return Path(output_dir) / f"{safe_filename}.aac"
+
+
 def download_aac_from_m3u8(
     m3u8_url: str,
     output_filename: str,
     *,
     output_dir: str = "output",
     print_lock: Optional[threading.Lock] = None,
+    engine: str = "ffmpeg",
+    http_client: Optional[HttpClient] = None,
+    segment_concurrency: int = 8,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+    progress: Optional[ProgressTracker] = None,
+    stall_timeout: float = 120.0,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    index: Optional[DownloadIndex] = None,
+    controller: Optional[AdaptiveConcurrency] = None,
+    outputs: Sequence[str] = (),
+    transcoder: Optional[TranscodePool] = None,
+    split_chunks: int = 0,
+    split_threshold: Optional[float] = DEFAULT_SPLIT_THRESHOLD,
+    tail: bool = False,
+    media_url: Optional[str] = None,
+    raise_errors: bool = False,
+    slots: Optional[DownloadSlots] = None,
 ) -> Tuple[bool, str]:
-    """Download a single m3u8 stream to AAC using ffmpeg."""
-    message = f"[*] Downloading: {output_filename}"
-    if print_lock:
-        _safe_print(print_lock, message)
-    else:
-        print(message)
+    """
+    Download a single m3u8 stream to AAC.
+
+    ``engine="ffmpeg"`` hands the whole job to one ffmpeg process.
+    ``engine="native"`` fetches segments concurrently over ``http_client`` and
+    extracts the AAC audio with the built-in demuxer (see :mod:`.tsdemux`),
+    remuxing locally with ffmpeg only when it cannot; streams it cannot
+    handle at all fall back to the ffmpeg engine automatically.
+
+    A sidecar manifest (``<name>.aac.manifest.jsonl``) records finished work:
+    outputs already completed from the same source are skipped without any
+    network I/O, and the native engine resumes interrupted downloads by
+    fetching only the segments that are missing.
+
+    Master playlists are inspected first so both engines download only the
+    rendition chosen by :func:`select_variant` (an audio-only rendition when
+    ``prefer_audio_only``, capped at ``max_bandwidth`` bits/s). ``media_url``
+    skips that step when the rendition was already resolved (e.g. by
+    :func:`plan_downloads`).
+
+    Progress (media time, bytes, speed) is streamed into ``progress``; an
+    ffmpeg run that makes no progress for ``stall_timeout`` seconds is killed.
+
+    Transient failures (stalls, timeouts, 5xx/429, dropped connections) are
+    retried according to ``retry_policy`` (three attempts with jittered
+    exponential backoff by default), while 403/404 and invalid input fail
+    immediately. ``breaker`` fails fast for CDN hosts that keep failing.
+
+    Finished outputs are recorded in ``index`` (source, size, duration and
+    checksum) so later runs can skip them; see :func:`_verified_in_index`.
+
+    ``controller`` receives the segment latencies and 429/503 responses seen
+    by this download so it can adapt the batch's concurrency.
+
+    ``outputs`` names extra output profiles (see :data:`PROFILES`, e.g.
+    ``("opus32k", "wav16k")``) encoded from the downloaded AAC, so the stream
+    is fetched only once. They are handed to ``transcoder`` when given,
+    otherwise encoded before returning; missing outputs of an already
+    complete download are created without any network I/O.
+
+    With ``split_chunks`` of 2 or more, the ffmpeg engine splits a stream of
+    at least ``split_threshold`` seconds (or, when ``tail`` says no other job
+    is waiting, of at least ten minutes) into that many contiguous segment
+    ranges fetched by parallel ffmpeg processes and joined losslessly with
+    the concat demuxer; see :func:`download_split`. The native engine already
+    fetches segments in parallel and ignores these options. With ``slots``
+    (the batch's :class:`DownloadSlots`) only as many ranges run at once as
+    the batch has slots to spare for the stream's host.
+
+    A failed download is logged and returns ``(False, output_filename)``; with
+    ``raise_errors`` the final error is raised after logging instead, so the
+    caller can classify it (see :func:`is_transient`).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {ENGINES}")
+    profiles = parse_profiles(outputs)
+
+    def log(text: str) -> None:
+        if print_lock:
+            _safe_print(print_lock, text)
+        else:
+            print(text)
+
+    log(f"[*] Downloading: {output_filename}")
 
+    metrics = get_metrics()
     start_time = time.time()
     os.makedirs(output_dir, exist_ok=True)
-    safe_filename = output_filename.replace("/", "_").replace("\\", "_").replace(":", "_")
-    output_path = Path(output_dir) / f"{safe_filename}.aac"
-
+    output_path = output_path_for(output_dir, output_filename)
+
+    manifest = DownloadManifest.load(manifest_path_for(output_path))
+    reason = index.verify(output_path, m3u8_url) if index is not None and manifest.complete else None
+    # An output that no longer matches its index entry is downloaded again and overwritten by the new one.
+    if manifest.is_complete_for(m3u8_url, output_path) and reason in (None, "not indexed"):
+        log(f"[*] Already complete, skipping: {output_path}")
+        metrics.incr("downloads", outcome="skipped")
+        if index is not None and reason is not None:
+            # Finished before the index existed (or by an older version): backfill it.
+            index.record(output_path, m3u8_url, sha256=(manifest.complete or {}).get("output_sha256"))
+        return _fan_out(output_path, profiles, transcoder, log), output_filename
+
+    if media_url:
+        source_url = media_url
+    else:
+        with metrics.span("playlist_select"):
+            source_url = _select_source(
+                m3u8_url,
+                output_filename,
+                client=http_client,
+                prefer_audio_only=prefer_audio_only,
+                max_bandwidth=max_bandwidth,
+                log=log,
+            )
+
+    split_playlist = None
+    if engine == "ffmpeg" and split_chunks > 1:
+        split_playlist = plan_split(
+            source_url,
+            output_filename,
+            client=http_client,
+            chunks=split_chunks,
+            threshold=split_threshold,
+            tail=tail,
+            log=log,
+        )
+
+    tracker = progress or ProgressTracker(print_lock=print_lock)
+    policy = retry_policy or RetryPolicy()
+    current_engine = [engine]
     cmd = (
-        "ffmpeg -y -threads auto "
+        "ffmpeg -y -nostats -threads auto "
         "-protocol_whitelist file,http,https,tcp,tls,crypto "
-        f'-i "{m3u8_url}" -vn -c:a copy -bsf:a aac_adtstoasc '
+        f'-i "{source_url}" -vn -c:a copy -bsf:a aac_adtstoasc '
         f'-progress pipe:1 "{output_path}"'
     )
 
-    if print_lock:
-        _safe_print(print_lock, f"[*] Running command: {cmd}")
-    else:
-        print(f"[*] Running command: {cmd}")
+    def attempt() -> None:
+        if current_engine[0] == "native":
+            tracker.start(output_filename)
+            try:
+                fetched = download_native(
+                    source_url,
+                    output_path,
+                    client=http_client,
+                    segment_concurrency=segment_concurrency,
+                    source=m3u8_url,
+                    on_progress=functools.partial(tracker.update, output_filename),
+                    on_latency=controller.record_latency if controller is not None else None,
+                    prefer_audio_only=prefer_audio_only,
+                    max_bandwidth=max_bandwidth,
+                )
+                log(f"[*] Native engine fetched {fetched / (1024 * 1024):.1f} MiB for {output_filename}")
+                metrics.incr("bytes_downloaded", fetched, engine="native")
+                return
+            except NativeEngineUnsupported as exc:
+                log(f"[!] Native engine cannot handle {output_filename} ({exc}); falling back to ffmpeg")
+                current_engine[0] = "ffmpeg"
+            finally:
+                tracker.finish(output_filename)
+
+        if split_playlist is not None:
+            download_split(
+                split_playlist,
+                output_path,
+                chunks=split_chunks,
+                name=output_filename,
+                tracker=tracker,
+                stall_timeout=stall_timeout,
+                slots=slots,
+                host=host_of(m3u8_url),
+            )
+            metrics.incr("bytes_downloaded", output_path.stat().st_size, engine="ffmpeg")
+            manifest.start(engine="ffmpeg", source=m3u8_url, media_url=source_url, chunks=split_chunks)
+            manifest.mark_complete(output_path)
+            return
+
+        log(f"[*] Running command: {cmd}")
+        tracker.start(output_filename)
+        try:
+            with metrics.span("ffmpeg_run") as span:
+                returncode, stderr_tail, stalled = run_ffmpeg_with_progress(
+                    cmd,
+                    name=output_filename,
+                    tracker=tracker,
+                    stall_timeout=stall_timeout,
+                )
+                span["outcome"] = "stalled" if stalled else "ok" if returncode == 0 else "failed"
+        finally:
+            tracker.finish(output_filename)
+        if returncode != 0 or stalled:
+            raise FfmpegError(returncode, stderr_tail, stalled=stalled)
+        metrics.incr("bytes_downloaded", output_path.stat().st_size, engine="ffmpeg")
+        manifest.start(engine="ffmpeg", source=m3u8_url, media_url=source_url)
+        manifest.mark_complete(output_path)
+
+    def observed_attempt() -> None:
+        try:
+            attempt()
+        except Exception as exc:
+            if controller is not None and is_throttle(exc):
+                controller.record_throttle()
+            raise
+
+    def on_retry(number: int, exc: BaseException, delay: float) -> None:
+        log(f"[!] {output_filename}: {exc}; retrying in {delay:.1f}s (attempt {number + 1}/{policy.max_attempts})")
+        metrics.incr("retries", stage="download", error=type(exc).__name__)
+
+    success = False
+    error: Optional[Exception] = None
+    error_text = ""
+    try:
+        policy.call(observed_attempt, host=host_of(source_url), breaker=breaker, on_retry=on_retry)
+        success = True
+    except FfmpegError as exc:
+        error, error_text = exc, f"{exc}\n{exc.stderr}"
+    except Exception as exc:
+        error, error_text = exc, str(exc)
 
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
     elapsed = time.time() - start_time
+    outcome = "ok" if success else "failed"
+    metrics.timing("download", elapsed, engine=current_engine[0], outcome=outcome)
+    metrics.incr("downloads", outcome=outcome)
 
-    if result.returncode == 0:
-        msg = f"[*] Download completed: {output_path} (took {elapsed:.2f}s)"
-        if print_lock:
-            _safe_print(print_lock, msg)
-        else:
-            print(msg)
-        return True, output_filename
+    if success:
+        log(f"[*] Download completed: {output_path} (took {elapsed:.2f}s)")
+        if index is not None:
+            completed = DownloadManifest.load(manifest_path_for(output_path)).complete or {}
+            index.record(output_path, m3u8_url, sha256=completed.get("output_sha256"))
+        return _fan_out(output_path, profiles, transcoder, log), output_filename
 
-    error_header = f"[!] Error downloading {output_filename}:"
-    if print_lock:
-        _safe_print(print_lock, error_header)
-        _safe_print(print_lock, f"[!] {result.stderr}")
-    else:
-        print(error_header)
-        print(f"[!] {result.stderr}")
+    log(f"[!] Error downloading {output_filename}:")
+    log(f"[!] {error_text}")
 
     with open("error_log.txt", "a", encoding="utf-8") as error_file:
         error_file.write(f"Error downloading {output_filename} at {datetime.datetime.now()}:\n")
-        error_file.write(f"{result.stderr}\n\n")
+        error_file.write(f"{error_text}\n\n")
 
+    if raise_errors and error is not None:
+        raise error
     return False, output_filename
 
 
+def _fan_out(
+    output_path: Path,
+    profiles: Sequence[OutputProfile],
+    transcoder: Optional[TranscodePool],
+    log: Callable[[str], None],
+) -> bool:
+    """Encode the extra outputs of a finished AAC, or queue them on ``transcoder``."""
+    if not profiles:
+        return True
+    if transcoder is not None:
+        transcoder.submit(output_path, profiles)
+        return True
+    return run_transcode(output_path, profiles, log=log)
+
+
+def _select_source(
+    m3u8_url: str,
+    output_filename: str,
+    *,
+    client: Optional[HttpClient],
+    prefer_audio_only: bool,
+    max_bandwidth: Optional[int],
+    log: Callable[[str], None],
+) -> str:
+    """Resolve a master playlist to the media playlist that should actually be fetched."""
+    if not prefer_audio_only and not max_bandwidth:
+        return m3u8_url
+
+    http = client or HttpClient()
+    try:
+        media_url, choice = resolve_media_url(
+            m3u8_url,
+            http,
+            prefer_audio_only=prefer_audio_only,
+            max_bandwidth=max_bandwidth,
+        )
+    except Exception as exc:
+        log(f"[!] Could not inspect playlist for {output_filename} ({exc}); using it as-is")
+        return m3u8_url
+    finally:
+        if client is None:
+            http.close()
+
+    if choice is not None:
+        savings = f", ~{choice.estimated_savings:.0%} less than the top variant" if choice.estimated_savings else ""
+        log(f"[*] Selected {choice.description} for {output_filename}{savings}")
+    return media_url
+
+
+def _verified_in_index(
+    index: DownloadIndex,
+    file_name: str,
+    m3u8_url: str,
+    output_dir: str,
+    log: Callable[[str], None],
+) -> bool:
+    """
+    True when the output for this row is indexed and still intact on disk.
+
+    An output that exists but no longer matches its entry (truncated, wrong
+    duration, other source) only needs downloading again: it is left in place
+    until a new download replaces it, so a row that turns out to be dead
+    (e.g. an expired URL) keeps its previous file.
+    """
+    output_path = output_path_for(output_dir, file_name)
+    reason = index.verify(output_path, m3u8_url)
+    if reason is None:
+        log(f"[*] Verified in index, skipping: {output_path}")
+        get_metrics().incr("downloads", outcome="skipped")
+        return True
+    if reason != "not indexed" and output_path.exists():
+        log(f"[!] {output_path} does not match the index ({reason}); downloading again")
+        get_metrics().incr("redownloads")
+    return False
+
+
 @dataclass
 class DownloadStats:
     successful: int = 0
     failed: int = 0
+    skipped: int = 0
+    transcode_failed: int = 0
 
 
-def _parse_csv_rows(csv_file: Path) -> Iterable[Tuple[str, str]]:
-    import csv
-
-    with csv_file.open("r", encoding="utf-8") as handle:
-        lines = [line for line in handle if not line.strip().startswith("//")]
-        reader = csv.DictReader(lines)
-        if not reader.fieldnames:
-            raise ValueError("CSV file is empty or missing headers.")
+def _parse_csv_rows(csv_file: Path) -> Iterator[Tuple[str, str]]:
+    """Stream ``(file, m3u8)`` pairs from a CSV, JSONL or SQLite task file, skipping ``//`` comments."""
+    source = open_task_source(csv_file)
+    # Any column whose name contains 'file' (e.g. 'file_name') holds the output name.
+    file_column = next((name for name in source.columns if name and "file" in name), None)
+    if file_column is None or "m3u8" not in source.columns:
+        raise ValueError("CSV must contain 'file' and 'm3u8' columns.")
 
-        # Normalize the first column name to 'file'
-        normalized = ["file" if name and "file" in name else name for name in reader.fieldnames]
-        reader.fieldnames = normalized
-
-        if "file" not in reader.fieldnames or "m3u8" not in reader.fieldnames:
-            raise ValueError("CSV must contain 'file' and 'm3u8' columns.")
-
-        for row in reader:
-            yield row.get("file", ""), row.get("m3u8", "")
+    for row in source:
+        if row.comment is None:
+            yield row.fields.get(file_column, ""), row.fields.get("m3u8", "")
 
 
 def download_from_csv(
@@ -104,56 +390,201 @@ def download_from_csv(
     *,
     max_threads: Optional[int] = None,
     output_dir: str = "output",
+    engine: str = "ffmpeg",
+    segment_concurrency: int = 8,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+    per_host_limit: Optional[int] = None,
+    stall_timeout: float = 120.0,
+    progress_interval: float = 10.0,
+    max_retries: int = 3,
+    verify_hash: bool = False,
+    adaptive: bool = False,
+    outputs: Sequence[str] = (),
+    transcode_workers: Optional[int] = None,
+    split_chunks: int = 0,
+    split_threshold: Optional[float] = DEFAULT_SPLIT_THRESHOLD,
+    preflight: bool = True,
+    plan_only: bool = False,
 ) -> DownloadStats:
-    """Download all m3u8 entries referenced in the provided CSV file."""
+    """
+    Download all m3u8 entries referenced in the provided CSV file.
+
+    With ``engine="native"`` all workers share one keep-alive HTTP client and
+    each stream fetches up to ``segment_concurrency`` segments in parallel.
+    ``prefer_audio_only`` and ``max_bandwidth`` control rendition selection for
+    master playlists (see :func:`download_aac_from_m3u8`).
+
+    Jobs are dispatched by an asyncio scheduler that keeps at most
+    ``max_threads`` downloads running overall and at most ``per_host_limit``
+    (default: no extra limit) against any one CDN host, rotating fairly
+    between hosts. A shared :class:`ProgressTracker` prints per-file and
+    aggregate throughput/ETA every ``progress_interval`` seconds.
+
+    Each file gets up to ``max_retries`` attempts for transient errors; a
+    shared :class:`CircuitBreaker` stops hammering a CDN host after repeated
+    failures so its remaining jobs fail fast instead of occupying workers.
+
+    Outputs recorded in the :class:`DownloadIndex` of ``output_dir`` are
+    checked (size and duration; also SHA-256 with ``verify_hash``) before
+    scheduling: intact ones are skipped and counted in ``stats.skipped``,
+    damaged ones are downloaded again and replaced once the new download
+    starts.
+
+    With ``adaptive`` an :class:`AdaptiveConcurrency` controller picks the
+    number of concurrent downloads from measured throughput, 429/503
+    responses and segment latency; ``max_threads`` is then its ceiling
+    (default :data:`DEFAULT_ADAPTIVE_CEILING`) instead of a fixed count.
+
+    ``outputs`` adds output profiles encoded from each AAC (see
+    :func:`download_aac_from_m3u8`). Encoding runs on a :class:`TranscodePool`
+    of ``transcode_workers`` single-threaded ffmpeg processes (default: one
+    per CPU core), separate from the download concurrency; outputs that
+    could not be encoded are counted in ``stats.transcode_failed``.
+
+    ``split_chunks`` and ``split_threshold`` split long streams into parallel
+    segment ranges (see :func:`download_aac_from_m3u8`); the last job to
+    start is split regardless of the threshold once it is ten minutes long,
+    so it does not keep the run going alone while the other slots sit idle.
+    Every range beyond the first takes a download slot of its own, so split
+    downloads stay within ``max_threads``, ``per_host_limit`` and the
+    adaptive limit.
+
+    With ``preflight`` every media playlist is fetched concurrently before
+    the first download starts (see :func:`plan_downloads`): jobs are queued
+    longest-first, so the longest stream does not start last and stretch the
+    run, and dead or expired URLs are reported and counted as failed without
+    taking a download slot. ``plan_only`` stops after printing the plan with
+    its estimated total bytes and run time for ``max_threads`` downloads.
+    """
     csv_path = Path(csv_file)
     if not csv_path.exists():
         raise FileNotFoundError(f"CSV file not found: {csv_file}")
+    profiles = parse_profiles(outputs)
 
-    max_threads = max_threads or min(os.cpu_count() or 1, 8)
+    if adaptive:
+        max_threads = max_threads or DEFAULT_ADAPTIVE_CEILING
+    else:
+        max_threads = max_threads or min(os.cpu_count() or 1, 8)
     print(f"[*] Reading CSV file: {csv_file}")
-    print(f"[*] Using {max_threads} parallel download threads")
+    print_lock = threading.Lock()
+    if adaptive:
+        print(f"[*] Adaptive concurrency: up to {max_threads} parallel downloads ({engine} engine)")
+    else:
+        print(f"[*] Using {max_threads} parallel download threads ({engine} engine)")
+    if per_host_limit:
+        print(f"[*] At most {per_host_limit} concurrent downloads per host")
+    transcoder: Optional[TranscodePool] = None
+    if profiles:
+        transcoder = TranscodePool(transcode_workers, log=functools.partial(_safe_print, print_lock))
+        names = ", ".join(profile.name for profile in profiles)
+        print(f"[*] Extra outputs: {names} ({transcoder.workers} transcode workers)")
 
     stats = DownloadStats()
-    tasks: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue()
-    results: List[Tuple[bool, str]] = []
-    print_lock = threading.Lock()
+    jobs: List[Tuple[str, str]] = []
+    http_client = HttpClient(max_idle_per_host=max_threads * segment_concurrency)
+    tracker = ProgressTracker(print_lock=print_lock, interval=progress_interval)
+    retry_policy = RetryPolicy(max_attempts=max_retries)
+    breaker = CircuitBreaker()
+    index = DownloadIndex(output_dir, verify_hash=verify_hash)
+    controller = (
+        AdaptiveConcurrency(tracker.total_bytes, ceiling=max_threads, log=functools.partial(_safe_print, print_lock))
+        if adaptive
+        else None
+    )
+    slots = DownloadSlots(max_threads, per_host_limit=per_host_limit, controller=controller)
 
     for file_name, m3u8_url in _parse_csv_rows(csv_path):
         if not m3u8_url:
             print(f"[!] No m3u8 URL provided for {file_name}, skipping.")
             stats.failed += 1
             continue
-        tasks.put((file_name, m3u8_url))
-
-    def worker() -> None:
-        while True:
-            try:
-                task = tasks.get(block=False)
-            except queue.Empty:
-                return
-            try:
-                if task is None:
-                    return
-                file_name, m3u8_url = task
-                success, filename = download_aac_from_m3u8(
-                    m3u8_url,
-                    file_name,
-                    output_dir=output_dir,
-                    print_lock=print_lock,
-                )
-                results.append((success, filename))
-            finally:
-                tasks.task_done()
-
-    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max_threads)]
-    for thread in threads:
-        thread.start()
-
-    tasks.join()
-
-    for thread in threads:
-        thread.join()
+        if _verified_in_index(index, file_name, m3u8_url, output_dir, print):
+            stats.skipped += 1
+            if transcoder is not None:
+                transcoder.submit(output_path_for(output_dir, file_name), profiles)
+            continue
+        jobs.append((file_name, m3u8_url))
+    if stats.skipped:
+        print(f"[*] {stats.skipped} outputs already complete and verified")
+
+    media_urls: Dict[Tuple[str, str], Optional[str]] = {}
+    if preflight or plan_only:
+        plan = plan_downloads(
+            jobs,
+            client=http_client,
+            concurrency=max_threads,
+            engine=engine,
+            segment_concurrency=segment_concurrency,
+            prefer_audio_only=prefer_audio_only,
+            max_bandwidth=max_bandwidth,
+        )
+        print_plan(plan)
+        if plan_only:
+            http_client.close()
+            index.close()
+            if transcoder is not None:
+                transcoder.close()
+            stats.failed += len(plan.dead)
+            return stats
+        stats.failed += len(plan.dead)
+        jobs = [(entry.name, entry.m3u8_url) for entry in plan.runnable]
+        media_urls = {(entry.name, entry.m3u8_url): entry.media_url for entry in plan.runnable}
+
+    dispatched = itertools.count(1)
+
+    def worker(job: Tuple[str, str]) -> Tuple[bool, str]:
+        file_name, m3u8_url = job
+        tail = next(dispatched) == len(jobs)
+        try:
+            return download_aac_from_m3u8(
+                m3u8_url,
+                file_name,
+                output_dir=output_dir,
+                print_lock=print_lock,
+                engine=engine,
+                http_client=http_client,
+                segment_concurrency=segment_concurrency,
+                prefer_audio_only=prefer_audio_only,
+                max_bandwidth=max_bandwidth,
+                progress=tracker,
+                stall_timeout=stall_timeout,
+                retry_policy=retry_policy,
+                breaker=breaker,
+                index=index,
+                controller=controller,
+                outputs=[profile.name for profile in profiles],
+                transcoder=transcoder,
+                split_chunks=split_chunks,
+                split_threshold=split_threshold,
+                tail=tail,
+                media_url=media_urls.get(job),
+                slots=slots,
+            )
+        except Exception as exc:
+            _safe_print(print_lock, f"[!] Unexpected error downloading {file_name}: {exc}")
+            return False, file_name
+
+    try:
+        results = asyncio.run(
+            run_fair(
+                jobs,
+                worker,
+                host=lambda job: host_of(job[1]),
+                max_concurrency=max_threads,
+                per_host_limit=per_host_limit,
+                controller=controller,
+                slots=slots,
+            )
+        )
+    finally:
+        http_client.close()
+        index.close()
+        if transcoder is not None:
+            _safe_print(print_lock, "[*] Waiting for transcodes to finish")
+            _ok, stats.transcode_failed = transcoder.wait()
+            transcoder.close()
+    tracker.maybe_report(force=True)
 
     for success, _filename in results:
         if success:
@@ -163,9 +594,12 @@ def download_from_csv(
 
     print("\n" + "=" * 50)
     print("[*] Download Summary:")
-    print(f"[*] Total files processed: {stats.successful + stats.failed}")
+    print(f"[*] Total files processed: {stats.successful + stats.failed + stats.skipped}")
     print(f"[*] Successfully downloaded: {stats.successful}")
+    print(f"[*] Skipped (already verified): {stats.skipped}")
     print(f"[*] Failed downloads: {stats.failed}")
+    if profiles:
+        print(f"[*] Failed transcodes: {stats.transcode_failed}")
     print("=" * 50)
     return stats
 
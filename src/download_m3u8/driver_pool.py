@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from selenium import webdriver as selenium_webdriver
+from seleniumwire import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from .capture import CAPTURE_BACKENDS, CapturedRequest, requests_from_performance_log
+from .metrics import get_metrics
+
+DRIVER_SCOPES: List[str] = [r".*\.m3u8.*", r".*/manifest.*", r".*jwplayer.*", r".*media.*"]
+
+
+def _build_chrome_options(headless: bool) -> Options:
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--log-level=3")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-browser-side-navigation")
+    chrome_options.add_argument("--disable-infobars")
+    chrome_options.add_argument("--disable-popup-blocking")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    return chrome_options
+
+
+def _build_seleniumwire_options(storage_dir: str) -> Dict[str, Any]:
+    return {
+        "disable_encoding": True,
+        "verify_ssl": False,
+        "suppress_connection_errors": True,
+        "connection_timeout": 10,
+        "connection_keep_alive": False,
+        "max_threads": 4,
+        "pool_connections": 10,
+        "pool_maxsize": 10,
+        "request_storage_base_dir": storage_dir,
+    }
+
+
+def _process_tree_rss(root_pid: int) -> int:
+    """Return the summed RSS in bytes of ``root_pid`` and its descendants (Linux only)."""
+    children: Dict[int, List[int]] = {}
+    rss_pages: Dict[int, int] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as handle:
+                stat = handle.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, so split after the closing parenthesis.
+        fields = stat[stat.rfind(")") + 2 :].split()
+        pid = int(entry)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss_pages[pid] = int(fields[21])
+
+    page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss_pages.get(pid, 0) * page_size
+        stack.extend(children.get(pid, []))
+    return total
+
+
+@dataclass
+class PooledDriver:
+    """
+    A long-lived Chrome driver together with its request capture state.
+
+    seleniumwire drivers push responses into a buffer from a response
+    interceptor as they arrive; CDP drivers drain the DevTools performance
+    log. Either way :meth:`poll_requests` returns only what is new.
+    """
+
+    driver: webdriver.Chrome
+    storage_dir: Optional[str] = None
+    capture: str = "seleniumwire"
+    created_at: float = field(default_factory=time.time)
+    pages: int = 0
+    _pending: List[CapturedRequest] = field(default_factory=list, repr=False)
+    _pending_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def _on_response(self, request: Any, response: Any) -> None:
+        captured = CapturedRequest(url=request.url, response={"status": response.status_code})
+        with self._pending_lock:
+            self._pending.append(captured)
+
+    def poll_requests(self) -> List[CapturedRequest]:
+        """Requests that received a response since the previous poll, oldest first."""
+        if self.capture == "cdp":
+            return requests_from_performance_log(self.driver.get_log("performance"))
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def reset(self) -> None:
+        """Forget captured requests and park the browser on a blank page."""
+        if self.capture == "cdp":
+            self.driver.get("about:blank")
+            self.driver.get_log("performance")
+            return
+        del self.driver.requests
+        self.driver.get("about:blank")
+        with self._pending_lock:
+            self._pending.clear()
+
+    def memory_usage(self) -> int:
+        service = getattr(self.driver, "service", None)
+        process = getattr(service, "process", None)
+        if process is None:
+            return 0
+        return _process_tree_rss(process.pid)
+
+
+class DriverPool:
+    """
+    Thread-safe pool of warm Chrome drivers.
+
+    With ``capture="seleniumwire"`` traffic goes through selenium-wire's
+    proxy and each driver owns an isolated request storage directory, so
+    workers never delete each other's files. ``capture="cdp"`` starts plain
+    Selenium drivers and reads network events from Chrome's DevTools
+    performance log instead: no proxy, no TLS interception and no disk
+    storage. Drivers are reset between pages and recycled after ``max_pages``
+    pages or once the browser process tree exceeds ``max_memory_mb``.
+
+    Parameters
+    ----------
+    size:
+        Maximum number of drivers alive at the same time.
+    headless:
+        Whether to run Chrome in headless mode.
+    max_pages:
+        Pages a driver may load before it is restarted.
+    max_memory_mb:
+        RSS threshold (browser and children) that triggers a restart. ``0`` disables the check.
+    page_load_timeout:
+        Page load timeout applied to every driver.
+    capture:
+        Network capture backend, one of :data:`CAPTURE_BACKENDS`.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        *,
+        headless: bool = True,
+        max_pages: int = 25,
+        max_memory_mb: int = 1024,
+        page_load_timeout: int = 20,
+        capture: str = "seleniumwire",
+    ) -> None:
+        if size < 1:
+            raise ValueError("DriverPool size must be at least 1.")
+        if capture not in CAPTURE_BACKENDS:
+            raise ValueError(f"Unknown capture backend {capture!r}; expected one of {CAPTURE_BACKENDS}")
+        self.size = size
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.page_load_timeout = page_load_timeout
+        self.capture = capture
+
+        self._idle: "queue.LifoQueue[PooledDriver]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._alive = 0
+        self._closed = False
+
+    def __enter__(self) -> "DriverPool":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[PooledDriver]:
+        """Borrow a driver for a single page; it is reset or recycled on release."""
+        pooled = self._acquire()
+        healthy = False
+        try:
+            yield pooled
+            healthy = True
+        finally:
+            self._release(pooled, healthy=healthy)
+
+    def close(self) -> None:
+        """Quit every idle driver and remove its storage directory."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(pooled, reason="pool closed")
+
+    def _acquire(self) -> PooledDriver:
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("DriverPool is closed.")
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                if self._alive < self.size:
+                    self._alive += 1
+                    break
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+        try:
+            with get_metrics().span("driver_start", capture=self.capture):
+                return self._spawn()
+        except Exception:
+            with self._lock:
+                self._alive -= 1
+            raise
+
+    def _spawn(self) -> PooledDriver:
+        if self.capture == "cdp":
+            options = _build_chrome_options(self.headless)
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            driver = selenium_webdriver.Chrome(options=options)
+            driver.set_page_load_timeout(self.page_load_timeout)
+            print("[*] 已啟動新的 Chrome driver (CDP 網路事件)")
+            return PooledDriver(driver=driver, capture="cdp")
+
+        storage_dir = tempfile.mkdtemp(prefix="seleniumwire-")
+        try:
+            driver = webdriver.Chrome(
+                options=_build_chrome_options(self.headless),
+                seleniumwire_options=_build_seleniumwire_options(storage_dir),
+            )
+        except Exception:
+            shutil.rmtree(storage_dir, ignore_errors=True)
+            raise
+        driver.set_page_load_timeout(self.page_load_timeout)
+        driver.scopes = DRIVER_SCOPES
+        pooled = PooledDriver(driver=driver, storage_dir=storage_dir)
+        driver.response_interceptor = pooled._on_response
+        print(f"[*] 已啟動新的 Chrome driver (儲存目錄: {storage_dir})")
+        return pooled
+
+    def _release(self, pooled: PooledDriver, *, healthy: bool) -> None:
+        pooled.pages += 1
+        reason = self._recycle_reason(pooled) if healthy else "lease failed"
+        if reason is None:
+            try:
+                pooled.reset()
+            except Exception as exc:
+                reason = f"reset failed: {exc}"
+
+        with self._lock:
+            closed = self._closed
+        if reason is None and not closed:
+            self._idle.put(pooled)
+            return
+        self._retire(pooled, reason=reason or "pool closed")
+
+    def _recycle_reason(self, pooled: PooledDriver) -> Optional[str]:
+        if self.max_pages and pooled.pages >= self.max_pages:
+            return f"reached {pooled.pages} pages"
+        if self.max_memory_mb:
+            usage_mb = pooled.memory_usage() / (1024 * 1024)
+            if usage_mb > self.max_memory_mb:
+                return f"memory {usage_mb:.0f} MB > {self.max_memory_mb} MB"
+        return None
+
+    def _retire(self, pooled: PooledDriver, *, reason: str) -> None:
+        print(f"[*] 回收 Chrome driver ({reason})")
+        get_metrics().incr("driver_retired", capture=pooled.capture)
+        if pooled.capture == "seleniumwire":
+            try:
+                del pooled.driver.requests
+            except Exception:
+                pass
+        try:
+            pooled.driver.quit()
+        except Exception as exc:  # pragma: no cover - best effort cleanup
+            print(f"[!] 關閉 driver 時發生錯誤: {exc}")
+        if pooled.storage_dir:
+            shutil.rmtree(pooled.storage_dir, ignore_errors=True)
+        with self._lock:
+            self._alive -= 1
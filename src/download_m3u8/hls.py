@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from .httpclient import HttpClient
+
+_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_VIDEO_CODEC_PREFIXES = ("avc1", "avc3", "hvc1", "hev1", "vp09", "vp8", "av01", "mp4v", "dvh1", "dvhe")
+_AUDIO_CODEC_PREFIXES = ("mp4a",)
+
+
+class PlaylistError(ValueError):
+    """Raised when a document is not a usable HLS playlist."""
+
+
+@dataclass
+class Segment:
+    uri: str
+    duration: float
+    sequence: int
+    byterange: Optional[Tuple[int, int]] = None  # (length, offset)
+    key_method: Optional[str] = None
+    init_section: Optional[str] = None
+
+    @property
+    def encrypted(self) -> bool:
+        return bool(self.key_method) and self.key_method != "NONE"
+
+
+@dataclass
+class MediaPlaylist:
+    url: str
+    segments: List[Segment] = field(default_factory=list)
+    target_duration: float = 0.0
+    media_sequence: int = 0
+    endlist: bool = False
+
+    @property
+    def duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    @property
+    def encrypted(self) -> bool:
+        return any(segment.encrypted for segment in self.segments)
+
+
+@dataclass
+class Variant:
+    uri: str
+    bandwidth: int = 0
+    codecs: str = ""
+    resolution: str = ""
+    audio: str = ""
+
+    @property
+    def codec_list(self) -> List[str]:
+        return [codec.strip().lower() for codec in self.codecs.split(",") if codec.strip()]
+
+    @property
+    def has_video(self) -> bool:
+        if not self.codec_list:
+            return bool(self.resolution)
+        return any(codec.startswith(_VIDEO_CODEC_PREFIXES) for codec in self.codec_list)
+
+    @property
+    def has_aac(self) -> bool:
+        # Without CODECS we cannot tell, so assume the variant carries AAC audio.
+        return not self.codec_list or any(codec.startswith(_AUDIO_CODEC_PREFIXES) for codec in self.codec_list)
+
+
+@dataclass
+class Rendition:
+    type: str
+    group_id: str
+    uri: Optional[str] = None
+    name: str = ""
+    language: str = ""
+    default: bool = False
+
+
+@dataclass
+class MasterPlaylist:
+    url: str
+    variants: List[Variant] = field(default_factory=list)
+    renditions: List[Rendition] = field(default_factory=list)
+
+
+Playlist = Union[MasterPlaylist, MediaPlaylist]
+
+
+@dataclass
+class VariantChoice:
+    """The media playlist picked from a master playlist and why."""
+
+    uri: str
+    description: str
+    bandwidth: int = 0
+    top_bandwidth: int = 0
+
+    @property
+    def estimated_savings(self) -> float:
+        """Fraction of bandwidth saved compared with the highest-bandwidth variant."""
+        if not self.bandwidth or not self.top_bandwidth:
+            return 0.0
+        return max(0.0, 1 - self.bandwidth / self.top_bandwidth)
+
+
+def _parse_attributes(value: str) -> Dict[str, str]:
+    return {key: raw.strip('"') for key, raw in _ATTRIBUTE_RE.findall(value)}
+
+
+def parse_playlist(text: str, url: str) -> Playlist:
+    """Parse an m3u8 document; relative URIs are resolved against ``url``."""
+    lines = [line.strip() for line in text.lstrip("\ufeff").splitlines() if line.strip()]
+    if not lines or not lines[0].startswith("#EXTM3U"):
+        raise PlaylistError(f"Not an m3u8 playlist: {url}")
+
+    if any(line.startswith("#EXT-X-STREAM-INF") for line in lines):
+        return _parse_master(lines, url)
+    return _parse_media(lines, url)
+
+
+def _parse_master(lines: List[str], url: str) -> MasterPlaylist:
+    master = MasterPlaylist(url=url)
+    pending: Optional[Dict[str, str]] = None
+    for line in lines:
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            pending = _parse_attributes(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-MEDIA:"):
+            attrs = _parse_attributes(line.split(":", 1)[1])
+            master.renditions.append(
+                Rendition(
+                    type=attrs.get("TYPE", ""),
+                    group_id=attrs.get("GROUP-ID", ""),
+                    uri=urljoin(url, attrs["URI"]) if attrs.get("URI") else None,
+                    name=attrs.get("NAME", ""),
+                    language=attrs.get("LANGUAGE", ""),
+                    default=attrs.get("DEFAULT", "").upper() == "YES",
+                )
+            )
+        elif not line.startswith("#") and pending is not None:
+            master.variants.append(
+                Variant(
+                    uri=urljoin(url, line),
+                    bandwidth=int(pending.get("BANDWIDTH", "0") or 0),
+                    codecs=pending.get("CODECS", ""),
+                    resolution=pending.get("RESOLUTION", ""),
+                    audio=pending.get("AUDIO", ""),
+                )
+            )
+            pending = None
+    return master
+
+
+def _parse_media(lines: List[str], url: str) -> MediaPlaylist:
+    playlist = MediaPlaylist(url=url)
+    duration = 0.0
+    byterange: Optional[Tuple[int, int]] = None
+    next_offset = 0
+    key_method: Optional[str] = None
+    init_section: Optional[str] = None
+
+    for line in lines:
+        if line.startswith("#EXT-X-TARGETDURATION:"):
+            playlist.target_duration = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            playlist.media_sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXTINF:"):
+            duration = float(line.split(":", 1)[1].split(",", 1)[0] or 0)
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            length, _, offset = line.split(":", 1)[1].partition("@")
+            start = int(offset) if offset else next_offset
+            byterange = (int(length), start)
+            next_offset = start + int(length)
+        elif line.startswith("#EXT-X-KEY:"):
+            key_method = _parse_attributes(line.split(":", 1)[1]).get("METHOD")
+        elif line.startswith("#EXT-X-MAP:"):
+            attrs = _parse_attributes(line.split(":", 1)[1])
+            init_section = urljoin(url, attrs["URI"]) if attrs.get("URI") else None
+        elif line.startswith("#EXT-X-ENDLIST"):
+            playlist.endlist = True
+        elif not line.startswith("#"):
+            playlist.segments.append(
+                Segment(
+                    uri=urljoin(url, line),
+                    duration=duration,
+                    sequence=playlist.media_sequence + len(playlist.segments),
+                    byterange=byterange,
+                    key_method=key_method,
+                    init_section=init_section,
+                )
+            )
+            duration = 0.0
+            byterange = None
+    return playlist
+
+
+def fetch_playlist(url: str, client: HttpClient) -> Playlist:
+    response = client.get(url).raise_for_status()
+    return parse_playlist(response.text, response.url)
+
+
+def select_variant(
+    master: MasterPlaylist,
+    *,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+) -> VariantChoice:
+    """
+    Pick the media playlist to download from ``master``.
+
+    With ``prefer_audio_only`` an ``EXT-X-MEDIA TYPE=AUDIO`` rendition wins
+    (``DEFAULT=YES`` first); otherwise the lowest-bandwidth variant carrying
+    AAC audio is used. Without it the highest-bandwidth variant is used, which
+    mirrors ffmpeg's own choice. ``max_bandwidth`` (bits/s) caps the variants
+    considered whenever at least one fits under it.
+    """
+    if not master.variants and not master.renditions:
+        raise PlaylistError(f"Master playlist has no variants: {master.url}")
+    top_bandwidth = max((variant.bandwidth for variant in master.variants), default=0)
+
+    if prefer_audio_only:
+        audio_renditions = [r for r in master.renditions if r.type.upper() == "AUDIO" and r.uri]
+        if audio_renditions:
+            rendition = next((r for r in audio_renditions if r.default), audio_renditions[0])
+            label = rendition.name or rendition.language or rendition.group_id
+            return VariantChoice(
+                uri=rendition.uri or "",
+                description=f"audio rendition '{label}' (group {rendition.group_id})",
+                top_bandwidth=top_bandwidth,
+            )
+
+    candidates = [variant for variant in master.variants if variant.has_aac] or list(master.variants)
+    if not candidates:
+        raise PlaylistError(f"Master playlist has no usable variants: {master.url}")
+    if max_bandwidth:
+        capped = [variant for variant in candidates if variant.bandwidth <= max_bandwidth]
+        candidates = capped or [min(candidates, key=lambda variant: variant.bandwidth)]
+
+    if prefer_audio_only:
+        chosen = min(candidates, key=lambda variant: (variant.has_video, variant.bandwidth))
+    else:
+        chosen = max(candidates, key=lambda variant: variant.bandwidth)
+    kind = "video+audio" if chosen.has_video else "audio-only"
+    details = ", ".join(part for part in (chosen.codecs, chosen.resolution) if part)
+    return VariantChoice(
+        uri=chosen.uri,
+        description=f"{kind} variant {chosen.bandwidth // 1000} kbps" + (f" ({details})" if details else ""),
+        bandwidth=chosen.bandwidth,
+        top_bandwidth=top_bandwidth,
+    )
+
+
+def resolve_media_url(
+    url: str,
+    client: HttpClient,
+    *,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+) -> Tuple[str, Optional[VariantChoice]]:
+    """Return the media playlist URL for ``url`` and the variant choice if it was a master playlist."""
+    playlist = fetch_playlist(url, client)
+    if isinstance(playlist, MediaPlaylist):
+        return playlist.url, None
+    choice = select_variant(playlist, prefer_audio_only=prefer_audio_only, max_bandwidth=max_bandwidth)
+    return choice.uri, choice
+
+
+def load_media_playlist(
+    url: str,
+    client: HttpClient,
+    *,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+) -> MediaPlaylist:
+    """Fetch ``url``; when it is a master playlist, follow the variant chosen by :func:`select_variant`."""
+    playlist = fetch_playlist(url, client)
+    if isinstance(playlist, MediaPlaylist):
+        return playlist
+    choice = select_variant(playlist, prefer_audio_only=prefer_audio_only, max_bandwidth=max_bandwidth)
+    media = fetch_playlist(choice.uri, client)
+    if not isinstance(media, MediaPlaylist):
+        raise PlaylistError(f"Variant is not a media playlist: {choice.uri}")
+    return media
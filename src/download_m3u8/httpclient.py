@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import gzip
+import http.client
+import ssl
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0 Safari/537.36"
+)
+
+_HostKey = Tuple[str, str, int]
+
+
+class HttpError(Exception):
+    """Raised when a request ends with a non-2xx status code."""
+
+    def __init__(self, url: str, status: int, reason: str = "") -> None:
+        super().__init__(f"HTTP {status} {reason} for {url}".strip())
+        self.url = url
+        self.status = status
+        self.reason = reason
+
+
+class TooManyRedirects(Exception):
+    """Raised when a request is still being redirected after ``max_redirects`` hops (usually a redirect loop)."""
+
+    def __init__(self, url: str, location: str, redirects: int) -> None:
+        super().__init__(f"Too many redirects ({redirects}) for {url}, last location {location}")
+        self.url = url
+        self.location = location
+        self.redirects = redirects
+
+
+@dataclass
+class HttpResponse:
+    url: str
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def text(self) -> str:
+        content_type = self.headers.get("content-type", "")
+        charset = "utf-8"
+        if "charset=" in content_type:
+            charset = content_type.split("charset=", 1)[1].split(";", 1)[0].strip() or charset
+        return self.body.decode(charset, errors="replace")
+
+    def raise_for_status(self) -> "HttpResponse":
+        if not self.ok:
+            raise HttpError(self.url, self.status)
+        return self
+
+
+class HttpClient:
+    """
+    Small thread-safe HTTP/1.1 client with per-host keep-alive connection reuse.
+
+    Only the standard library is used so the client can run on every worker
+    node without extra dependencies. Redirects are followed and gzip/deflate
+    bodies are decoded transparently.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = 10.0,
+        max_idle_per_host: int = 8,
+        max_redirects: int = 5,
+        user_agent: str = DEFAULT_USER_AGENT,
+        verify_ssl: bool = True,
+    ) -> None:
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.max_redirects = max_redirects
+        self.user_agent = user_agent
+        self._ssl_context = ssl.create_default_context()
+        if not verify_ssl:
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+        self._idle: Dict[_HostKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "HttpClient":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def get(self, url: str, *, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        """Fetch ``url`` and return the fully read, decoded response."""
+        current = url
+        for _ in range(self.max_redirects + 1):
+            response = self._request("GET", current, headers or {})
+            location = response.headers.get("location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                current = urljoin(current, location)
+                continue
+            return response
+        raise TooManyRedirects(url, current, self.max_redirects)
+
+    def close(self) -> None:
+        with self._lock:
+            connections = [conn for pool in self._idle.values() for conn in pool]
+            self._idle.clear()
+        for conn in connections:
+            conn.close()
+
+    def _request(self, method: str, url: str, headers: Dict[str, str]) -> HttpResponse:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key: _HostKey = (parts.scheme, parts.hostname or "", port)
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+
+        request_headers = {
+            "User-Agent": self.user_agent,
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        }
+        request_headers.update(headers)
+
+        # A pooled connection may have been closed by the server while idle;
+        # retry once on a fresh connection in that case.
+        for attempt in range(2):
+            conn, reused = self._checkout(key)
+            try:
+                conn.request(method, target, headers=request_headers)
+                raw = conn.getresponse()
+                body = raw.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            response_headers = {name.lower(): value for name, value in raw.getheaders()}
+            if raw.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return HttpResponse(
+                url=url,
+                status=raw.status,
+                headers=response_headers,
+                body=_decode_body(body, response_headers.get("content-encoding", "")),
+            )
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    def _checkout(self, key: _HostKey) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            pool = self._idle.get(key)
+            if pool:
+                return pool.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+    def _checkin(self, key: _HostKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            pool = self._idle.setdefault(key, [])
+            if len(pool) < self.max_idle_per_host:
+                pool.append(conn)
+                return
+        conn.close()
+
+
+def _decode_body(body: bytes, encoding: str) -> bytes:
+    encoding = encoding.lower().strip()
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
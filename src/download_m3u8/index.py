@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from .manifest import file_sha256
+
+INDEX_FILENAME = ".download_index.sqlite3"
+DURATION_TOLERANCE = 0.05
+
+_ADTS_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+
+def source_key(m3u8_url: str) -> str:
+    """Compare sources without their query string, which usually holds an expiring CDN token."""
+    parts = urlsplit(m3u8_url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, "", ""))
+
+
+def adts_duration(path: Path) -> Optional[float]:
+    """
+    Duration in seconds of a raw ADTS AAC file, from its frame headers.
+
+    Returns ``None`` when the file is not a clean ADTS stream, including a
+    final frame cut short by an interrupted write.
+    """
+    size = path.stat().st_size
+    seconds = 0.0
+    with open(path, "rb") as handle:
+        while True:
+            header = handle.read(7)
+            if not header:
+                break
+            if len(header) < 7 or header[0] != 0xFF or header[1] & 0xF6 != 0xF0:
+                return None
+            rate_index = (header[2] >> 2) & 0x0F
+            frame_length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+            if rate_index >= len(_ADTS_SAMPLE_RATES) or frame_length < 7:
+                return None
+            seconds += 1024 * ((header[6] & 0x03) + 1) / _ADTS_SAMPLE_RATES[rate_index]
+            handle.seek(frame_length - 7, os.SEEK_CUR)
+        if handle.tell() != size:
+            return None
+    return seconds
+
+
+def probe_duration(path: Path) -> Optional[float]:
+    """Media duration of ``path``: parsed directly for ADTS, otherwise via ffprobe when installed."""
+    try:
+        duration = adts_duration(path)
+    except OSError:
+        return None
+    if duration is not None or not shutil.which("ffprobe"):
+        return duration
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        capture_output=True,
+        text=True,
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+@dataclass
+class IndexEntry:
+    name: str
+    source: str
+    size: int
+    duration: Optional[float]
+    sha256: str
+    completed_at: float
+
+
+class DownloadIndex:
+    """
+    SQLite index of finished outputs in one output directory.
+
+    For every output file it records the source m3u8, byte size, media
+    duration and SHA-256. :meth:`verify` checks an output against its entry
+    so a re-run skips files that are still intact and redoes the rest.
+    """
+
+    def __init__(self, output_dir: os.PathLike, *, verify_hash: bool = False) -> None:
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / INDEX_FILENAME
+        self.verify_hash = verify_hash
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outputs (
+                    name TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    duration REAL,
+                    sha256 TEXT NOT NULL,
+                    completed_at REAL NOT NULL
+                )
+                """
+            )
+
+    def __enter__(self) -> "DownloadIndex":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def get(self, output_path: Path) -> Optional[IndexEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, source, size, duration, sha256, completed_at FROM outputs WHERE name = ?",
+                (output_path.name,),
+            ).fetchone()
+        return IndexEntry(*row) if row else None
+
+    def verify(self, output_path: Path, m3u8_url: str) -> Optional[str]:
+        """
+        Check ``output_path`` against its index entry.
+
+        Returns ``None`` when the file is verified and can be skipped, otherwise
+        the reason it has to be downloaded (again).
+        """
+        entry = self.get(output_path)
+        if entry is None:
+            return "not indexed"
+        if entry.source != source_key(m3u8_url):
+            return "different source"
+        try:
+            size = output_path.stat().st_size
+        except OSError:
+            return "file missing"
+        if size != entry.size:
+            return f"size {size} != {entry.size}"
+        if entry.duration is not None:
+            duration = probe_duration(output_path)
+            if duration is None or abs(duration - entry.duration) > DURATION_TOLERANCE:
+                return "duration mismatch" if duration is not None else "unreadable media"
+        if self.verify_hash and file_sha256(output_path) != entry.sha256:
+            return "checksum mismatch"
+        return None
+
+    def record(self, output_path: Path, m3u8_url: str, *, sha256: Optional[str] = None) -> IndexEntry:
+        entry = IndexEntry(
+            name=output_path.name,
+            source=source_key(m3u8_url),
+            size=output_path.stat().st_size,
+            duration=probe_duration(output_path),
+            sha256=sha256 or file_sha256(output_path),
+            completed_at=time.time(),
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs (name, source, size, duration, sha256, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.name, entry.source, entry.size, entry.duration, entry.sha256, entry.completed_at),
+            )
+        return entry
+
+    def forget(self, output_path: Path) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outputs WHERE name = ?", (output_path.name,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
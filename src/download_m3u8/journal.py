@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, TextIO
+
+
+def journal_path_for(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".journal.jsonl")
+
+
+@dataclass
+class JournalEntry:
+    row: int
+    url: str
+    m3u8: str
+    error: str = ""
+
+
+class ResultJournal:
+    """
+    Append-only JSONL log of finished ``process_csv`` rows.
+
+    Every result is appended and flushed as soon as it arrives, so the cost
+    per row is constant and an interrupted run can replay exactly which rows
+    finished, regardless of the order in which they completed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._handle: Optional[TextIO] = None
+
+    def __enter__(self) -> "ResultJournal":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def replay(self) -> Dict[int, JournalEntry]:
+        """Return the last recorded entry per row; a torn trailing line is ignored."""
+        entries: Dict[int, JournalEntry] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                    entries[int(record["row"])] = JournalEntry(
+                        int(record["row"]), record["url"], record["m3u8"], record.get("error", "")
+                    )
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return entries
+
+    def append(self, row: int, url: str, m3u8: str, error: str = "") -> None:
+        record = {"row": row, "url": url, "m3u8": m3u8, "ts": time.time()}
+        if error:
+            record["error"] = error
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._handle is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._handle = open(self.path, "a", encoding="utf-8")
+            self._handle.write(line + "\n")
+            self._handle.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def remove(self) -> None:
+        self.close()
+        if self.path.exists():
+            os.remove(self.path)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path_for(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".manifest.jsonl")
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class SegmentRecord:
+    index: int
+    size: int
+    sha256: str
+
+
+@dataclass
+class DownloadManifest:
+    """
+    Append-only sidecar manifest for one output file.
+
+    The first line is a header describing the source; every finished segment
+    appends one record, and a final ``complete`` record stores the size and
+    checksum of the assembled output. Appending keeps the cost per segment
+    constant regardless of stream length.
+    """
+
+    path: Path
+    header: Dict[str, Any] = field(default_factory=dict)
+    segments: Dict[int, SegmentRecord] = field(default_factory=dict)
+    complete: Optional[Dict[str, Any]] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "DownloadManifest":
+        manifest = cls(path=path)
+        if not path.exists():
+            return manifest
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted write; everything before it is valid.
+                    continue
+                kind = record.get("type")
+                if kind == "header":
+                    manifest.header = record
+                elif kind == "segment":
+                    manifest.segments[record["index"]] = SegmentRecord(
+                        record["index"], record["size"], record["sha256"]
+                    )
+                elif kind == "complete":
+                    manifest.complete = record
+        return manifest
+
+    def is_complete_for(self, source: str, output_path: Path) -> bool:
+        """True when ``output_path`` was fully produced from ``source`` and still has its recorded size."""
+        if not self.complete or self.header.get("source") != source:
+            return False
+        try:
+            return output_path.stat().st_size == self.complete.get("output_size")
+        except OSError:
+            return False
+
+    def start(self, **header: Any) -> None:
+        """Begin a fresh manifest, discarding any previous records."""
+        self.header = {"type": "header", "version": MANIFEST_VERSION, **header}
+        self.segments.clear()
+        self.complete = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path, "w", encoding="utf-8") as handle:
+            handle.write(json.dumps(self.header) + "\n")
+
+    def record_segment(self, index: int, size: int, sha256: str) -> None:
+        record = SegmentRecord(index, size, sha256)
+        self._append({"type": "segment", "index": index, "size": size, "sha256": sha256})
+        self.segments[index] = record
+
+    def mark_complete(self, output_path: Path) -> None:
+        self.complete = {
+            "type": "complete",
+            "output_size": output_path.stat().st_size,
+            "output_sha256": file_sha256(output_path),
+        }
+        self._append(self.complete)
+
+    def remove(self) -> None:
+        if self.path.exists():
+            os.remove(self.path)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record) + "\n")
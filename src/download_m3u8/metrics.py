@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+METRIC_PREFIX = "download_m3u8"
+SINK_KINDS = ("none", "jsonl", "prometheus")
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _freeze(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+class NullSink:
+    """Discards every measurement; the default, so instrumentation is nearly free when unused."""
+
+    def record(self, kind: str, name: str, value: float, labels: Labels) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlSink(NullSink):
+    """
+    Append one JSON object per measurement to ``path``.
+
+    Each line carries a timestamp, pid and thread name so interleaved
+    workers can be separated afterwards. Lines are written with a single
+    ``write`` on an append-mode handle, so several processes may share a file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._handle = open(self.path, "a", encoding="utf-8")
+
+    def record(self, kind: str, name: str, value: float, labels: Labels) -> None:
+        line = json.dumps(
+            {
+                "ts": round(time.time(), 3),
+                "kind": kind,
+                "name": name,
+                "value": round(value, 6),
+                "labels": dict(labels),
+                "pid": os.getpid(),
+                "thread": threading.current_thread().name,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            if self._handle.closed:
+                return
+            self._handle.write(line + "\n")
+            self._handle.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._handle.close()
+
+
+class PrometheusTextfileSink(NullSink):
+    """
+    Aggregate counters and histograms and expose them as a Prometheus textfile.
+
+    The file is rewritten atomically (temp file + rename) at most every
+    ``write_interval`` seconds and on close, which is the format node_exporter's
+    textfile collector expects. Spans become ``<name>_seconds`` histograms,
+    counters get a ``_total`` suffix and gauges keep their last value.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        write_interval: float = 10.0,
+        const_labels: Optional[Dict[str, object]] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.buckets = buckets
+        self.write_interval = write_interval
+        self._const_labels = _freeze(const_labels or {})
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._last_write = 0.0
+
+    def record(self, kind: str, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            if kind == "counter":
+                key = (f"{name}_total", labels)
+                self._counters[key] = self._counters.get(key, 0.0) + value
+            elif kind == "gauge":
+                self._gauges[(name, labels)] = value
+            else:
+                key = (f"{name}_seconds" if kind == "span" else name, labels)
+                # Per-bucket counts, then sum and count.
+                state = self._histograms.setdefault(key, [0.0] * (len(self.buckets) + 2))
+                for index, bound in enumerate(self.buckets):
+                    if value <= bound:
+                        state[index] += 1
+                        break
+                state[-2] += value
+                state[-1] += 1
+            due = time.time() - self._last_write >= self.write_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._last_write = time.time()
+            text = self._render()
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        self.flush()
+
+    def _format_labels(self, labels: Labels, extra: Labels = ()) -> str:
+        pairs = self._const_labels + labels + extra
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def _render(self) -> str:
+        lines: List[str] = []
+        typed = set()
+        for (name, labels), value in sorted(self._counters.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._format_labels(labels)} {value:g}")
+        for (name, labels), value in sorted(self._gauges.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{self._format_labels(labels)} {value:g}")
+        for (name, labels), state in sorted(self._histograms.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{metric}_bucket{self._format_labels(labels, (('le', f'{bound:g}'),))} {cumulative:g}")
+            lines.append(f"{metric}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {state[-1]:g}")
+            lines.append(f"{metric}_sum{self._format_labels(labels)} {state[-2]:.6f}")
+            lines.append(f"{metric}_count{self._format_labels(labels)} {state[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """
+    Structured instrumentation: spans (timed phases), counters, gauges and histograms.
+
+    Everything is forwarded to a sink; ``spec`` is the ``kind:path`` string the
+    sink was built from so worker processes can build their own.
+    """
+
+    def __init__(self, sink: Optional[NullSink] = None, *, spec: Optional[str] = None) -> None:
+        self.sink = sink or NullSink()
+        self.spec = spec
+
+    def incr(self, name: str, value: float = 1, **labels: object) -> None:
+        self.sink.record("counter", name, value, _freeze(labels))
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        self.sink.record("histogram", name, value, _freeze(labels))
+
+    def gauge(self, name: str, value: float, **labels: object) -> None:
+        self.sink.record("gauge", name, value, _freeze(labels))
+
+    def timing(self, name: str, seconds: float, **labels: object) -> None:
+        """Record a span whose duration was measured by the caller."""
+        self.sink.record("span", name, seconds, _freeze(labels))
+
+    @contextlib.contextmanager
+    def span(self, name: str, **labels: object) -> Iterator[Dict[str, object]]:
+        """
+        Time the enclosed block as phase ``name``.
+
+        The yielded dict holds the labels; callers may add to it (e.g. an
+        ``outcome``) before the block ends. A block that raises is recorded
+        with ``outcome="error"`` unless an outcome was already set.
+        """
+        started = time.perf_counter()
+        span_labels: Dict[str, object] = dict(labels)
+        try:
+            yield span_labels
+        except BaseException:
+            span_labels.setdefault("outcome", "error")
+            raise
+        finally:
+            self.sink.record("span", name, time.perf_counter() - started, _freeze(span_labels))
+
+    def close(self) -> None:
+        self.sink.close()
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide :class:`Metrics` (a no-op sink unless configured)."""
+    return _metrics
+
+
+def configure_metrics(spec: Optional[str], *, per_process: bool = False) -> Metrics:
+    """
+    Install the process-wide metrics sink described by ``spec``.
+
+    ``spec`` is ``"jsonl:<path>"``, ``"prometheus:<path>"`` or ``None``/``"none"``.
+    With ``per_process`` (used by worker processes) a Prometheus textfile is
+    written to ``<stem>.<pid><suffix>`` with a ``pid`` label so workers don't
+    overwrite each other's files; JSONL sinks share the same file.
+    """
+    global _metrics
+
+    kind, _, path = (spec or "none").partition(":")
+    if kind not in SINK_KINDS:
+        raise ValueError(f"Unknown metrics sink {kind!r}; expected one of {SINK_KINDS}")
+    if kind != "none" and not path:
+        raise ValueError(f"Metrics sink {kind!r} needs a path, e.g. {kind}:metrics.out")
+
+    if kind == "jsonl":
+        sink: NullSink = JsonlSink(path)
+    elif kind == "prometheus":
+        if per_process:
+            target = Path(path)
+            pid = os.getpid()
+            worker_path = target.with_name(f"{target.stem}.{pid}{target.suffix}")
+            sink = PrometheusTextfileSink(str(worker_path), const_labels={"pid": pid})
+        else:
+            sink = PrometheusTextfileSink(path)
+    else:
+        sink = NullSink()
+
+    _metrics.close()
+    _metrics = Metrics(sink, spec=spec if kind != "none" else None)
+    return _metrics
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import concurrent.futures
+import hashlib
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .hls import MediaPlaylist, Segment, load_media_playlist
+from .httpclient import HttpClient
+from .manifest import DownloadManifest, file_sha256, manifest_path_for
+from .metrics import get_metrics
+from .tsdemux import DemuxUnsupported, demux_to_adts
+
+
+class NativeEngineUnsupported(RuntimeError):
+    """Raised when a stream needs features the native engine does not implement."""
+
+
+def fetch_segment(client: HttpClient, segment: Segment) -> bytes:
+    headers: Dict[str, str] = {}
+    if segment.byterange:
+        length, offset = segment.byterange
+        headers["Range"] = f"bytes={offset}-{offset + length - 1}"
+    return client.get(segment.uri, headers=headers).raise_for_status().body
+
+
+def playlist_fingerprint(playlist: MediaPlaylist) -> str:
+    """Identify a playlist by its segment paths, ignoring query strings that carry expiring tokens."""
+    digest = hashlib.sha1()
+    for segment in playlist.segments:
+        digest.update(segment.uri.split("?", 1)[0].encode("utf-8"))
+        digest.update(repr(segment.byterange).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _part_path(parts_dir: Path, index: int) -> Path:
+    return parts_dir / f"{index:06d}.seg"
+
+
+def _init_path(parts_dir: Path, uri: str) -> Path:
+    return parts_dir / f"init-{hashlib.sha1(uri.split('?', 1)[0].encode('utf-8')).hexdigest()[:16]}.bin"
+
+
+def _verified_segments(manifest: DownloadManifest, parts_dir: Path) -> List[int]:
+    verified = []
+    for index, record in manifest.segments.items():
+        part = _part_path(parts_dir, index)
+        try:
+            if part.stat().st_size == record.size and file_sha256(part) == record.sha256:
+                verified.append(index)
+        except OSError:
+            continue
+    return verified
+
+
+def spool_segments(
+    playlist: MediaPlaylist,
+    parts_dir: Path,
+    manifest: DownloadManifest,
+    *,
+    client: HttpClient,
+    concurrency: int = 8,
+    on_progress: Optional[Callable[..., None]] = None,
+    on_latency: Optional[Callable[[float], None]] = None,
+) -> int:
+    """
+    Fetch the segments of ``playlist`` that are not yet recorded in ``manifest``.
+
+    Each segment is written to its own part file and recorded (size and
+    SHA-256) as soon as it lands, so an interrupted run loses at most the
+    segments in flight. ``on_progress`` receives ``add_bytes``/``add_time``
+    keyword updates per segment and ``on_latency`` the seconds each segment
+    request took. Returns the number of bytes fetched by this call.
+    """
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    done = set(_verified_segments(manifest, parts_dir))
+    missing = [index for index in range(len(playlist.segments)) if index not in done]
+    if done:
+        print(f"[*] Resuming: {len(done)}/{len(playlist.segments)} segments already on disk")
+
+    def fetch_to_part(index: int) -> int:
+        started = time.perf_counter()
+        data = fetch_segment(client, playlist.segments[index])
+        if on_latency is not None:
+            on_latency(time.perf_counter() - started)
+        part = _part_path(parts_dir, index)
+        tmp = part.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(part)
+        manifest.record_segment(index, len(data), hashlib.sha256(data).hexdigest())
+        if on_progress is not None:
+            on_progress(add_bytes=len(data), add_time=playlist.segments[index].duration)
+        return len(data)
+
+    if on_progress is not None:
+        resumed_time = sum(playlist.segments[index].duration for index in done)
+        on_progress(duration=playlist.duration, add_time=resumed_time)
+
+    fetched = 0
+    for uri in {segment.init_section for segment in playlist.segments if segment.init_section}:
+        init_part = _init_path(parts_dir, uri)
+        if not init_part.exists():
+            init_part.write_bytes(client.get(uri).raise_for_status().body)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for size in executor.map(fetch_to_part, missing):
+            fetched += size
+    return fetched
+
+
+def assemble_parts(playlist: MediaPlaylist, parts_dir: Path, spool_path: Path) -> None:
+    """Concatenate part files (with their init sections) in playlist order."""
+    current_init: Optional[str] = None
+    with open(spool_path, "wb") as spool:
+        for index, segment in enumerate(playlist.segments):
+            if segment.init_section and segment.init_section != current_init:
+                with open(_init_path(parts_dir, segment.init_section), "rb") as init:
+                    shutil.copyfileobj(init, spool)
+                current_init = segment.init_section
+            with open(_part_path(parts_dir, index), "rb") as part:
+                shutil.copyfileobj(part, spool)
+
+
+def extract_audio(playlist: MediaPlaylist, parts_dir: Path, spool_path: Path, output_path: Path) -> str:
+    """
+    Turn the downloaded parts into ``output_path`` and return the method used.
+
+    TS segments with ADTS AAC and packed-audio segments are demuxed in
+    process (see :class:`AdtsExtractor`); anything else, including fMP4
+    segments with init sections, is concatenated and remuxed by ffmpeg.
+    """
+    try:
+        if any(segment.init_section for segment in playlist.segments):
+            raise DemuxUnsupported("fMP4 segments")
+        demux_to_adts((_part_path(parts_dir, index) for index in range(len(playlist.segments))), output_path)
+        return "builtin"
+    except DemuxUnsupported as exc:
+        print(f"[*] Built-in demuxer cannot handle {output_path.name} ({exc}); remuxing with ffmpeg")
+    assemble_parts(playlist, parts_dir, spool_path)
+    remux_to_aac(spool_path, output_path)
+    return "ffmpeg"
+
+
+def remux_to_aac(source: Path, output_path: Path) -> None:
+    """Run ffmpeg locally (no network) to copy the audio track into an AAC file."""
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        str(source),
+        "-vn",
+        "-c:a",
+        "copy",
+        "-bsf:a",
+        "aac_adtstoasc",
+        str(output_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+
+
+def download_native(
+    m3u8_url: str,
+    output_path: Path,
+    *,
+    client: Optional[HttpClient] = None,
+    segment_concurrency: int = 8,
+    source: Optional[str] = None,
+    on_progress: Optional[Callable[..., None]] = None,
+    on_latency: Optional[Callable[[float], None]] = None,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+) -> int:
+    """
+    Download an HLS stream with concurrent segment fetches and extract its AAC audio.
+
+    Segments are kept in ``<output>.parts/`` and tracked in a sidecar manifest
+    (see :class:`DownloadManifest`), so a failed or interrupted run resumes by
+    fetching only the missing segments. ``source`` is the URL recorded in the
+    manifest header (defaults to ``m3u8_url``). Master playlists are followed
+    to the rendition :func:`.hls.select_variant` picks for ``prefer_audio_only``
+    and ``max_bandwidth``; live or encrypted streams raise
+    :class:`NativeEngineUnsupported` so callers can fall back to ffmpeg.
+    ``on_progress`` and ``on_latency`` are passed to :func:`spool_segments`.
+    Returns the number of bytes fetched by this run.
+    """
+    owned_client = client is None
+    http = client or HttpClient(max_idle_per_host=segment_concurrency)
+    parts_dir = output_path.with_name(output_path.name + ".parts")
+    spool_path = output_path.with_name(output_path.name + ".part.ts")
+    manifest = DownloadManifest.load(manifest_path_for(output_path))
+    try:
+        playlist = load_media_playlist(m3u8_url, http, prefer_audio_only=prefer_audio_only, max_bandwidth=max_bandwidth)
+        if not playlist.endlist:
+            raise NativeEngineUnsupported("live playlists (no EXT-X-ENDLIST) are not supported")
+        if playlist.encrypted:
+            raise NativeEngineUnsupported("encrypted segments are not supported")
+        if not playlist.segments:
+            raise RuntimeError(f"Playlist has no segments: {playlist.url}")
+
+        fingerprint = playlist_fingerprint(playlist)
+        if manifest.header.get("fingerprint") != fingerprint or manifest.complete:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+            manifest.start(
+                engine="native",
+                source=source or m3u8_url,
+                media_url=playlist.url,
+                fingerprint=fingerprint,
+                segments=len(playlist.segments),
+            )
+
+        metrics = get_metrics()
+        with metrics.span("segment_fetch"):
+            fetched = spool_segments(
+                playlist,
+                parts_dir,
+                manifest,
+                client=http,
+                concurrency=segment_concurrency,
+                on_progress=on_progress,
+                on_latency=on_latency,
+            )
+        with metrics.span("remux") as span:
+            span["method"] = extract_audio(playlist, parts_dir, spool_path, output_path)
+        manifest.mark_complete(output_path)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        return fetched
+    finally:
+        if spool_path.exists():
+            spool_path.unlink()
+        if owned_client:
+            http.close()
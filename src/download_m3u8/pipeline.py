@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import functools
+import queue
+import threading
+from typing import List, Optional, Tuple
+
+from .downloader import DownloadStats, _safe_print, _verified_in_index, download_aac_from_m3u8
+from .httpclient import HttpClient
+from .index import DownloadIndex
+from .progress import ProgressTracker
+from .retry import CircuitBreaker, RetryPolicy
+from .tasks import process_csv
+
+_DONE = None
+
+
+def run_pipeline(
+    csv_file: str,
+    *,
+    output_file: Optional[str] = None,
+    output_dir: str = "output",
+    collect_workers: int = 2,
+    download_workers: int = 4,
+    queue_size: int = 8,
+    save_interval: int = 5,
+    max_retries: int = 3,
+    max_pages_per_driver: int = 25,
+    max_driver_memory_mb: int = 1024,
+    http_first: bool = True,
+    use_cache: bool = True,
+    cache_path: Optional[str] = None,
+    rate_limit: Optional[float] = None,
+    capture: str = "seleniumwire",
+    use_processes: bool = False,
+    max_tasks_per_worker: int = 50,
+    max_worker_memory_mb: int = 2048,
+    engine: str = "ffmpeg",
+    segment_concurrency: int = 8,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+    stall_timeout: float = 120.0,
+    progress_interval: float = 10.0,
+    verify_hash: bool = False,
+) -> DownloadStats:
+    """
+    Resolve m3u8 URLs and download them in one overlapping run.
+
+    :func:`process_csv` runs with ``collect_workers`` resolvers and hands every
+    resolved row to ``download_workers`` download threads through a queue of
+    at most ``queue_size`` entries. When downloads fall behind the queue fills
+    up and resolution waits, so URLs (which often carry expiring tokens) are
+    not resolved far ahead of their download.
+
+    Both stages keep their own resume state: the CSV and its journal record
+    resolved rows, and the download manifests record finished files, so an
+    interrupted run can be continued with ``run``, ``collect`` or ``download``.
+    Outputs already verified in the output directory's :class:`DownloadIndex`
+    are skipped without being downloaded.
+    """
+    print(f"[*] Pipeline: {collect_workers} resolvers -> queue({queue_size}) -> {download_workers} downloads")
+
+    jobs: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue(maxsize=max(1, queue_size))
+    print_lock = threading.Lock()
+    http_client = HttpClient(max_idle_per_host=download_workers * segment_concurrency)
+    tracker = ProgressTracker(print_lock=print_lock, interval=progress_interval)
+    retry_policy = RetryPolicy(max_attempts=max_retries)
+    breaker = CircuitBreaker()
+    index = DownloadIndex(output_dir, verify_hash=verify_hash)
+    results: List[str] = []
+    results_lock = threading.Lock()
+
+    def download_worker() -> None:
+        while True:
+            job = jobs.get()
+            if job is _DONE:
+                return
+            file_name, m3u8_url = job
+            log = functools.partial(_safe_print, print_lock)
+            try:
+                if _verified_in_index(index, file_name, m3u8_url, output_dir, log):
+                    with results_lock:
+                        results.append("skipped")
+                    continue
+                success, _ = download_aac_from_m3u8(
+                    m3u8_url,
+                    file_name,
+                    output_dir=output_dir,
+                    print_lock=print_lock,
+                    engine=engine,
+                    http_client=http_client,
+                    segment_concurrency=segment_concurrency,
+                    prefer_audio_only=prefer_audio_only,
+                    max_bandwidth=max_bandwidth,
+                    progress=tracker,
+                    stall_timeout=stall_timeout,
+                    retry_policy=retry_policy,
+                    breaker=breaker,
+                    index=index,
+                )
+            except Exception as exc:
+                _safe_print(print_lock, f"[!] Unexpected error downloading {file_name}: {exc}")
+                success = False
+            with results_lock:
+                results.append("ok" if success else "failed")
+
+    def enqueue(_index: int, file_name: str, m3u8_url: str) -> None:
+        jobs.put((str(file_name), m3u8_url))
+
+    workers = [
+        threading.Thread(target=download_worker, name=f"download-{number}", daemon=True)
+        for number in range(download_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        process_csv(
+            csv_file,
+            max_workers=collect_workers,
+            save_interval=save_interval,
+            max_retries=max_retries,
+            output_file=output_file,
+            max_pages_per_driver=max_pages_per_driver,
+            max_driver_memory_mb=max_driver_memory_mb,
+            http_first=http_first,
+            use_cache=use_cache,
+            cache_path=cache_path,
+            rate_limit=rate_limit,
+            capture=capture,
+            use_processes=use_processes,
+            max_tasks_per_worker=max_tasks_per_worker,
+            max_worker_memory_mb=max_worker_memory_mb,
+            on_resolved=enqueue,
+        )
+    except BaseException:
+        # Drop queued downloads so an interrupted run stops after the ones in flight.
+        try:
+            while True:
+                jobs.get_nowait()
+        except queue.Empty:
+            pass
+        raise
+    finally:
+        for _ in workers:
+            jobs.put(_DONE)
+        for worker in workers:
+            worker.join()
+        http_client.close()
+        index.close()
+    tracker.maybe_report(force=True)
+
+    stats = DownloadStats(
+        successful=results.count("ok"),
+        failed=results.count("failed"),
+        skipped=results.count("skipped"),
+    )
+    print("\n" + "=" * 50)
+    print("[*] Pipeline Summary:")
+    print(f"[*] Files downloaded: {stats.successful}")
+    print(f"[*] Skipped (already verified): {stats.skipped}")
+    print(f"[*] Failed downloads: {stats.failed}")
+    print("=" * 50)
+    return stats
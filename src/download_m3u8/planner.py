@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import heapq
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from .hls import MediaPlaylist, fetch_playlist, select_variant
+from .httpclient import HttpClient
+from .metrics import get_metrics
+from .native import fetch_segment
+from .progress import _format_bytes, _format_eta
+from .retry import is_transient
+
+PREFLIGHT_CONCURRENCY = 16
+# The first few streams always have a segment fetched, to measure per-download throughput.
+SPEED_SAMPLES = 3
+
+
+@dataclass
+class PlanEntry:
+    """
+    What the pre-flight check learned about one row.
+
+    ``status`` is ``"ok"``, ``"live"`` (no ``EXT-X-ENDLIST``, so the length is
+    not final), ``"dead"`` (404, 403 or another permanent error, typically an
+    expired CDN token) or ``"unknown"`` (a transient error; the row is still
+    downloaded).
+    """
+
+    name: str
+    m3u8_url: str
+    media_url: Optional[str] = None
+    status: str = "ok"
+    duration: float = 0.0
+    segments: int = 0
+    estimated_bytes: Optional[int] = None
+    error: Optional[str] = None
+    sample: Optional[Tuple[int, float]] = None  # (bytes, seconds) of one segment request
+
+    @property
+    def dead(self) -> bool:
+        return self.status == "dead"
+
+
+@dataclass
+class DownloadPlan:
+    """Rows in download order (and in file order) plus the throughput estimate used for timing."""
+
+    entries: List[PlanEntry] = field(default_factory=list)
+    file_order: List[PlanEntry] = field(default_factory=list)
+    concurrency: int = 1
+    bytes_per_second: Optional[float] = None
+
+    @property
+    def runnable(self) -> List[PlanEntry]:
+        return [entry for entry in self.entries if not entry.dead]
+
+    @property
+    def dead(self) -> List[PlanEntry]:
+        return [entry for entry in self.entries if entry.dead]
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.estimated_bytes or 0 for entry in self.runnable)
+
+    def estimated_seconds(self, entries: Optional[Sequence[PlanEntry]] = None) -> Optional[float]:
+        """
+        Wall time to download ``entries`` in order on ``concurrency`` slots.
+
+        Each job takes the next free slot, as the scheduler does, and lasts
+        its estimated bytes over the per-download throughput. Rows of unknown
+        size are left out. ``None`` when no throughput could be measured.
+        """
+        if not self.bytes_per_second:
+            return None
+        slots = [0.0] * max(1, self.concurrency)
+        for entry in self.runnable if entries is None else entries:
+            if entry.estimated_bytes is None or entry.dead:
+                continue
+            heapq.heapreplace(slots, slots[0] + entry.estimated_bytes / self.bytes_per_second)
+        return max(slots)
+
+
+def _inspect(
+    entry: PlanEntry,
+    client: HttpClient,
+    *,
+    prefer_audio_only: bool,
+    max_bandwidth: Optional[int],
+    sample: bool,
+) -> PlanEntry:
+    bandwidth = 0
+    try:
+        playlist = fetch_playlist(entry.m3u8_url, client)
+        if not isinstance(playlist, MediaPlaylist):
+            choice = select_variant(playlist, prefer_audio_only=prefer_audio_only, max_bandwidth=max_bandwidth)
+            bandwidth = choice.bandwidth
+            playlist = fetch_playlist(choice.uri, client)
+            if not isinstance(playlist, MediaPlaylist):
+                raise ValueError(f"Variant is not a media playlist: {choice.uri}")
+    except Exception as exc:
+        entry.status = "unknown" if is_transient(exc) else "dead"
+        entry.error = str(exc) or type(exc).__name__
+        return entry
+
+    entry.media_url = playlist.url
+    entry.duration = playlist.duration
+    entry.segments = len(playlist.segments)
+    if not playlist.endlist:
+        entry.status = "live"
+    if not playlist.segments:
+        entry.status = "dead"
+        entry.error = "playlist has no segments"
+        return entry
+
+    if all(segment.byterange for segment in playlist.segments):
+        entry.estimated_bytes = sum(segment.byterange[0] for segment in playlist.segments if segment.byterange)
+    elif bandwidth:
+        entry.estimated_bytes = int(bandwidth * playlist.duration / 8)
+    if (sample or entry.estimated_bytes is None) and not playlist.encrypted:
+        first = playlist.segments[0]
+        started = time.perf_counter()
+        try:
+            size = len(fetch_segment(client, first))
+        except Exception as exc:
+            # The playlist works but its media does not: most often an expired token on the segments.
+            entry.status = "unknown" if is_transient(exc) else "dead"
+            entry.error = f"first segment: {exc}"
+            return entry
+        entry.sample = (size, time.perf_counter() - started)
+        if entry.estimated_bytes is None and first.duration > 0:
+            entry.estimated_bytes = int(size * playlist.duration / first.duration)
+    return entry
+
+
+def plan_downloads(
+    jobs: Sequence[Tuple[str, str]],
+    *,
+    client: Optional[HttpClient] = None,
+    concurrency: int = 1,
+    engine: str = "ffmpeg",
+    segment_concurrency: int = 8,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+    workers: int = PREFLIGHT_CONCURRENCY,
+) -> DownloadPlan:
+    """
+    Fetch the playlists of ``(name, m3u8_url)`` jobs concurrently and order them longest-first.
+
+    Each master playlist is resolved to the rendition the download would use
+    (see :func:`select_variant`) and its media playlist is read for duration
+    and segment count. Bytes are exact for byte-range playlists, otherwise
+    estimated from the variant's ``BANDWIDTH`` or, without one, from the size
+    of the first segment. URLs that fail permanently are marked dead.
+
+    Per-download throughput is the median of the segment fetches timed along
+    the way (times ``segment_concurrency`` for the native engine) and is used
+    with ``concurrency`` download slots to estimate the run time; it assumes
+    the downloads do not saturate the shared uplink.
+
+    The returned entries are sorted longest-first, with rows of unknown
+    length (transient errors, live streams) ahead of them since they could be
+    the longest. Dead rows sort last.
+    """
+    owned_client = client is None
+    http = client or HttpClient(max_idle_per_host=workers)
+    entries = [PlanEntry(name, url) for name, url in jobs]
+    try:
+        with get_metrics().span("preflight", jobs=len(entries)):
+            inspect = functools.partial(
+                _inspect, client=http, prefer_audio_only=prefer_audio_only, max_bandwidth=max_bandwidth
+            )
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                futures = [
+                    executor.submit(inspect, entry, sample=index < SPEED_SAMPLES) for index, entry in enumerate(entries)
+                ]
+            for future in futures:
+                future.result()
+    finally:
+        if owned_client:
+            http.close()
+
+    metrics = get_metrics()
+    for entry in entries:
+        metrics.incr("preflight", status=entry.status)
+
+    rates = [size / seconds for size, seconds in (entry.sample for entry in entries if entry.sample) if seconds > 0]
+    bytes_per_second = statistics.median(rates) if rates else None
+    if bytes_per_second and engine == "native":
+        bytes_per_second *= max(1, segment_concurrency)
+
+    order = {"dead": 2, "ok": 1}
+    planned = sorted(entries, key=lambda entry: (order.get(entry.status, 0), -entry.duration))
+    return DownloadPlan(
+        entries=planned, file_order=entries, concurrency=concurrency, bytes_per_second=bytes_per_second
+    )
+
+
+def print_plan(plan: DownloadPlan, log: Callable[[str], None] = print) -> None:
+    """Print the planned order, dead URLs and the size and time estimates."""
+    log(f"[*] Pre-flight plan for {len(plan.entries)} downloads (longest first):")
+    for entry in plan.entries:
+        if entry.dead:
+            log(f"[!]   {entry.name}: dead or expired ({entry.error})")
+            continue
+        size = _format_bytes(entry.estimated_bytes) if entry.estimated_bytes is not None else "size unknown"
+        if entry.status == "unknown":
+            log(f"[*]   {entry.name}: {size}, length unknown ({entry.error})")
+            continue
+        live = ", live" if entry.status == "live" else ""
+        log(f"[*]   {entry.name}: {_format_eta(entry.duration)}, {entry.segments} segments, ~{size}{live}")
+
+    unknown = sum(1 for entry in plan.runnable if entry.estimated_bytes is None)
+    log(f"[*] Estimated download size: {_format_bytes(plan.total_bytes)}")
+    if unknown:
+        log(f"[*] {unknown} downloads of unknown size are not included in the estimates")
+    if plan.dead:
+        log(f"[!] {len(plan.dead)} dead or expired URLs will be skipped")
+
+    planned = plan.estimated_seconds()
+    if planned is None:
+        log("[*] Estimated time: unknown (no segment could be timed)")
+        return
+    in_order = plan.estimated_seconds(plan.file_order)
+    speed = _format_bytes(plan.bytes_per_second or 0)
+    log(
+        f"[*] Estimated time with {plan.concurrency} parallel downloads at ~{speed}/s each: "
+        f"{_format_eta(planned)} longest-first (vs {_format_eta(in_order)} in file order)"
+    )
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import collections
+import multiprocessing
+import os
+import queue
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+from .driver_pool import _process_tree_rss
+
+Task = Tuple[int, str, str]
+Outcome = Tuple[Task, str, str]
+
+# A row whose worker crashed is handed to the replacement this many times before it is failed.
+CRASH_RETRIES = 1
+
+
+@dataclass
+class WorkerConfig:
+    """Everything a worker process needs to build its own resolver; must stay picklable."""
+
+    total: int
+    http_first: bool = True
+    use_cache: bool = True
+    cache_path: Optional[str] = None
+    refresh_cache: bool = False
+    capture: str = "seleniumwire"
+    max_pages_per_driver: int = 25
+    max_driver_memory_mb: int = 1024
+    max_retries: int = 3
+    rate_limit: Optional[float] = None
+    metrics: Optional[str] = None
+
+
+def _worker_main(
+    tasks: "multiprocessing.SimpleQueue[Optional[Task]]",
+    results: "multiprocessing.Queue[Tuple[Any, ...]]",
+    config: WorkerConfig,
+    max_tasks: int,
+    max_memory_mb: int,
+) -> None:
+    import functools
+
+    from .cache import ResolutionCache
+    from .collector import get_m3u8_url
+    from .driver_pool import DriverPool
+    from .httpclient import HttpClient
+    from .metrics import configure_metrics
+    from .retry import CircuitBreaker, RetryPolicy
+    from .scheduler import HostRateLimiter
+    from .tasks import _process_url, _rate_limited
+
+    pid = os.getpid()
+    metrics = configure_metrics(config.metrics, per_process=True)
+    pool = DriverPool(
+        size=1,
+        max_pages=config.max_pages_per_driver,
+        max_memory_mb=config.max_driver_memory_mb,
+        capture=config.capture,
+    )
+    http_client = HttpClient() if config.http_first else None
+    cache = ResolutionCache(config.cache_path) if config.use_cache else None
+    resolve = functools.partial(
+        get_m3u8_url,
+        pool=pool,
+        http_first=config.http_first,
+        http_client=http_client,
+        cache=cache,
+        refresh_cache=config.refresh_cache,
+    )
+    if config.rate_limit:
+        resolve = _rate_limited(resolve, HostRateLimiter(config.rate_limit))
+    retry_policy = RetryPolicy(max_attempts=config.max_retries)
+    breaker = CircuitBreaker()
+
+    done = 0
+    reason = "queue drained"
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            idx, url, file_name = task
+            try:
+                result, error = _process_url(url, file_name, idx, config.total, resolve, retry_policy, breaker), ""
+            except Exception as exc:
+                result, error = "", str(exc) or type(exc).__name__
+            results.put(("done", pid, idx, result, error))
+
+            done += 1
+            if max_tasks and done >= max_tasks:
+                reason = f"完成 {done} 筆任務"
+                break
+            if max_memory_mb:
+                usage_mb = _process_tree_rss(pid) / (1024 * 1024)
+                if usage_mb > max_memory_mb:
+                    reason = f"記憶體 {usage_mb:.0f} MB > {max_memory_mb} MB"
+                    break
+    finally:
+        pool.close()
+        if http_client is not None:
+            http_client.close()
+        if cache is not None:
+            cache.close()
+        metrics.close()
+        results.put(("retire", pid, reason))
+
+
+@dataclass
+class _Worker:
+    process: Any
+    tasks: Any  # this worker's own SimpleQueue; the parent puts at most one row in it at a time
+    task: Optional[Task] = None
+
+    def assign(self, task: Optional[Task]) -> None:
+        self.task = task
+        if task is not None:
+            self.tasks.put(task)
+
+
+class ResolverProcessPool:
+    """
+    Resolve rows in worker processes that each own one browser.
+
+    Every worker builds its own driver pool, HTTP client and cache handle,
+    so leaks stay inside that process. A worker retires itself after
+    ``max_tasks_per_worker`` rows or once its process tree (including Chrome)
+    exceeds ``max_memory_mb``, and is replaced by a fresh one. Rows are
+    handed to each worker over its own queue, so the parent always knows
+    which row a worker holds: when a worker crashes, its row goes to the
+    replacement, and fails once its workers crashed more than
+    :data:`CRASH_RETRIES` times. Results come back to the parent over a
+    queue.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        *,
+        config: WorkerConfig,
+        max_tasks_per_worker: int = 50,
+        max_memory_mb: int = 2048,
+    ) -> None:
+        self.processes = processes
+        self.config = config
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_memory_mb = max_memory_mb
+        # spawn: forking a process that already runs proxy and HTTP threads is unsafe.
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._workers: Dict[int, _Worker] = {}
+
+    def __enter__(self) -> "ResolverProcessPool":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def run(self, tasks: Iterable[Task]) -> Iterator[Outcome]:
+        """
+        Yield ``(task, m3u8_url, error)`` in completion order.
+
+        Each worker holds at most one row; the next row is handed out only
+        after the caller consumed a result.
+        """
+        pending = iter(tasks)
+        requeued: Deque[Task] = collections.deque()
+        crashes: Dict[int, int] = {}
+
+        def next_task() -> Optional[Task]:
+            return requeued.popleft() if requeued else next(pending, None)
+
+        for _ in range(self.processes):
+            task = next_task()
+            if task is None:
+                break
+            self._start_worker(task)
+
+        while any(worker.task is not None for worker in self._workers.values()):
+            try:
+                message = self._results.get(timeout=1)
+            except queue.Empty:
+                message = None
+
+            if message is not None:
+                kind, pid = message[0], message[1]
+                worker = self._workers.get(pid)
+                if kind == "done" and worker is not None and worker.task is not None and worker.task[0] == message[2]:
+                    _, _, _, result, error = message
+                    task, worker.task = worker.task, None
+                    yield task, result, error
+                    worker.assign(next_task())
+                elif kind == "retire" and worker is not None:
+                    del self._workers[pid]
+                    worker.process.join()
+                    print(f"[*] 回收工作行程 {pid} ({message[2]})")
+                    # A row handed out after the worker's last result was never read; it moves to the replacement.
+                    task = worker.task or next_task()
+                    if task is not None:
+                        self._start_worker(task)
+
+            for worker in self._reap_crashed():
+                task = worker.task
+                if task is not None:
+                    crashes[task[0]] = crashes.get(task[0], 0) + 1
+                    if crashes[task[0]] > CRASH_RETRIES:
+                        yield task, "", "worker process died"
+                    else:
+                        requeued.append(task)
+                task = next_task()
+                if task is not None:
+                    self._start_worker(task)
+
+    def close(self) -> None:
+        for worker in self._workers.values():
+            worker.tasks.put(None)
+        for worker in list(self._workers.values()):
+            worker.process.join(timeout=30)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        self._workers.clear()
+
+    def _start_worker(self, task: Optional[Task] = None) -> _Worker:
+        tasks = self._context.SimpleQueue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(tasks, self._results, self.config, self.max_tasks_per_worker, self.max_memory_mb),
+            daemon=True,
+        )
+        process.start()
+        worker = _Worker(process, tasks)
+        self._workers[process.pid] = worker
+        print(f"[*] 已啟動工作行程 {process.pid}")
+        worker.assign(task)
+        return worker
+
+    def _reap_crashed(self) -> Iterator[_Worker]:
+        for pid, worker in list(self._workers.items()):
+            # A clean exit (code 0) always sends "retire" first; only crashes are handled here.
+            if worker.process.is_alive() or worker.process.exitcode == 0:
+                continue
+            del self._workers[pid]
+            print(f"[!] 工作行程 {pid} 異常結束 (exit code {worker.process.exitcode})，重新啟動")
+            yield worker
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import subprocess
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from .metrics import get_metrics
+
+
+@dataclass(frozen=True)
+class OutputProfile:
+    """An extra output derived from the downloaded AAC: ``ffmpeg`` codec arguments plus container."""
+
+    name: str
+    extension: str
+    format: str
+    codec_args: Tuple[str, ...]
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        OutputProfile("opus32k", ".opus", "opus", ("-c:a", "libopus", "-b:a", "32k", "-application", "voip")),
+        OutputProfile("opus64k", ".opus", "opus", ("-c:a", "libopus", "-b:a", "64k")),
+        OutputProfile("mp3-64k", ".mp3", "mp3", ("-c:a", "libmp3lame", "-b:a", "64k")),
+        OutputProfile("wav16k", ".wav", "wav", ("-c:a", "pcm_s16le", "-ar", "16000", "-ac", "1")),
+    )
+}
+# The stream copy every download produces anyway; listing it as a profile is allowed and a no-op.
+COPY_PROFILE = "aac"
+
+
+def parse_profiles(names: Iterable[str]) -> List[OutputProfile]:
+    """
+    Look up profile names; each entry may itself be a comma-separated list.
+
+    ``"aac"`` (the stream copy) is accepted and skipped, since the AAC file is
+    always written. Raises :class:`ValueError` for unknown names.
+    """
+    profiles: List[OutputProfile] = []
+    for entry in names:
+        for name in filter(None, (part.strip() for part in entry.split(","))):
+            if name == COPY_PROFILE:
+                continue
+            if name not in PROFILES:
+                expected = ", ".join([COPY_PROFILE, *PROFILES])
+                raise ValueError(f"Unknown output profile {name!r}; expected one of {expected}")
+            if PROFILES[name] not in profiles:
+                profiles.append(PROFILES[name])
+    return profiles
+
+
+def profile_output_path(source: Path, profile: OutputProfile) -> Path:
+    """Outputs of each profile go to their own subdirectory next to the AAC: ``<dir>/<profile>/<name><ext>``."""
+    return source.parent / profile.name / (source.stem + profile.extension)
+
+
+def transcode_outputs(source: Path, profiles: Sequence[OutputProfile]) -> List[Path]:
+    """
+    Encode ``source`` into every profile whose output does not exist yet.
+
+    All missing outputs come from one ffmpeg process that decodes the source
+    once and feeds each encoder from the same decoded audio. ffmpeg runs with
+    ``-threads 1`` so one call occupies one CPU core; outputs are written to
+    temporary files and renamed, so an existing output is always complete.
+    Returns the paths written by this call.
+    """
+    targets = [(profile, profile_output_path(source, profile)) for profile in profiles]
+    targets = [(profile, path) for profile, path in targets if not path.exists()]
+    if not targets:
+        return []
+
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-threads", "1", "-i", str(source)]
+    for profile, path in targets:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        cmd += ["-map", "0:a", "-vn", *profile.codec_args, "-threads", "1", "-f", profile.format, str(tmp)]
+    try:
+        with get_metrics().span("transcode", outputs=len(targets)):
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+        for _profile, path in targets:
+            os.replace(path.with_name(path.name + ".tmp"), path)
+    finally:
+        for _profile, path in targets:
+            path.with_name(path.name + ".tmp").unlink(missing_ok=True)
+    return [path for _profile, path in targets]
+
+
+def run_transcode(source: Path, profiles: Sequence[OutputProfile], *, log: Callable[[str], None] = print) -> bool:
+    """:func:`transcode_outputs` that logs and counts the outcome instead of raising."""
+    try:
+        written = transcode_outputs(source, profiles)
+    except Exception as exc:
+        log(f"[!] Transcoding {source.name} failed: {exc}")
+        get_metrics().incr("transcodes", outcome="failed")
+        return False
+    if written:
+        log(f"[*] Transcoded {source.name} -> {', '.join(str(path) for path in written)}")
+        get_metrics().incr("transcodes", outcome="ok")
+    return True
+
+
+class TranscodePool:
+    """
+    Run :func:`transcode_outputs` jobs on their own pool of ``workers`` threads.
+
+    Each job is one single-threaded ffmpeg process, so ``workers`` (default:
+    the number of CPU cores) bounds the cores spent encoding independently of
+    how many downloads run at once; a download hands its AAC file to the pool
+    and frees its network slot right away. :meth:`wait` blocks until every
+    submitted job finished and returns ``(succeeded, failed)``.
+    """
+
+    def __init__(self, workers: Optional[int] = None, *, log: Callable[[str], None] = print) -> None:
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.log = log
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcode")
+        self._lock = threading.Lock()
+        self._futures: List[concurrent.futures.Future] = []
+
+    def submit(self, source: Path, profiles: Sequence[OutputProfile]) -> concurrent.futures.Future:
+        future = self._executor.submit(run_transcode, source, profiles, log=self.log)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def wait(self) -> Tuple[int, int]:
+        with self._lock:
+            futures, self._futures = self._futures, []
+        results = [future.result() for future in concurrent.futures.as_completed(futures)]
+        return sum(results), len(results) - sum(results)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "TranscodePool":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import collections
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+# Logged by ffmpeg's http protocol before it fails with a generic message such as
+# "Server returned 4XX Client Error, but not one of 40{0,1,3,4}" that hides the status.
+_HTTP_ERROR_RE = re.compile(r"HTTP error (\d{3})\b")
+STDERR_TAIL_LINES = 200
+
+
+class FfmpegError(RuntimeError):
+    """An ffmpeg run that exited non-zero or was killed after stalling."""
+
+    def __init__(self, returncode: int, stderr: str, *, stalled: bool = False) -> None:
+        lines = stderr.strip().splitlines()
+        detail = lines[-1] if lines else f"exit code {returncode}"
+        super().__init__(f"ffmpeg stalled and was killed: {detail}" if stalled else f"ffmpeg failed: {detail}")
+        self.returncode = returncode
+        self.stderr = stderr
+        self.stalled = stalled
+
+    @property
+    def http_statuses(self) -> FrozenSet[int]:
+        """Status codes from the ``HTTP error <code> <reason>`` lines ffmpeg logged, if any."""
+        return frozenset(int(code) for code in _HTTP_ERROR_RE.findall(self.stderr))
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+@dataclass
+class FileProgress:
+    name: str
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    out_time: float = 0.0
+    bytes: int = 0
+    speed: Optional[float] = None
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = time.time() - self.started_at
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.duration:
+            return None
+        return min(1.0, self.out_time / self.duration)
+
+    @property
+    def eta(self) -> Optional[float]:
+        fraction = self.fraction
+        if not fraction:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed * (1 - fraction) / fraction
+
+
+class ProgressTracker:
+    """
+    Thread-safe per-file and aggregate download progress.
+
+    Engines push updates (media time, bytes, speed) and the tracker prints a
+    compact report at most every ``interval`` seconds: one line per active
+    file plus an aggregate line with total throughput.
+    """
+
+    def __init__(self, *, print_lock: Optional[threading.Lock] = None, interval: float = 10.0) -> None:
+        self.interval = interval
+        self._print_lock = print_lock or threading.Lock()
+        self._lock = threading.Lock()
+        self._active: Dict[str, FileProgress] = {}
+        self._finished_bytes = 0
+        self._started_at = time.time()
+        self._last_report = self._started_at
+
+    def start(self, name: str, duration: Optional[float] = None) -> FileProgress:
+        with self._lock:
+            progress = FileProgress(name=name, duration=duration)
+            self._active[name] = progress
+            return progress
+
+    def update(
+        self,
+        name: str,
+        *,
+        out_time: Optional[float] = None,
+        total_bytes: Optional[int] = None,
+        add_bytes: int = 0,
+        add_time: float = 0.0,
+        speed: Optional[float] = None,
+        duration: Optional[float] = None,
+    ) -> None:
+        with self._lock:
+            progress = self._active.get(name)
+            if progress is None:
+                return
+            if out_time is not None:
+                progress.out_time = out_time
+            progress.out_time += add_time
+            if total_bytes is not None:
+                progress.bytes = total_bytes
+            progress.bytes += add_bytes
+            if speed is not None:
+                progress.speed = speed
+            if duration is not None:
+                progress.duration = duration
+            progress.updated_at = time.time()
+        self.maybe_report()
+
+    def finish(self, name: str) -> None:
+        with self._lock:
+            progress = self._active.pop(name, None)
+            if progress is not None:
+                self._finished_bytes += progress.bytes
+
+    def total_bytes(self) -> int:
+        """Bytes of finished and active files together; the basis of aggregate throughput."""
+        with self._lock:
+            return self._finished_bytes + sum(progress.bytes for progress in self._active.values())
+
+    def maybe_report(self, *, force: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            lines = self._render(now)
+        with self._print_lock:
+            for line in lines:
+                print(line)
+
+    def _render(self, now: float) -> List[str]:
+        lines = []
+        for progress in self._active.values():
+            fraction = progress.fraction
+            percent = f"{fraction:.0%}" if fraction is not None else "?%"
+            speed = f" {progress.speed:.1f}x" if progress.speed else ""
+            lines.append(
+                f"[*]   {progress.name}: {percent} {_format_bytes(progress.bytes)} "
+                f"@ {_format_bytes(progress.bytes_per_second)}/s{speed} ETA {_format_eta(progress.eta)}"
+            )
+        total = self._finished_bytes + sum(progress.bytes for progress in self._active.values())
+        elapsed = max(now - self._started_at, 1e-6)
+        lines.append(
+            f"[*] Progress: {len(self._active)} active, {_format_bytes(total)} total "
+            f"@ {_format_bytes(total / elapsed)}/s"
+        )
+        return lines
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    value = value.strip().rstrip("x")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def run_ffmpeg_with_progress(
+    cmd: str,
+    *,
+    name: str,
+    tracker: ProgressTracker,
+    stall_timeout: float = 120.0,
+) -> Tuple[int, str, bool]:
+    """
+    Run an ffmpeg command that writes ``-progress pipe:1`` and stream its output.
+
+    stdout is parsed incrementally (``out_time_us``/``out_time_ms``,
+    ``total_size``, ``speed``) into ``tracker``; only the last
+    :data:`STDERR_TAIL_LINES` stderr lines are kept so memory stays bounded
+    for multi-hour streams. The process is killed when neither media time nor
+    size advances for ``stall_timeout`` seconds. Returns ``(returncode,
+    stderr_tail, stalled)``.
+    """
+    process = subprocess.Popen(
+        cmd,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        errors="replace",
+        start_new_session=True,
+    )
+    stderr_tail: Deque[str] = collections.deque(maxlen=STDERR_TAIL_LINES)
+    last_advance = [time.time()]
+    state = {"out_time": 0.0, "total_size": 0}
+
+    def read_stdout() -> None:
+        assert process.stdout is not None
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if key in ("out_time_us", "out_time_ms"):
+                # Despite its name, ffmpeg reports out_time_ms in microseconds too.
+                try:
+                    out_time = int(value) / 1_000_000
+                except ValueError:
+                    continue
+                if out_time > state["out_time"]:
+                    state["out_time"] = out_time
+                    last_advance[0] = time.time()
+            elif key == "total_size":
+                try:
+                    size = int(value)
+                except ValueError:
+                    continue
+                if size > state["total_size"]:
+                    state["total_size"] = size
+                    last_advance[0] = time.time()
+            elif key == "speed":
+                tracker.update(
+                    name,
+                    out_time=state["out_time"],
+                    total_bytes=state["total_size"],
+                    speed=_parse_speed(value),
+                )
+
+    def read_stderr() -> None:
+        assert process.stderr is not None
+        for line in process.stderr:
+            stderr_tail.append(line)
+            match = _DURATION_RE.search(line)
+            if match:
+                hours, minutes, seconds = match.groups()
+                tracker.update(name, duration=int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+
+    readers = [threading.Thread(target=read_stdout, daemon=True), threading.Thread(target=read_stderr, daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    stalled = False
+    while True:
+        try:
+            process.wait(timeout=1)
+            break
+        except subprocess.TimeoutExpired:
+            if stall_timeout and time.time() - last_advance[0] > stall_timeout:
+                stalled = True
+                # shell=True: kill the whole process group so ffmpeg itself dies, not just the shell.
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                break
+
+    for reader in readers:
+        reader.join(timeout=5)
+    return process.returncode, "".join(stderr_tail), stalled
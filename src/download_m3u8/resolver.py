@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import html
+import json
+import re
+from typing import Any, Callable, Iterable, List, Optional
+
+from .candidates import _candidates_from_url, _prioritize_candidates
+from .httpclient import HttpClient
+
+JWPLAYER_MANIFEST_TEMPLATE = "https://cdn.jwplayer.com/manifests/{media_id}.m3u8"
+
+_M3U8_URL_RE = re.compile(r"""https?://[^\s"'<>()\\]+?\.m3u8(?:\?[^\s"'<>()\\]*)?""", re.IGNORECASE)
+_JWPLAYER_MEDIA_ID_RES = [
+    re.compile(r"cdn\.jwplayer\.com/(?:v2/media|manifests|videos|previews|thumbs)/([A-Za-z0-9]{8})\b"),
+    re.compile(r"cdn\.jwplayer\.com/players/([A-Za-z0-9]{8})-[A-Za-z0-9]{8}\.(?:js|html)"),
+    re.compile(r"""["']?media_?id["']?\s*[:=]\s*["']([A-Za-z0-9]{8})["']""", re.IGNORECASE),
+    re.compile(r"""data-(?:jw-)?media-?id\s*=\s*["']([A-Za-z0-9]{8})["']""", re.IGNORECASE),
+]
+_JSON_LD_RE = re.compile(
+    r"""<script[^>]+type\s*=\s*["']application/ld\+json["'][^>]*>(.*?)</script>""",
+    re.IGNORECASE | re.DOTALL,
+)
+_JWPLAYER_SETUP_RE = re.compile(r"""jwplayer\s*\([^)]*\)\s*\.\s*setup\s*\(""")
+_SETUP_FILE_RE = re.compile(r"""["']?(?:file|playlist|src)["']?\s*:\s*["']([^"']+)["']""")
+
+Extractor = Callable[[str], List[str]]
+
+
+def _normalize_markup(page: str) -> str:
+    """Undo the escaping commonly found around URLs in inline scripts and attributes."""
+    return html.unescape(page).replace("\\/", "/").replace("\\u002F", "/").replace("\\u002f", "/")
+
+
+def _media_id_to_manifest(media_id: str) -> str:
+    return JWPLAYER_MANIFEST_TEMPLATE.format(media_id=media_id)
+
+
+def _extract_m3u8_links(page: str) -> List[str]:
+    """Direct ``.m3u8`` URLs anywhere in the markup."""
+    candidates: List[str] = []
+    for match in _M3U8_URL_RE.findall(page):
+        candidates.extend(_candidates_from_url(match))
+    return candidates
+
+
+def _extract_jwplayer_media_ids(page: str) -> List[str]:
+    """JW Player media IDs embedded in player/library URLs or data attributes."""
+    candidates: List[str] = []
+    for pattern in _JWPLAYER_MEDIA_ID_RES:
+        for media_id in pattern.findall(page):
+            candidates.append(_media_id_to_manifest(media_id))
+    return candidates
+
+
+def _walk_json(node: Any) -> Iterable[str]:
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from _walk_json(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_json(value)
+    elif isinstance(node, str):
+        yield node
+
+
+def _extract_json_ld(page: str) -> List[str]:
+    """``contentUrl``/``embedUrl`` style values from JSON-LD blocks."""
+    candidates: List[str] = []
+    for block in _JSON_LD_RE.findall(page):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        for value in _walk_json(data):
+            if ".m3u8" in value:
+                candidates.extend(_candidates_from_url(value))
+            else:
+                candidates.extend(_extract_jwplayer_media_ids(value))
+    return candidates
+
+
+def _extract_jwplayer_setup(page: str) -> List[str]:
+    """``file``/``playlist`` entries inside ``jwplayer(...).setup({...})`` calls."""
+    candidates: List[str] = []
+    for match in _JWPLAYER_SETUP_RE.finditer(page):
+        block = _balanced_block(page, match.end())
+        for value in _SETUP_FILE_RE.findall(block):
+            if ".m3u8" in value:
+                candidates.append(value)
+            else:
+                candidates.extend(_extract_jwplayer_media_ids(value))
+    return candidates
+
+
+def _balanced_block(text: str, start: int, limit: int = 20000) -> str:
+    """Return the ``{...}`` object starting at or after ``start`` (best effort)."""
+    opening = text.find("{", start, start + 200)
+    if opening < 0:
+        return ""
+    depth = 0
+    end = min(len(text), opening + limit)
+    for position in range(opening, end):
+        char = text[position]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[opening : position + 1]
+    return text[opening:end]
+
+
+DEFAULT_EXTRACTORS: List[Extractor] = [
+    _extract_jwplayer_setup,
+    _extract_json_ld,
+    _extract_m3u8_links,
+    _extract_jwplayer_media_ids,
+]
+
+
+def extract_candidates(page: str, extractors: Optional[Iterable[Extractor]] = None) -> List[str]:
+    """Run every extractor over ``page`` and return de-duplicated candidates in discovery order."""
+    normalized = _normalize_markup(page)
+    seen = set()
+    candidates: List[str] = []
+    for extractor in extractors or DEFAULT_EXTRACTORS:
+        for candidate in extractor(normalized):
+            if candidate not in seen:
+                seen.add(candidate)
+                candidates.append(candidate)
+    return candidates
+
+
+def resolve_via_http(
+    session_url: str,
+    *,
+    client: Optional[HttpClient] = None,
+    verify: bool = True,
+    extractors: Optional[Iterable[Extractor]] = None,
+) -> Optional[str]:
+    """
+    Resolve an m3u8 URL from the raw session page HTML without a browser.
+
+    Parameters
+    ----------
+    session_url:
+        Session page URL containing the embedded player.
+    client:
+        Shared HTTP client; a temporary one is used when omitted.
+    verify:
+        Fetch the chosen candidate and require an ``#EXTM3U`` header before
+        accepting it, trying the next-ranked candidate otherwise.
+    extractors:
+        Custom extractor list; defaults to :data:`DEFAULT_EXTRACTORS`.
+    """
+    owned_client = client is None
+    http = client or HttpClient()
+    try:
+        response = http.get(session_url)
+        if not response.ok:
+            print(f"[!] HTTP 取得頁面失敗 ({response.status}): {session_url}")
+            return None
+
+        remaining = extract_candidates(response.text, extractors)
+        if not remaining:
+            return None
+        print(f"[*] HTTP 快速解析找到 {len(remaining)} 個可能的m3u8連結")
+
+        while remaining:
+            candidate = _prioritize_candidates(remaining)
+            if candidate is None:
+                break
+            if not verify or _looks_like_playlist(http, candidate):
+                return candidate
+            print(f"[!] 候選連結不是有效的 m3u8: {candidate}")
+            remaining = [item for item in remaining if item != candidate]
+        return None
+    except Exception as exc:
+        print(f"[!] HTTP 快速解析失敗: {exc}")
+        return None
+    finally:
+        if owned_client:
+            http.close()
+
+
+def _looks_like_playlist(client: HttpClient, url: str) -> bool:
+    try:
+        response = client.get(url)
+    except Exception as exc:
+        print(f"[!] 驗證m3u8失敗: {exc}")
+        return False
+    return response.ok and response.body.lstrip(b"\xef\xbb\xbf \r\n\t").startswith(b"#EXTM3U")
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import http.client
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, TypeVar
+
+from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+
+from .httpclient import HttpError
+from .progress import FfmpegError
+
+T = TypeVar("T")
+
+TRANSIENT_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Substrings of ffmpeg's stderr, checked when it logged no "HTTP error <code>" line
+# (see FfmpegError.http_statuses); permanent markers win when both appear.
+_FFMPEG_PERMANENT = (
+    "Server returned 400",
+    "Server returned 401",
+    "Server returned 403",
+    "Server returned 404",
+    # 408 and 429 also end up here, but ffmpeg names them in an "HTTP error" line first.
+    "Server returned 4XX Client Error",
+    "Invalid data found when processing input",
+    "No such file or directory",
+)
+_FFMPEG_TRANSIENT = (
+    "Server returned 5XX Server Error",
+    "Connection timed out",
+    "Connection reset",
+    "Connection refused",
+    "Operation timed out",
+    "Input/output error",
+    "Error in the pull function",
+    "Temporary failure in name resolution",
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling out to a host whose circuit breaker is open."""
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"circuit open for {host or 'unknown host'}; retrying in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Return True when ``exc`` is worth retrying (timeouts, throttling, 5xx, dropped connections)."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, HttpError):
+        return exc.status in TRANSIENT_STATUSES
+    if isinstance(exc, FfmpegError):
+        if exc.stalled or exc.returncode < 0:
+            return True
+        statuses = exc.http_statuses
+        if statuses:
+            return bool(statuses & TRANSIENT_STATUSES)
+        if any(marker in exc.stderr for marker in _FFMPEG_PERMANENT):
+            return False
+        return any(marker in exc.stderr for marker in _FFMPEG_TRANSIENT)
+    if isinstance(exc, SessionNotCreatedException):
+        return False
+    if isinstance(exc, (WebDriverException, TimeoutError, socket.timeout, ConnectionError, http.client.HTTPException)):
+        return True
+    return False
+
+
+@dataclass
+class _HostState:
+    failures: int = 0
+    opened_at: Optional[float] = None
+    probing: bool = False
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After ``failure_threshold`` consecutive transient failures against one
+    host, calls to it fail immediately with :class:`CircuitOpenError` for
+    ``reset_timeout`` seconds. After that a single probe call is let through:
+    success closes the circuit, another failure re-opens it.
+    """
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostState] = {}
+
+    def before_call(self, host: str) -> None:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.opened_at is None:
+                return
+            remaining = state.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or state.probing:
+                raise CircuitOpenError(host, max(remaining, 0.0))
+            state.probing = True
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            state.failures += 1
+            state.probing = False
+            if state.opened_at is not None or state.failures >= self.failure_threshold:
+                state.opened_at = time.monotonic()
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state.opened_at is not None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient errors.
+
+    Attempt ``n`` (1-based) that fails transiently sleeps a random time in
+    ``[0, min(max_delay, base_delay * 2 ** (n - 1))]`` before the next one.
+    Permanent errors (as judged by ``classify``) are raised immediately.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    classify: Callable[[BaseException], bool] = field(default=is_transient, repr=False)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(
+        self,
+        func: Callable[[], T],
+        *,
+        host: str = "",
+        breaker: Optional[CircuitBreaker] = None,
+        on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+    ) -> T:
+        """
+        Call ``func`` until it succeeds, fails permanently or runs out of attempts.
+
+        Transient failures are reported to ``breaker`` under ``host``;
+        ``on_retry(attempt, exc, delay)`` is invoked before each backoff sleep.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            if breaker is not None:
+                breaker.before_call(host)
+            try:
+                result = func()
+            except Exception as exc:
+                transient = self.classify(exc)
+                if breaker is not None:
+                    if transient:
+                        breaker.record_failure(host)
+                    else:
+                        breaker.record_success(host)
+                if not transient or attempt >= self.max_attempts:
+                    raise
+                if breaker is not None and breaker.is_open(host):
+                    # This failure tripped the breaker: report it rather than a CircuitOpenError.
+                    raise
+                delay = self.backoff(attempt)
+                if on_retry is not None:
+                    on_retry(attempt, exc, delay)
+                time.sleep(delay)
+                continue
+            if breaker is not None:
+                breaker.record_success(host)
+            return result
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import threading
+import time
+from typing import Callable, Deque, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+from .adaptive import AdaptiveConcurrency
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# How often callers waiting for a slot that other work may release (e.g. a split range) look again.
+SLOT_POLL_INTERVAL = 1.0
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+class HostFairQueue(Generic[T]):
+    """
+    Jobs grouped by host and handed out round-robin.
+
+    :meth:`pop` skips hosts that cannot get a slot (see :class:`DownloadSlots`),
+    so a host with many queued jobs cannot starve the others.
+    """
+
+    def __init__(self) -> None:
+        self._queues: Dict[str, Deque[T]] = collections.OrderedDict()
+        self._rotation: Deque[str] = collections.deque()
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def push(self, host: str, job: T) -> None:
+        if host not in self._queues:
+            self._queues[host] = collections.deque()
+            self._rotation.append(host)
+        self._queues[host].append(job)
+
+    def pop(self, acquire: Callable[[str], bool]) -> Optional[Tuple[str, T]]:
+        """Return the next job of the first host in turn for which ``acquire(host)`` takes a slot."""
+        for _ in range(len(self._rotation)):
+            host = self._rotation[0]
+            self._rotation.rotate(-1)
+            if not acquire(host):
+                continue
+            queue = self._queues[host]
+            job = queue.popleft()
+            if not queue:
+                del self._queues[host]
+                self._rotation.remove(host)
+            return host, job
+        return None
+
+
+class DownloadSlots:
+    """
+    Running transfers, counted globally and per host.
+
+    A slot is one running transfer: a job started by :func:`run_fair`, or an
+    extra range of a split download (see :func:`.splitter.download_split`).
+    :meth:`try_acquire` never blocks; it takes a slot only while fewer than
+    :attr:`limit` are taken overall and fewer than ``per_host_limit`` for the
+    host. :attr:`limit` is ``max_concurrency``, or the ``controller``'s
+    current limit when that is lower.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        *,
+        per_host_limit: Optional[int] = None,
+        controller: Optional[AdaptiveConcurrency] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit or max_concurrency
+        self.controller = controller
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = collections.Counter()
+        self._total = 0
+
+    def __len__(self) -> int:
+        return self._total
+
+    @property
+    def limit(self) -> int:
+        if self.controller is None:
+            return self.max_concurrency
+        return min(self.max_concurrency, self.controller.limit)
+
+    def try_acquire(self, host: str) -> bool:
+        with self._lock:
+            if self._total >= self.limit or self._active[host] >= self.per_host_limit:
+                return False
+            self._active[host] += 1
+            self._total += 1
+            return True
+
+    def release(self, host: str) -> None:
+        with self._lock:
+            self._active[host] -= 1
+            self._total -= 1
+
+
+async def run_fair(
+    jobs: Iterable[T],
+    worker: Callable[[T], R],
+    *,
+    host: Callable[[T], str],
+    max_concurrency: int,
+    per_host_limit: Optional[int] = None,
+    controller: Optional[AdaptiveConcurrency] = None,
+    slots: Optional[DownloadSlots] = None,
+) -> List[R]:
+    """
+    Run the blocking ``worker`` over ``jobs`` with global and per-host limits.
+
+    At most ``max_concurrency`` jobs run at once and at most
+    ``per_host_limit`` of them target the same host; hosts are served
+    round-robin. Workers execute in a dedicated thread pool sized to
+    ``max_concurrency``. Results are returned in completion order.
+
+    With a ``controller`` the number of running jobs follows its
+    :attr:`AdaptiveConcurrency.limit` (capped at ``max_concurrency``), and the
+    controller is asked to adjust the limit every ``controller.interval``
+    seconds. Lowering the limit lets running jobs finish; it only delays new ones.
+
+    Jobs take their slot from ``slots`` when given (built from the other
+    limits otherwise), so transfers the workers start themselves, such as
+    the extra ranges of a split download, count against the same limits.
+    """
+    if slots is None:
+        slots = DownloadSlots(max_concurrency, per_host_limit=per_host_limit, controller=controller)
+    queue: HostFairQueue[T] = HostFairQueue()
+    for job in jobs:
+        queue.push(host(job), job)
+
+    loop = asyncio.get_running_loop()
+    running: Dict["asyncio.Future[R]", str] = {}
+    results: List[R] = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while queue or running:
+            while True:
+                picked = queue.pop(slots.try_acquire)
+                if picked is None:
+                    break
+                job_host, job = picked
+                running[loop.run_in_executor(executor, worker, job)] = job_host
+
+            # Queued jobs also wait for slots freed by work outside this loop, such as finished split ranges.
+            timeout = SLOT_POLL_INTERVAL if queue else controller.interval if controller is not None else None
+            done, _pending = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                slots.release(running.pop(future))
+                results.append(future.result())
+            if controller is not None and controller.due():
+                controller.adjust(saturated=len(queue) + len(slots) >= controller.limit)
+    return results
+
+
+class HostRateLimiter:
+    """
+    Space out requests to the same host at ``rate`` requests per second.
+
+    :meth:`wait` reserves the next free slot for the host under a lock and
+    then sleeps outside it, so callers targeting different hosts never wait
+    on each other.
+    """
+
+    def __init__(self, rate: float) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, host: str) -> float:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def sliding_window(
+    executor: concurrent.futures.Executor,
+    jobs: Iterable[T],
+    worker: Callable[[T], R],
+    *,
+    window: int,
+) -> Iterator[Tuple[T, "concurrent.futures.Future[R]"]]:
+    """
+    Keep ``window`` jobs in flight and yield ``(job, future)`` as each finishes.
+
+    A replacement job is submitted only after the caller has consumed a
+    finished one, so a slow consumer throttles submission and a slow job
+    never holds back the others.
+    """
+    pending = iter(jobs)
+    running: Dict["concurrent.futures.Future[R]", T] = {}
+
+    def submit_next() -> None:
+        for job in pending:
+            running[executor.submit(worker, job)] = job
+            return
+
+    for _ in range(window):
+        submit_next()
+    while running:
+        done, _not_done = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            yield running.pop(future), future
+            submit_next()
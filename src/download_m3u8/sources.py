@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import abc
+import csv
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+DEFAULT_TABLE = "tasks"
+
+
+def is_comment(line: str) -> bool:
+    return line.strip().startswith("//")
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+@dataclass
+class TaskRow:
+    """
+    One record of a task source.
+
+    ``index`` counts data rows from 0. Comment rows (``//`` lines) have
+    ``index == -1`` and keep their raw text in ``comment`` so sinks can copy
+    them to the output unchanged.
+    """
+
+    index: int
+    fields: Dict[str, str]
+    comment: Optional[str] = None
+
+
+class TaskSource(abc.ABC):
+    """
+    Lazily iterated task manifest.
+
+    Iterating reads one record at a time, so memory does not grow with the
+    size of the input. ``columns`` is known as soon as the source is opened.
+    """
+
+    def __init__(self, path: os.PathLike) -> None:
+        self.path = Path(path)
+        self.columns: List[str] = []
+
+    @abc.abstractmethod
+    def __iter__(self) -> Iterator[TaskRow]:
+        """Yield data and comment rows in file order, reading one record at a time."""
+
+    def count(self) -> int:
+        """Number of data rows, counted with one streaming pass."""
+        return sum(1 for row in self if row.comment is None)
+
+
+class CsvSource(TaskSource):
+    def __init__(self, path: os.PathLike) -> None:
+        super().__init__(path)
+        with open(self.path, "r", encoding="utf-8", newline="") as handle:
+            header = next(csv.reader(line for line in handle if not is_comment(line)), None)
+        if not header:
+            raise ValueError(f"CSV file is empty or missing headers: {self.path}")
+        self.columns = header
+
+    def __iter__(self) -> Iterator[TaskRow]:
+        with open(self.path, "r", encoding="utf-8", newline="") as handle:
+            comments: List[str] = []
+
+            def lines() -> Iterator[str]:
+                for line in handle:
+                    if is_comment(line):
+                        comments.append(line.rstrip("\r\n"))
+                        continue
+                    yield line
+
+            reader = csv.reader(lines())
+            next(reader, None)
+            index = 0
+            for values in reader:
+                # The reader pulls exactly the lines of one record, so comments seen so far precede it.
+                for comment in comments:
+                    yield TaskRow(-1, {}, comment=comment)
+                comments.clear()
+                if not values:
+                    continue
+                fields = {name: values[i] if i < len(values) else "" for i, name in enumerate(self.columns)}
+                yield TaskRow(index, fields)
+                index += 1
+            for comment in comments:
+                yield TaskRow(-1, {}, comment=comment)
+
+
+class JsonlSource(TaskSource):
+    def __init__(self, path: os.PathLike) -> None:
+        super().__init__(path)
+        first = next((row for row in self if row.comment is None), None)
+        if first is None:
+            raise ValueError(f"JSONL file has no records: {self.path}")
+        self.columns = list(first.fields)
+
+    def __iter__(self) -> Iterator[TaskRow]:
+        with open(self.path, "r", encoding="utf-8") as handle:
+            index = 0
+            for number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                if is_comment(line):
+                    yield TaskRow(-1, {}, comment=line.rstrip("\r\n"))
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise ValueError(f"{self.path}:{number}: invalid JSON ({exc})") from exc
+                if not isinstance(record, dict):
+                    raise ValueError(f"{self.path}:{number}: expected a JSON object")
+                yield TaskRow(index, {key: "" if value is None else str(value) for key, value in record.items()})
+                index += 1
+
+
+class SqliteSource(TaskSource):
+    """
+    Rows of one table, in ``rowid`` order.
+
+    ``table`` defaults to ``tasks``, or to the only table in the database.
+    """
+
+    def __init__(self, path: os.PathLike, *, table: Optional[str] = None) -> None:
+        super().__init__(path)
+        with sqlite3.connect(str(self.path)) as conn:
+            tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            if table is None:
+                table = DEFAULT_TABLE if DEFAULT_TABLE in tables or len(tables) != 1 else tables[0]
+            if table not in tables:
+                raise ValueError(f"Table {table!r} not found in {self.path}")
+            self.columns = [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+        self.table = table
+
+    def __iter__(self) -> Iterator[TaskRow]:
+        conn = sqlite3.connect(str(self.path))
+        try:
+            cursor = conn.execute(f"SELECT * FROM {_quote(self.table)} ORDER BY rowid")
+            for index, values in enumerate(cursor):
+                fields = {name: "" if value is None else str(value) for name, value in zip(self.columns, values)}
+                yield TaskRow(index, fields)
+        finally:
+            conn.close()
+
+
+def open_task_source(path: os.PathLike, *, table: Optional[str] = None) -> TaskSource:
+    """Open ``path`` as a CSV, JSONL (``.jsonl``/``.ndjson``) or SQLite (``.sqlite``/``.db``) task source."""
+    suffix = Path(path).suffix.lower()
+    if suffix in JSONL_SUFFIXES:
+        return JsonlSource(path)
+    if suffix in SQLITE_SUFFIXES:
+        return SqliteSource(path, table=table)
+    return CsvSource(path)
+
+
+class ResultSink(abc.ABC):
+    """
+    Incremental writer for processed rows.
+
+    Rows are appended as they are written; the output only replaces ``path``
+    when the sink is closed with ``commit=True``, so an interrupted run never
+    leaves a half-written file behind (the :class:`ResultJournal` keeps the
+    finished rows instead). :meth:`flush` pushes the rows written so far to
+    the temporary output but never touches ``path``: until the commit it
+    still holds the previous contents, e.g. the untouched input when the
+    output overwrites it.
+    """
+
+    def __init__(self, path: os.PathLike, columns: List[str]) -> None:
+        self.path = Path(path)
+        self.columns = columns
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+
+    @abc.abstractmethod
+    def write(self, row: TaskRow) -> None:
+        """Append ``row`` (a data or comment row) to the temporary output."""
+
+    def flush(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def close(self, *, commit: bool = True) -> None:
+        """Replace ``path`` with the temporary output, or discard it when ``commit`` is false."""
+
+
+class _FileResultSink(ResultSink):
+    def __init__(self, path: os.PathLike, columns: List[str]) -> None:
+        super().__init__(path, columns)
+        self._handle = open(self.tmp_path, "w", encoding="utf-8", newline="")
+
+    def flush(self) -> None:
+        self._handle.flush()
+
+    def close(self, *, commit: bool = True) -> None:
+        self._handle.close()
+        if commit:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+
+class CsvResultSink(_FileResultSink):
+    def __init__(self, path: os.PathLike, columns: List[str]) -> None:
+        super().__init__(path, columns)
+        self._writer = csv.writer(self._handle, lineterminator="\n")
+        self._writer.writerow(columns)
+
+    def write(self, row: TaskRow) -> None:
+        if row.comment is not None:
+            self._handle.write(row.comment + "\n")
+        else:
+            self._writer.writerow([row.fields.get(name, "") for name in self.columns])
+
+
+class JsonlResultSink(_FileResultSink):
+    def write(self, row: TaskRow) -> None:
+        if row.comment is not None:
+            self._handle.write(row.comment + "\n")
+        else:
+            record = {name: row.fields.get(name, "") for name in self.columns}
+            self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class SqliteResultSink(ResultSink):
+    """
+    Write rows into ``table`` of a SQLite database.
+
+    Rows go into a staging table that replaces ``table`` in one transaction on
+    commit; other tables in the database are left alone, so the output may be
+    the source database itself.
+    """
+
+    def __init__(self, path: os.PathLike, columns: List[str], *, table: str = DEFAULT_TABLE) -> None:
+        super().__init__(path, columns)
+        self.table = table
+        self._staging = f"{table}__staging"
+        self._conn = sqlite3.connect(str(self.path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        column_sql = ", ".join(f"{_quote(name)} TEXT" for name in columns)
+        with self._conn:
+            self._conn.execute(f"DROP TABLE IF EXISTS {_quote(self._staging)}")
+            self._conn.execute(f"CREATE TABLE {_quote(self._staging)} ({column_sql})")
+        self._insert = (
+            f"INSERT INTO {_quote(self._staging)} ({', '.join(_quote(name) for name in columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+
+    def write(self, row: TaskRow) -> None:
+        if row.comment is None:
+            self._conn.execute(self._insert, [row.fields.get(name, "") for name in self.columns])
+
+    def flush(self) -> None:
+        self._conn.commit()
+
+    def close(self, *, commit: bool = True) -> None:
+        try:
+            with self._conn:
+                if commit:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {_quote(self.table)}")
+                    self._conn.execute(f"ALTER TABLE {_quote(self._staging)} RENAME TO {_quote(self.table)}")
+                else:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {_quote(self._staging)}")
+        finally:
+            self._conn.close()
+
+
+def open_result_sink(path: os.PathLike, columns: List[str], *, table: Optional[str] = None) -> ResultSink:
+    """Open the sink matching the suffix of ``path`` (same rules as :func:`open_task_source`)."""
+    suffix = Path(path).suffix.lower()
+    if suffix in JSONL_SUFFIXES:
+        return JsonlResultSink(path, columns)
+    if suffix in SQLITE_SUFFIXES:
+        return SqliteResultSink(path, columns, table=table or DEFAULT_TABLE)
+    return CsvResultSink(path, columns)
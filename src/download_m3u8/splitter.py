@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import math
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from .hls import MediaPlaylist, load_media_playlist
+from .httpclient import HttpClient
+from .metrics import get_metrics
+from .native import playlist_fingerprint
+from .progress import FfmpegError, ProgressTracker, run_ffmpeg_with_progress
+from .scheduler import SLOT_POLL_INTERVAL, DownloadSlots
+
+DEFAULT_SPLIT_THRESHOLD = 3600.0
+# The last job of a batch is split only when it is long enough to pay for the extra ffmpeg startups.
+MIN_TAIL_SPLIT_DURATION = 600.0
+
+
+def split_ranges(playlist: MediaPlaylist, chunks: int) -> List[Tuple[int, int]]:
+    """Cut the segments into at most ``chunks`` contiguous ``[start, end)`` ranges of about equal duration."""
+    segments = playlist.segments
+    chunks = max(1, min(chunks, len(segments)))
+    total = playlist.duration
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    elapsed = 0.0
+    for index, segment in enumerate(segments):
+        remaining_chunks = chunks - len(ranges) - 1
+        if remaining_chunks == 0:
+            break
+        elapsed += segment.duration
+        must_cut = len(segments) - index - 1 == remaining_chunks
+        if must_cut or elapsed >= total * (len(ranges) + 1) / chunks:
+            ranges.append((start, index + 1))
+            start = index + 1
+    ranges.append((start, len(segments)))
+    return ranges
+
+
+def write_range_playlist(playlist: MediaPlaylist, start: int, end: int, path: Path) -> None:
+    """Write segments ``[start, end)`` as a standalone VOD playlist with absolute URIs."""
+    segments = playlist.segments[start:end]
+    target = max([playlist.target_duration] + [segment.duration for segment in segments])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:6",
+        f"#EXT-X-TARGETDURATION:{math.ceil(target)}",
+        f"#EXT-X-MEDIA-SEQUENCE:{segments[0].sequence}",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    current_init: Optional[str] = None
+    for segment in segments:
+        if segment.init_section and segment.init_section != current_init:
+            lines.append(f'#EXT-X-MAP:URI="{segment.init_section}"')
+            current_init = segment.init_section
+        lines.append(f"#EXTINF:{segment.duration:.6f},")
+        if segment.byterange:
+            length, offset = segment.byterange
+            lines.append(f"#EXT-X-BYTERANGE:{length}@{offset}")
+        lines.append(segment.uri)
+    lines.append("#EXT-X-ENDLIST")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def plan_split(
+    media_url: str,
+    output_filename: str,
+    *,
+    client: Optional[HttpClient],
+    chunks: int,
+    threshold: Optional[float] = DEFAULT_SPLIT_THRESHOLD,
+    tail: bool = False,
+    log: Callable[[str], None] = print,
+) -> Optional[MediaPlaylist]:
+    """
+    Return the media playlist when this download should be split, else ``None``.
+
+    A stream is split when it is at least ``threshold`` seconds long, or when
+    it is the last job of a batch (``tail``) and at least
+    :data:`MIN_TAIL_SPLIT_DURATION` long so the idle download slots can help
+    with it. Live and encrypted playlists are never split: their ranges could
+    not be rewritten as standalone playlists.
+    """
+    if chunks < 2 or (not threshold and not tail):
+        return None
+    http = client or HttpClient()
+    try:
+        playlist = load_media_playlist(media_url, http)
+    except Exception as exc:
+        log(f"[!] Could not inspect playlist for {output_filename} ({exc}); downloading it in one piece")
+        return None
+    finally:
+        if client is None:
+            http.close()
+
+    if not playlist.endlist or playlist.encrypted or len(playlist.segments) < 2:
+        return None
+    duration = playlist.duration
+    if threshold and duration >= threshold:
+        reason = f"{duration / 60:.0f} min >= {threshold / 60:.0f} min"
+    elif tail and duration >= MIN_TAIL_SPLIT_DURATION:
+        reason = f"{duration / 60:.0f} min, last job in the queue"
+    else:
+        return None
+    parts = len(split_ranges(playlist, chunks))
+    log(f"[*] Splitting {output_filename} ({reason}) into {parts} ranges downloaded in parallel")
+    return playlist
+
+
+def download_split(
+    playlist: MediaPlaylist,
+    output_path: Path,
+    *,
+    chunks: int,
+    name: str,
+    tracker: ProgressTracker,
+    stall_timeout: float = 120.0,
+    slots: Optional[DownloadSlots] = None,
+    host: str = "",
+) -> None:
+    """
+    Download ``playlist`` as ``chunks`` segment ranges with one ffmpeg each, then join them.
+
+    Every range is written as its own playlist and stream-copied to an ADTS
+    file in ``<output>.chunks/``; the concat demuxer then joins the pieces
+    into ``output_path`` without re-encoding. Finished ranges are kept until
+    the join succeeds, so a retry only downloads the ranges that failed, as
+    long as the playlist's segments are unchanged.
+
+    The caller's own download slot always runs ranges. With ``slots``, every
+    other range runs only while it holds a slot of its own for ``host``, so
+    the ranges respect the batch's global, per-host and adaptive limits and
+    fall back to running one after another when no slot is free.
+    """
+    workdir = output_path.with_name(output_path.name + ".chunks")
+    ranges = split_ranges(playlist, chunks)
+    plan = f"{playlist_fingerprint(playlist)} {ranges}\n"
+    plan_path = workdir / "plan.txt"
+    if not plan_path.exists() or plan_path.read_text(encoding="utf-8") != plan:
+        shutil.rmtree(workdir, ignore_errors=True)
+        workdir.mkdir(parents=True)
+        plan_path.write_text(plan, encoding="utf-8")
+
+    def fetch_range(number: int) -> None:
+        start, end = ranges[number]
+        chunk_path = workdir / f"chunk_{number:03d}.aac"
+        if chunk_path.exists():
+            return
+        playlist_path = workdir / f"chunk_{number:03d}.m3u8"
+        write_range_playlist(playlist, start, end, playlist_path)
+        tmp_path = chunk_path.with_name(chunk_path.stem + ".part.aac")
+        chunk_name = f"{name} [{number + 1}/{len(ranges)}]"
+        cmd = (
+            "ffmpeg -y -nostats -threads 1 "
+            "-protocol_whitelist file,http,https,tcp,tls,crypto "
+            f'-i "{playlist_path}" -vn -c:a copy '
+            f'-progress pipe:1 "{tmp_path}"'
+        )
+        tracker.start(chunk_name, duration=sum(segment.duration for segment in playlist.segments[start:end]))
+        try:
+            returncode, stderr_tail, stalled = run_ffmpeg_with_progress(
+                cmd, name=chunk_name, tracker=tracker, stall_timeout=stall_timeout
+            )
+        finally:
+            tracker.finish(chunk_name)
+        if returncode != 0 or stalled:
+            tmp_path.unlink(missing_ok=True)
+            raise FfmpegError(returncode, stderr_tail, stalled=stalled)
+        tmp_path.replace(chunk_path)
+
+    with get_metrics().span("split_download", chunks=len(ranges)) as span:
+        pending = collections.deque(range(len(ranges)))
+        errors: List[Exception] = []
+
+        def fetch_next() -> None:
+            try:
+                number = pending.popleft()
+            except IndexError:
+                return  # another runner took the last range
+            try:
+                fetch_range(number)
+            except Exception as exc:
+                errors.append(exc)
+
+        def run_ranges(own_slot: bool) -> None:
+            extra_slot = not own_slot and slots is not None
+            while pending:
+                if extra_slot and not slots.try_acquire(host):
+                    time.sleep(SLOT_POLL_INTERVAL)
+                    continue
+                try:
+                    fetch_next()
+                finally:
+                    if extra_slot:
+                        slots.release(host)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="range") as executor:
+            for runner in range(len(ranges)):
+                executor.submit(run_ranges, runner == 0)
+        if errors:
+            span["outcome"] = "failed"
+            raise errors[0]
+
+        # Bare names resolve against the listing's directory, so quotes in the output name never reach the listing.
+        listing = workdir / "concat.txt"
+        listing.write_text(
+            "".join(f"file 'chunk_{number:03d}.aac'\n" for number in range(len(ranges))),
+            encoding="utf-8",
+        )
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", str(listing),
+            "-c:a", "copy", str(output_path),
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise FfmpegError(result.returncode, result.stderr)
+    shutil.rmtree(workdir, ignore_errors=True)
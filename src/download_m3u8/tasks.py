@@ -1,16 +1,24 @@
 from __future__ import annotations
 
+import collections
 import concurrent.futures
 import datetime
+import functools
 import gc
-import os
-import time
+import itertools
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional
 
-import pandas as pd
-
-from .collector import clear_seleniumwire_cache, get_m3u8_url, increase_file_limit
+from .cache import ResolutionCache
+from .collector import get_m3u8_url, increase_file_limit
+from .driver_pool import DriverPool
+from .httpclient import HttpClient
+from .journal import ResultJournal, journal_path_for
+from .metrics import get_metrics
+from .processpool import Outcome, ResolverProcessPool, Task, WorkerConfig
+from .retry import CircuitBreaker, RetryPolicy
+from .scheduler import HostRateLimiter, host_of, sliding_window
+from .sources import ResultSink, TaskRow, open_result_sink, open_task_source
 
 
 def process_csv(
@@ -21,9 +29,64 @@ def process_csv(
     start_from: int = 0,
     max_retries: int = 3,
     output_file: Optional[str] = None,
+    max_pages_per_driver: int = 25,
+    max_driver_memory_mb: int = 1024,
+    http_first: bool = True,
+    use_cache: bool = True,
+    cache_path: Optional[str] = None,
+    refresh_cache: bool = False,
+    on_resolved: Optional[Callable[[int, str, str], None]] = None,
+    rate_limit: Optional[float] = None,
+    capture: str = "seleniumwire",
+    use_processes: bool = False,
+    max_tasks_per_worker: int = 50,
+    max_worker_memory_mb: int = 2048,
 ) -> None:
     """
-    Read a CSV containing URLs, fetch m3u8 links for each entry, and persist the result.
+    Read a task file containing URLs, fetch m3u8 links for each entry, and persist the result.
+
+    ``csv_file`` may be CSV, JSONL or SQLite (see :func:`open_task_source`);
+    rows are streamed one at a time and written through an incremental
+    :class:`ResultSink` in input order, so memory stays flat however large the
+    input is. The output format follows the suffix of ``output_file``.
+
+    Workers lease warm Chrome drivers from a shared :class:`DriverPool` sized to
+    ``max_workers``; drivers are recycled after ``max_pages_per_driver`` pages or
+    once their memory exceeds ``max_driver_memory_mb``. ``capture`` picks how
+    drivers observe network traffic (see :class:`DriverPool`). With ``http_first`` each
+    page is first resolved from its raw HTML and Chrome is only used as a fallback.
+
+    Unless ``use_cache`` is disabled, resolutions are looked up in and written to
+    a persistent :class:`ResolutionCache`; rows already resolved by an earlier run
+    (of any CSV) are filled in without being scheduled. ``refresh_cache`` skips
+    the lookups but still records fresh results.
+
+    Each finished row is appended to a :class:`ResultJournal` next to the
+    output file. The output is written to a temporary file (flushed every
+    ``save_interval`` results) that replaces ``output_file`` once every row
+    is done; until then ``output_file`` keeps its previous contents, so the
+    journal is the only record of an interrupted run's progress. Running
+    again replays the journal, so exactly the rows that finished are skipped.
+
+    Transient errors (timeouts, browser crashes, 5xx) are retried up to
+    ``max_retries`` times with jittered exponential backoff, and a per-host
+    :class:`CircuitBreaker` fails the remaining rows of a host that keeps
+    failing. Rows that still fail are journaled with their error and retried
+    on the next run.
+
+    Tasks run in a sliding window that keeps ``max_workers`` resolutions in
+    flight, starting the next row as soon as any one finishes. ``rate_limit``
+    optionally caps page loads at that many requests per second per host.
+
+    With ``use_processes`` each of the ``max_workers`` workers is a separate
+    process that owns one browser (see :class:`ResolverProcessPool`); a
+    worker is replaced after ``max_tasks_per_worker`` rows or once its
+    process tree exceeds ``max_worker_memory_mb``.
+
+    ``on_resolved(index, file_name, m3u8_url)`` is called from the calling
+    thread for every row that has an m3u8 URL, including rows filled from the
+    journal, the CSV or the cache. A blocking callback throttles resolution,
+    which is how :func:`run_pipeline` applies backpressure.
     """
 
     source_path = Path(csv_file)
@@ -31,7 +94,8 @@ def process_csv(
         raise FileNotFoundError(f"CSV file not found: {csv_file}")
 
     output_path = Path(output_file or source_path)
-    checkpoint_path = output_path.with_suffix(output_path.suffix + ".checkpoint")
+    journal = ResultJournal(journal_path_for(output_path))
+    metrics = get_metrics()
 
     print(f"[*] 开始处理 CSV 文件: {source_path}")
     print(f"[*] 输出文件: {output_path}")
@@ -39,103 +103,241 @@ def process_csv(
     print(f"[*] 开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     increase_file_limit()
-    clear_seleniumwire_cache()
-
-    if checkpoint_path.exists() and start_from == 0:
-        try:
-            start_from = int(checkpoint_path.read_text(encoding="utf-8").strip())
-            print(f"[*] 从上次中断点继续处理: 第 {start_from} 笔")
-        except Exception as exc:
-            print(f"[!] 读取断点文件时发生错误: {exc}")
-
-    df = pd.read_csv(source_path, encoding="utf-8")
-    if "m3u8" not in df.columns:
-        df["m3u8"] = ""
-
-    print(f"[*] CSV 欄位名稱: {list(df.columns)}")
-    print(f"[*] 读取到 {len(df)} 筆資料")
-
-    tasks = []
-    for idx, row in df.iloc[start_from:].iterrows():
-        url = str(row.get("url", "")).strip()
-        if not url:
-            print(f"[!] 第 {idx+1} 筆資料缺少 URL，跳過")
-            continue
-        if not pd.isna(row.get("m3u8")) and str(row.get("m3u8")):
-            print(f"[*] 第 {idx+1} 筆資料已有 m3u8 数据，跳過")
-            continue
-        file_name = row.get(df.columns[0], f"項目 {idx+1}")
-        tasks.append((idx, url, file_name))
-
-    if not tasks:
-        print("[*] 沒有需要處理的任務或全部已完成")
-        df.to_csv(output_path, index=False, encoding="utf-8")
-        if checkpoint_path.exists():
-            checkpoint_path.unlink()
-        return
-
-    print(f"[*] 待處理任務數: {len(tasks)}")
+
+    source = open_task_source(source_path)
+    columns = list(source.columns)
+    if "m3u8" not in columns:
+        columns.append("m3u8")
+    name_column = columns[0]
+    total = source.count()
+
+    print(f"[*] CSV 欄位名稱: {source.columns}")
+    print(f"[*] 读取到 {total} 筆資料")
+
+    # Rows that ended in an error are scheduled again; "nothing found" counts as done.
+    replayed = {row_idx: entry for row_idx, entry in journal.replay().items() if not entry.error}
+    if replayed:
+        print(f"[*] 从日志恢复 {len(replayed)} 筆已處理資料")
+
+    cache = ResolutionCache(cache_path) if use_cache else None
+    sink = open_result_sink(output_path, columns, table=getattr(source, "table", None))
+    writer = _InOrderWriter(sink)
+    skipped = collections.Counter()
+
+    def pending_tasks() -> Iterator[Task]:
+        for row in source:
+            if row.comment is not None or row.index < start_from:
+                writer.add(row)
+                continue
+            idx = row.index
+            url = row.fields.get("url", "").strip()
+            file_name = row.fields.get(name_column) or f"項目 {idx+1}"
+            if not url:
+                print(f"[!] 第 {idx+1} 筆資料缺少 URL，跳過")
+                writer.add(row)
+                continue
+            entry = replayed.pop(idx, None)
+            if entry is not None and entry.url == url:
+                row.fields["m3u8"] = entry.m3u8
+                skipped["journal"] += 1
+            elif row.fields.get("m3u8"):
+                print(f"[*] 第 {idx+1} 筆資料已有 m3u8 数据，跳過")
+                skipped["csv"] += 1
+            else:
+                cached = cache.get(url) if cache is not None and not refresh_cache else None
+                if cached is None:
+                    writer.add(row, pending=True)
+                    yield idx, url, file_name
+                    continue
+                if cached.ok:
+                    row.fields["m3u8"] = cached.m3u8_url
+                else:
+                    print(f"[*] 第 {idx+1} 筆資料近期解析失敗（快取），跳過")
+                skipped["cache"] += 1
+            writer.add(row)
+            if on_resolved is not None and row.fields.get("m3u8"):
+                on_resolved(idx, file_name, row.fields["m3u8"])
+
+    tasks = pending_tasks()
+    first_task = next(tasks, None)
     processed_count = 0
-    batch_size = 10
+    failed_count = 0
+    pool: Optional[DriverPool] = None
+    http_client: Optional[HttpClient] = None
+    process_pool: Optional[ResolverProcessPool] = None
+    outcomes: Optional[Iterator[Outcome]] = None
+    committed = False
 
-    for batch_start in range(0, len(tasks), batch_size):
-        batch_end = min(batch_start + batch_size, len(tasks))
-        current_batch = tasks[batch_start:batch_end]
-        print(f"[*] 開始處理第 {batch_start+1} 到 {batch_end} 筆任務 (共 {len(tasks)} 筆)")
+    try:
+        if first_task is None:
+            print("[*] 沒有需要處理的任務或全部已完成")
+        elif use_processes:
+            process_pool = ResolverProcessPool(
+                max_workers,
+                config=WorkerConfig(
+                    total=total,
+                    http_first=http_first,
+                    use_cache=use_cache,
+                    cache_path=cache_path,
+                    refresh_cache=refresh_cache,
+                    capture=capture,
+                    max_pages_per_driver=max_pages_per_driver,
+                    max_driver_memory_mb=max_driver_memory_mb,
+                    max_retries=max_retries,
+                    rate_limit=rate_limit,
+                    metrics=metrics.spec,
+                ),
+                max_tasks_per_worker=max_tasks_per_worker,
+                max_memory_mb=max_worker_memory_mb,
+            )
+            outcomes = process_pool.run(itertools.chain([first_task], tasks))
+        else:
+            pool = DriverPool(
+                size=max_workers,
+                max_pages=max_pages_per_driver,
+                max_memory_mb=max_driver_memory_mb,
+                capture=capture,
+            )
+            http_client = HttpClient() if http_first else None
+            resolve = functools.partial(
+                get_m3u8_url,
+                pool=pool,
+                http_first=http_first,
+                http_client=http_client,
+                cache=cache,
+                refresh_cache=refresh_cache,
+            )
+            if rate_limit:
+                resolve = _rate_limited(resolve, HostRateLimiter(rate_limit))
+            retry_policy = RetryPolicy(max_attempts=max_retries)
+            breaker = CircuitBreaker()
+            outcomes = _run_in_threads(
+                itertools.chain([first_task], tasks),
+                lambda task: _process_url(task[1], task[2], task[0], total, resolve, retry_policy, breaker),
+                max_workers=max_workers,
+            )
 
-        clear_seleniumwire_cache()
-        gc.collect()
+        for (idx, url, file_name), result, error in outcomes or ():
+            if error:
+                failed_count += 1
+                print(f"[!] 第 {idx+1} 筆資料處理失敗: {error}")
+            metrics.incr("rows", outcome="failed" if error else "resolved" if result else "empty")
+            writer.complete(idx, result)
+            journal.append(idx, url, result, error)
+            processed_count += 1
+            if on_resolved is not None and result:
+                on_resolved(idx, file_name, result)
+
+            print(f"[*] 已完成 {processed_count} 筆任務（共 {total} 筆資料）")
+            if processed_count % save_interval == 0:
+                sink.flush()
+
+        for reason, count in skipped.items():
+            metrics.incr("rows_skipped", count, reason=reason)
+        if skipped["cache"]:
+            print(f"[*] 從快取取得 {skipped['cache']} 筆 m3u8")
+        with metrics.span("csv_save"):
+            sink.close()
+        committed = True
+    finally:
+        if outcomes is not None:
+            outcomes.close()
+        tasks.close()
+        if not committed:
+            sink.close(commit=False)
+        journal.close()
+        if process_pool is not None:
+            process_pool.close()
+        if pool is not None:
+            pool.close()
+        if http_client is not None:
+            http_client.close()
+        if cache is not None:
+            cache.close()
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_idx = {
-                executor.submit(_process_url_safe, url, file_name, idx, len(df)): idx for idx, url, file_name in current_batch
-            }
-
-            for future in concurrent.futures.as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                retry = 0
-                result = ""
-                while retry < max_retries:
-                    try:
-                        result = future.result()
-                        break
-                    except Exception as exc:
-                        retry += 1
-                        print(f"[!] 任務 {idx+1} 執行失敗 (嘗試 {retry}/{max_retries}): {exc}")
-                        if retry < max_retries:
-                            time.sleep(2)
-                df.at[idx, "m3u8"] = result
-                processed_count += 1
-
-                checkpoint_path.write_text(str(idx + 1), encoding="utf-8")
-                df.to_csv(output_path, index=False, encoding="utf-8")
-                print(f"[*] 已处理 {processed_count}/{len(tasks)} 筆資料，已儲存到 {output_path}")
-
-        batch_progress = (batch_end / len(tasks)) * 100
-        print(f"[*] 已完成 {batch_end}/{len(tasks)} 筆任務 ({batch_progress:.1f}%)")
-        print(f"[*] 休息 2 秒后继续下一批...")
-        time.sleep(2)
-
-    df.to_csv(output_path, index=False, encoding="utf-8")
     print(f"[*] 全部處理完成，最終結果已儲存至 {output_path}")
-    if checkpoint_path.exists():
-        checkpoint_path.unlink()
+    if failed_count:
+        print(f"[!] 共 {failed_count} 筆資料處理失敗，重新執行時會再次嘗試")
+    journal.remove()
     print(f"[*] 處理完成時間: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
 
-def _process_url_safe(url: str, file_name: str, index: int, total: int) -> str:
+class _InOrderWriter:
+    """
+    Pass rows to a sink in input order while their results arrive in completion order.
+
+    Only rows behind the oldest unfinished one are buffered, which the
+    sliding window keeps small no matter how large the input is.
+    """
+
+    def __init__(self, sink: ResultSink) -> None:
+        self.sink = sink
+        self._queue: Deque[TaskRow] = collections.deque()
+        self._waiting: Dict[int, TaskRow] = {}
+
+    def add(self, row: TaskRow, *, pending: bool = False) -> None:
+        if pending:
+            self._waiting[row.index] = row
+        self._queue.append(row)
+        self._drain()
+
+    def complete(self, index: int, m3u8_url: str) -> None:
+        row = self._waiting.pop(index)
+        row.fields["m3u8"] = m3u8_url
+        self._drain()
+
+    def _drain(self) -> None:
+        while self._queue and not (self._queue[0].comment is None and self._queue[0].index in self._waiting):
+            self.sink.write(self._queue.popleft())
+
+
+def _run_in_threads(
+    tasks: Iterable[Task],
+    worker: Callable[[Task], str],
+    *,
+    max_workers: int,
+) -> Iterator[Outcome]:
+    """Run ``worker`` over ``tasks`` in a sliding window of threads, yielding ``(task, m3u8_url, error)``."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for task, future in sliding_window(executor, tasks, worker, window=max_workers):
+            try:
+                yield task, future.result(), ""
+            except Exception as exc:
+                yield task, "", str(exc) or type(exc).__name__
+
+
+def _rate_limited(resolve: Callable[[str], Optional[str]], limiter: HostRateLimiter) -> Callable[[str], Optional[str]]:
+    def wrapper(url: str) -> Optional[str]:
+        limiter.wait(host_of(url))
+        return resolve(url)
+
+    return wrapper
+
+
+def _process_url(
+    url: str,
+    file_name: str,
+    index: int,
+    total: int,
+    resolve: Callable[[str], Optional[str]],
+    retry_policy: RetryPolicy,
+    breaker: CircuitBreaker,
+) -> str:
+    """Resolve one row, retrying transient errors; errors that remain are raised to the caller."""
     print(f"[*] 处理第 {index+1}/{total} 筆資料: {file_name}")
     print(f"[*] URL: {url}")
+
+    def on_retry(attempt: int, exc: BaseException, delay: float) -> None:
+        print(f"[!] 第 {index+1} 筆資料失敗 (嘗試 {attempt}/{retry_policy.max_attempts}): {exc}，{delay:.1f} 秒後重試")
+        get_metrics().incr("retries", stage="collect", error=type(exc).__name__)
+
     try:
-        m3u8_url = get_m3u8_url(url)
+        m3u8_url = retry_policy.call(lambda: resolve(url), host=host_of(url), breaker=breaker, on_retry=on_retry)
         if m3u8_url:
             print(f"[*] 成功取得 m3u8: {m3u8_url}")
             return m3u8_url
         print(f"[!] 無法取得 m3u8")
         return ""
-    except Exception as exc:
-        print(f"[!] 处理 URL 時發生錯誤: {exc}")
-        return ""
     finally:
         gc.collect()
 
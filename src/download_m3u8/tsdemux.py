@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+PAT_PID = 0x0000
+STREAM_TYPE_ADTS_AAC = 0x0F
+# Audio stream types the demuxer recognises but cannot unpack into ADTS.
+_OTHER_AUDIO_TYPES = {0x03: "MPEG-1 audio", 0x04: "MPEG-2 audio", 0x11: "AAC LATM", 0x81: "AC-3", 0x87: "E-AC-3"}
+
+
+class DemuxUnsupported(RuntimeError):
+    """Raised when a stream needs ffmpeg: unknown container, non-ADTS audio or damaged packets."""
+
+
+def _is_adts(data: memoryview) -> bool:
+    return len(data) >= 2 and data[0] == 0xFF and data[1] & 0xF6 == 0xF0
+
+
+def _skip_id3(data: memoryview) -> int:
+    """Offset of the first byte after any leading ID3v2 tags (packed audio starts with a timestamp tag)."""
+    offset = 0
+    while len(data) - offset >= 10 and data[offset : offset + 3] == b"ID3":
+        size_bytes = data[offset + 6 : offset + 10]
+        if any(byte & 0x80 for byte in size_bytes):
+            raise DemuxUnsupported("malformed ID3 tag")
+        size = (size_bytes[0] << 21) | (size_bytes[1] << 14) | (size_bytes[2] << 7) | size_bytes[3]
+        footer = 10 if data[offset + 5] & 0x10 else 0
+        offset += 10 + size + footer
+    return offset
+
+
+class AdtsExtractor:
+    """
+    Copy the AAC audio of HLS segments into an ADTS stream without ffmpeg.
+
+    Handles MPEG-TS segments whose program carries ADTS AAC (stream type
+    0x0F) and packed-audio segments (ID3 timestamp tag followed by ADTS
+    frames). TS payloads are written to ``output`` as :class:`memoryview`
+    slices of the segment buffer, so audio bytes are never copied in Python.
+
+    State (PMT and audio PIDs, an unfinished PES) carries over from one
+    segment to the next. Duplicate TS packets are dropped, and a signalled
+    discontinuity resets the continuity check. Anything unexpected - other
+    codecs, lost TS sync, a continuity counter gap within a segment,
+    scrambled packets - raises :class:`DemuxUnsupported` so the caller can
+    let ffmpeg handle the stream.
+    """
+
+    def __init__(self, output: BinaryIO) -> None:
+        self.output = output
+        self.bytes_written = 0
+        self._pmt_pid: Optional[int] = None
+        self._audio_pid: Optional[int] = None
+        self._continuity: Optional[int] = None
+        self._pes_header: Optional[bytearray] = None
+        self._in_pes = False
+        self._checked_sync = False
+
+    def feed_segment(self, data: bytes) -> None:
+        """Extract the audio of one whole segment."""
+        view = memoryview(data)
+        if len(view) >= TS_PACKET_SIZE and view[0] == TS_SYNC_BYTE:
+            # Independently encoded segments may restart their continuity counters.
+            self._continuity = None
+            self._feed_ts(view)
+            return
+        offset = _skip_id3(view)
+        if offset >= len(view):
+            return
+        if not _is_adts(view[offset:]):
+            raise DemuxUnsupported("segment is neither MPEG-TS nor ADTS")
+        self._write(view[offset:])
+
+    def close(self) -> None:
+        if self.bytes_written == 0:
+            raise DemuxUnsupported("no AAC audio found")
+
+    def _write(self, chunk: memoryview) -> None:
+        if not chunk:
+            return
+        if not self._checked_sync:
+            if not _is_adts(chunk):
+                raise DemuxUnsupported("audio payload is not ADTS")
+            self._checked_sync = True
+        self.output.write(chunk)
+        self.bytes_written += len(chunk)
+
+    def _feed_ts(self, view: memoryview) -> None:
+        if len(view) % TS_PACKET_SIZE:
+            raise DemuxUnsupported(f"segment size {len(view)} is not a multiple of {TS_PACKET_SIZE}")
+        for start in range(0, len(view), TS_PACKET_SIZE):
+            packet = view[start : start + TS_PACKET_SIZE]
+            if packet[0] != TS_SYNC_BYTE:
+                raise DemuxUnsupported(f"lost TS sync at byte {start}")
+            if packet[1] & 0x80:
+                raise DemuxUnsupported("transport error indicator set")
+            if packet[3] & 0xC0:
+                raise DemuxUnsupported("scrambled TS packets")
+            unit_start = bool(packet[1] & 0x40)
+            pid = ((packet[1] & 0x1F) << 8) | packet[2]
+            control = (packet[3] >> 4) & 0x03
+            offset = 4
+            if control & 0x02:
+                offset += 1 + packet[4]
+                if packet[4] and packet[5] & 0x80 and pid == self._audio_pid:
+                    self._continuity = None
+            if not control & 0x01 or offset >= TS_PACKET_SIZE:
+                continue
+            payload = packet[offset:]
+
+            if pid == PAT_PID and unit_start:
+                self._parse_pat(payload)
+            elif pid == self._pmt_pid and unit_start:
+                self._parse_pmt(payload)
+            elif pid == self._audio_pid and self._check_continuity(packet[3] & 0x0F):
+                self._audio_payload(payload, unit_start)
+
+    def _check_continuity(self, counter: int) -> bool:
+        """
+        Track the audio PID's continuity counter; ``False`` means skip the packet.
+
+        A packet with the same counter as the previous one is a duplicate
+        (allowed once by ISO/IEC 13818-1) and its payload must be dropped.
+        """
+        if self._continuity is not None:
+            if counter == self._continuity:
+                return False
+            expected = (self._continuity + 1) & 0x0F
+            if counter != expected:
+                raise DemuxUnsupported(f"TS continuity gap on audio PID (expected {expected}, got {counter})")
+        self._continuity = counter
+        return True
+
+    @staticmethod
+    def _section(payload: memoryview) -> memoryview:
+        start = 1 + payload[0]
+        if start + 3 > len(payload):
+            raise DemuxUnsupported("PSI section split across packets")
+        section_length = ((payload[start + 1] & 0x0F) << 8) | payload[start + 2]
+        end = start + 3 + section_length
+        if end > len(payload):
+            raise DemuxUnsupported("PSI section split across packets")
+        # Table data without the 8-byte header and the trailing CRC32.
+        return payload[start + 8 : end - 4]
+
+    def _parse_pat(self, payload: memoryview) -> None:
+        entries = self._section(payload)
+        for index in range(0, len(entries) - 3, 4):
+            program = (entries[index] << 8) | entries[index + 1]
+            if program != 0:
+                self._pmt_pid = ((entries[index + 2] & 0x1F) << 8) | entries[index + 3]
+                return
+        raise DemuxUnsupported("no program in PAT")
+
+    def _parse_pmt(self, payload: memoryview) -> None:
+        body = self._section(payload)
+        if len(body) < 4:
+            raise DemuxUnsupported("truncated PMT")
+        info_length = ((body[2] & 0x0F) << 8) | body[3]
+        index = 4 + info_length
+        streams: Dict[int, int] = {}
+        while index + 5 <= len(body):
+            stream_type = body[index]
+            pid = ((body[index + 1] & 0x1F) << 8) | body[index + 2]
+            es_info_length = ((body[index + 3] & 0x0F) << 8) | body[index + 4]
+            streams.setdefault(stream_type, pid)
+            index += 5 + es_info_length
+        audio_pid = streams.get(STREAM_TYPE_ADTS_AAC)
+        if audio_pid is None:
+            other = [name for stream_type, name in _OTHER_AUDIO_TYPES.items() if stream_type in streams]
+            raise DemuxUnsupported(f"{other[0]} stream" if other else "no ADTS AAC stream in PMT")
+        if self._audio_pid is not None and audio_pid != self._audio_pid:
+            self._continuity = None
+            self._in_pes = False
+            self._pes_header = None
+        self._audio_pid = audio_pid
+
+    def _audio_payload(self, payload: memoryview, unit_start: bool) -> None:
+        if unit_start:
+            self._pes_header = bytearray()
+            self._in_pes = False
+        if self._pes_header is None:
+            if self._in_pes:
+                self._write(payload)
+            return
+        # Collect the PES header (it almost always fits in the first packet), then stream the rest.
+        previous = len(self._pes_header)
+        self._pes_header += payload
+        header = self._pes_header
+        if len(header) < 9:
+            return
+        if header[:3] != b"\x00\x00\x01":
+            raise DemuxUnsupported("bad PES start code")
+        needed = 9 + header[8]
+        if len(header) < needed:
+            return
+        self._pes_header = None
+        self._in_pes = True
+        self._write(payload[needed - previous :])
+
+
+def demux_to_adts(segments: Iterable[Path], output_path: Path) -> int:
+    """
+    Write the AAC audio of ``segments`` (part files in playlist order) to ``output_path``.
+
+    The output is written to a temporary file and renamed once every segment
+    was extracted, so a :class:`DemuxUnsupported` part-way through leaves
+    nothing behind. Returns the number of bytes written.
+    """
+    tmp_path = output_path.with_name(output_path.name + ".demux.tmp")
+    try:
+        with open(tmp_path, "wb") as output:
+            extractor = AdtsExtractor(output)
+            for segment in segments:
+                extractor.feed_segment(segment.read_bytes())
+            extractor.close()
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return extractor.bytes_written
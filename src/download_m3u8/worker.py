@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import functools
+import os
+import re
+import shutil
+import socket
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import ResolutionCache
+from .collector import get_m3u8_url, increase_file_limit
+from .downloader import _parse_csv_rows, _safe_print, _verified_in_index, download_aac_from_m3u8, output_path_for
+from .driver_pool import DriverPool
+from .httpclient import HttpClient
+from .index import DownloadIndex
+from .manifest import DownloadManifest, manifest_path_for
+from .metrics import get_metrics
+from .progress import ProgressTracker
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy, is_transient
+from .scheduler import host_of
+from .sources import open_task_source
+from .workqueue import DEFAULT_LEASE_SECONDS, STAGES, SqliteWorkQueue, WorkItem, WorkQueue
+
+# Downloads are written under <output_dir>/.staging/<worker id>/ until the queue accepts their result.
+STAGING_DIRNAME = ".staging"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_tasks(
+    queue: WorkQueue,
+    task_file: str,
+    *,
+    stage: str = "collect",
+    then_download: bool = True,
+    max_attempts: int = 3,
+) -> Dict[str, int]:
+    """
+    Add the rows of a task file (CSV, JSONL or SQLite) to ``queue``.
+
+    For ``stage="collect"`` every row with a ``url`` becomes a collect job
+    named after the first column; with ``then_download`` a resolved job is
+    followed by a download job, and rows that already have an ``m3u8`` go
+    straight to the download stage. For ``stage="download"`` the ``file`` and
+    ``m3u8`` columns are queued as download jobs. Rows already in the queue
+    are ignored, so a task file can be enqueued again after it grew.
+
+    Returns how many jobs were added per stage.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage {stage!r}; expected one of {STAGES}")
+
+    added = {name: 0 for name in STAGES}
+    if stage == "download":
+        jobs = [(name, url.strip()) for name, url in _parse_csv_rows(Path(task_file)) if name and url.strip()]
+        added["download"] = queue.enqueue("download", jobs, max_attempts=max_attempts)
+        return added
+
+    source = open_task_source(task_file)
+    name_column = source.columns[0]
+    collect_jobs: List[Tuple[str, str]] = []
+    download_jobs: List[Tuple[str, str]] = []
+    for row in source:
+        if row.comment is not None:
+            continue
+        name = row.fields.get(name_column) or f"項目 {row.index+1}"
+        url = row.fields.get("url", "").strip()
+        m3u8_url = row.fields.get("m3u8", "").strip()
+        if m3u8_url:
+            if then_download:
+                download_jobs.append((name, m3u8_url))
+        elif url:
+            collect_jobs.append((name, url))
+    added["collect"] = queue.enqueue(
+        "collect", collect_jobs, then_stage="download" if then_download else None, max_attempts=max_attempts
+    )
+    added["download"] = queue.enqueue("download", download_jobs, max_attempts=max_attempts)
+    return added
+
+
+class _LeaseKeeper:
+    """Heartbeat every job this worker holds from one background thread."""
+
+    def __init__(self, queue: WorkQueue, lease_seconds: float, log: Callable[[str], None]) -> None:
+        self.queue = queue
+        self.lease_seconds = lease_seconds
+        self.log = log
+        self._lock = threading.Lock()
+        self._items: Dict[int, WorkItem] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def add(self, item: WorkItem) -> None:
+        with self._lock:
+            self._items[item.id] = item
+
+    def remove(self, item: WorkItem) -> None:
+        with self._lock:
+            self._items.pop(item.id, None)
+
+    def held(self) -> List[WorkItem]:
+        with self._lock:
+            return list(self._items.values())
+
+    def _run(self) -> None:
+        # Renew at a third of the lease so two missed heartbeats still keep it.
+        while not self._stop.wait(self.lease_seconds / 3):
+            for item in self.held():
+                if not self.queue.heartbeat(item, lease_seconds=self.lease_seconds):
+                    self.log(f"[!] Lease on {item.stage} job {item.name} was lost; its result will be discarded")
+                    get_metrics().incr("queue_leases_lost", stage=item.stage)
+                    self.remove(item)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(
+    queue_path: str,
+    *,
+    stages: Sequence[str] = STAGES,
+    worker_id: Optional[str] = None,
+    collect_workers: int = 1,
+    download_workers: int = 2,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    wait: bool = False,
+    poll_interval: float = 5.0,
+    output_dir: str = "output",
+    max_retries: int = 3,
+    max_pages_per_driver: int = 25,
+    max_driver_memory_mb: int = 1024,
+    http_first: bool = True,
+    use_cache: bool = True,
+    cache_path: Optional[str] = None,
+    capture: str = "seleniumwire",
+    engine: str = "ffmpeg",
+    segment_concurrency: int = 8,
+    prefer_audio_only: bool = True,
+    max_bandwidth: Optional[int] = None,
+    stall_timeout: float = 120.0,
+    progress_interval: float = 10.0,
+    verify_hash: bool = False,
+) -> Dict[Tuple[str, str], int]:
+    """
+    Process jobs from a shared :class:`SqliteWorkQueue` until it is drained.
+
+    Any number of workers, on one machine or several sharing the queue file
+    (and ``output_dir``), can run at once. Each claims jobs under a lease of
+    ``lease_seconds`` that a heartbeat thread renews while the job runs; if the
+    worker dies the lease expires and another worker picks the job up again,
+    up to the job's ``max_attempts``.
+
+    ``collect_workers`` threads resolve session pages (see :func:`get_m3u8_url`)
+    and ``download_workers`` threads download streams (see
+    :func:`download_aac_from_m3u8`) for the stages listed in ``stages``. A
+    resolved collect job queues its download job in the same transaction that
+    completes it. Transient errors are retried in place per ``max_retries``;
+    jobs that still fail go back to the queue for another worker, permanent
+    errors (see :func:`is_transient`) fail the job.
+
+    Each worker downloads into its own ``<output_dir>/.staging/<worker id>/``
+    directory and moves the file into ``output_dir`` only after the queue
+    accepted the result, so a worker that lost its lease while downloading
+    never overwrites the output of the worker that took the job over.
+
+    Each stage's threads exit once no job of their stage is pending or
+    leased (the download threads also wait for unfinished collect jobs,
+    which may queue more downloads), or keep polling every
+    ``poll_interval`` seconds with ``wait``. Returns the queue's job counts per
+    ``(stage, status)``.
+    """
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {unknown}; expected {STAGES}")
+
+    owner = worker_id or default_worker_id()
+    print_lock = threading.Lock()
+    log = functools.partial(_safe_print, print_lock)
+    metrics = get_metrics()
+    queue = SqliteWorkQueue(queue_path)
+    keeper = _LeaseKeeper(queue, lease_seconds, log)
+    stop = threading.Event()
+    retry_policy = RetryPolicy(max_attempts=max_retries)
+    breaker = CircuitBreaker()
+
+    log(f"[*] Worker {owner}: {queue.path} (stages: {', '.join(stages)}, lease {lease_seconds:.0f}s)")
+
+    pool: Optional[DriverPool] = None
+    cache: Optional[ResolutionCache] = None
+    index: Optional[DownloadIndex] = None
+    http_client = HttpClient(max_idle_per_host=max(download_workers * segment_concurrency, collect_workers))
+    tracker = ProgressTracker(print_lock=print_lock, interval=progress_interval)
+
+    if "collect" in stages:
+        increase_file_limit()
+        pool = DriverPool(
+            size=collect_workers,
+            max_pages=max_pages_per_driver,
+            max_memory_mb=max_driver_memory_mb,
+            capture=capture,
+        )
+        cache = ResolutionCache(cache_path) if use_cache else None
+    staging_dir = Path(output_dir) / STAGING_DIRNAME / re.sub(r"[^A-Za-z0-9_.-]", "_", owner)
+    if "download" in stages:
+        index = DownloadIndex(output_dir, verify_hash=verify_hash)
+
+    def collect(item: WorkItem) -> str:
+        def on_retry(attempt: int, exc: BaseException, delay: float) -> None:
+            log(f"[!] Resolving {item.name} failed (attempt {attempt}/{max_retries}): {exc}; retrying in {delay:.1f}s")
+            metrics.incr("retries", stage="collect", error=type(exc).__name__)
+
+        m3u8_url = retry_policy.call(
+            lambda: get_m3u8_url(item.url, pool=pool, http_first=http_first, http_client=http_client, cache=cache),
+            host=host_of(item.url),
+            breaker=breaker,
+            on_retry=on_retry,
+        )
+        if not m3u8_url:
+            log(f"[!] No m3u8 found for {item.name}")
+        return m3u8_url or ""
+
+    def download(item: WorkItem) -> str:
+        assert index is not None
+        output_path = output_path_for(output_dir, item.name)
+        if _verified_in_index(index, item.name, item.url, output_dir, log):
+            return str(output_path)
+        success, _ = download_aac_from_m3u8(
+            item.url,
+            item.name,
+            output_dir=str(staging_dir),
+            print_lock=print_lock,
+            engine=engine,
+            http_client=http_client,
+            segment_concurrency=segment_concurrency,
+            prefer_audio_only=prefer_audio_only,
+            max_bandwidth=max_bandwidth,
+            progress=tracker,
+            stall_timeout=stall_timeout,
+            retry_policy=retry_policy,
+            breaker=breaker,
+            raise_errors=True,
+        )
+        if not success:
+            raise RuntimeError(f"download of {item.name} failed")
+        return str(output_path)
+
+    def publish_download(item: WorkItem, accepted: bool) -> None:
+        """Move a staged download into ``output_dir`` once its result was accepted, else discard it."""
+        assert index is not None
+        staged = output_path_for(str(staging_dir), item.name)
+        if not staged.exists():
+            return
+        if not accepted:
+            staged.unlink()
+            manifest_path_for(staged).unlink(missing_ok=True)
+            return
+        output_path = output_path_for(output_dir, item.name)
+        os.replace(staged, output_path)
+        if manifest_path_for(staged).exists():
+            os.replace(manifest_path_for(staged), manifest_path_for(output_path))
+        completed = DownloadManifest.load(manifest_path_for(output_path)).complete or {}
+        index.record(output_path, item.url, sha256=completed.get("output_sha256"))
+
+    handlers: Dict[str, Callable[[WorkItem], str]] = {"collect": collect, "download": download}
+    # Called after queue.complete() with whether the result was accepted.
+    finalizers: Dict[str, Callable[[WorkItem, bool], None]] = {"download": publish_download}
+
+    def process(item: WorkItem) -> None:
+        log(f"[*] Claimed {item.stage} job {item.name} (attempt {item.attempts}/{item.max_attempts})")
+        keeper.add(item)
+        try:
+            with metrics.span("queue_job", stage=item.stage) as span:
+                try:
+                    result = handlers[item.stage](item)
+                except Exception as exc:
+                    # An open circuit is not the job's fault: let it wait in the queue for the host to recover.
+                    retry = is_transient(exc) or isinstance(exc, CircuitOpenError)
+                    error = str(exc) or type(exc).__name__
+                    requeued = retry and item.attempts < item.max_attempts
+                    span["outcome"] = "requeued" if requeued else "failed"
+                    if queue.fail(item, error, retry=retry):
+                        log(f"[!] {item.stage} job {item.name} failed: {error}" + ("; requeued" if requeued else ""))
+                    return
+                accepted = queue.complete(item, result)
+                if accepted:
+                    span["outcome"] = "done"
+                else:
+                    span["outcome"] = "lost"
+                    log(f"[!] Lease on {item.stage} job {item.name} expired; another worker owns it now")
+                if item.stage in finalizers:
+                    finalizers[item.stage](item, accepted)
+        finally:
+            keeper.remove(item)
+
+    def stage_loop(stage: str) -> None:
+        # Unfinished collect jobs can still queue download jobs, so the download loop waits for them too.
+        awaited = ["collect", "download"] if stage == "download" else [stage]
+        while not stop.is_set():
+            item = queue.claim(owner, [stage], lease_seconds=lease_seconds)
+            if item is not None:
+                process(item)
+                continue
+            if not wait and not queue.has_unfinished(awaited):
+                return
+            stop.wait(poll_interval)
+
+    threads = [
+        threading.Thread(target=stage_loop, args=(stage,), name=f"{stage}-{number}", daemon=True)
+        for stage, count in (("collect", collect_workers), ("download", download_workers))
+        if stage in stages
+        for number in range(count)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1.0)
+    except BaseException:
+        # Hand the jobs in flight back right away instead of waiting for their leases to expire.
+        stop.set()
+        for item in keeper.held():
+            queue.fail(item, "worker interrupted", retry=True)
+        raise
+    finally:
+        keeper.close()
+        counts = queue.counts()
+        queue.close()
+        http_client.close()
+        if pool is not None:
+            pool.close()
+        if cache is not None:
+            cache.close()
+        if index is not None:
+            index.close()
+        # Whatever is left in the staging directory belongs to jobs this worker no longer holds.
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    tracker.maybe_report(force=True)
+
+    print("\n" + "=" * 50)
+    print(f"[*] Worker {owner} finished. Queue status:")
+    for (stage, status), count in sorted(counts.items()):
+        print(f"[*] {stage:<8} {status:<8} {count}")
+    print("=" * 50)
+    return counts
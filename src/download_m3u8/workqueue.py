@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import abc
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+STAGES = ("collect", "download")
+DEFAULT_LEASE_SECONDS = 300.0
+
+
+@dataclass
+class WorkItem:
+    """A claimed job; ``owner`` must match the lease for results to be accepted."""
+
+    id: int
+    stage: str
+    name: str
+    url: str
+    attempts: int
+    max_attempts: int
+    then_stage: Optional[str]
+    owner: str
+
+
+class WorkQueue(abc.ABC):
+    """
+    Shared task store that workers on any node claim jobs from under leases.
+
+    A claimed job is leased to one worker for ``lease_seconds``; the worker
+    extends the lease with :meth:`heartbeat` while it runs. Leases that
+    expire (the worker died or lost its connection) put the job back in the
+    queue, or fail it once it has used ``max_attempts`` claims. Results are
+    only accepted from the current lease holder.
+
+    Backends implement the abstract methods below; :class:`SqliteWorkQueue` is the
+    default and works on a volume shared between machines.
+    """
+
+    @abc.abstractmethod
+    def enqueue(
+        self,
+        stage: str,
+        jobs: Iterable[Tuple[str, str]],
+        *,
+        then_stage: Optional[str] = None,
+        max_attempts: int = 3,
+    ) -> int:
+        """Add ``(name, url)`` jobs for ``stage``; jobs already queued are ignored. Returns how many were added."""
+
+    @abc.abstractmethod
+    def claim(
+        self,
+        owner: str,
+        stages: Sequence[str],
+        *,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ) -> Optional[WorkItem]:
+        """Lease the oldest pending job of one of ``stages`` to ``owner``, or return ``None``."""
+
+    @abc.abstractmethod
+    def heartbeat(self, item: WorkItem, *, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """
+        Extend the lease; ``False`` means it was lost and the result will be rejected.
+
+        A lease that ran out but was not yet given to another worker can still be renewed.
+        """
+
+    @abc.abstractmethod
+    def complete(self, item: WorkItem, result: str) -> bool:
+        """
+        Record ``result`` and finish the job in one transaction.
+
+        When the job has a ``then_stage`` and a non-empty result, the follow-up
+        job ``(name, result)`` is queued in the same transaction.
+        """
+
+    @abc.abstractmethod
+    def fail(self, item: WorkItem, error: str, *, retry: bool = True) -> bool:
+        """Give the job back to the queue (if ``retry`` and attempts remain) or mark it failed."""
+
+    @abc.abstractmethod
+    def counts(self) -> Dict[Tuple[str, str], int]:
+        """Number of jobs per ``(stage, status)``."""
+
+    def has_unfinished(self, stages: Optional[Sequence[str]] = None) -> bool:
+        """Whether any job of ``stages`` (default: every stage) is still pending or leased."""
+        return any(
+            count
+            for (stage, status), count in self.counts().items()
+            if status in ("pending", "leased") and (stages is None or stage in stages)
+        )
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    :class:`WorkQueue` stored in a SQLite file.
+
+    Uses the rollback journal rather than WAL because WAL's shared-memory
+    index does not work across machines on a network filesystem; every
+    state change is a short ``BEGIN IMMEDIATE`` transaction. Lease expiry
+    compares wall-clock times, so nodes need reasonably synchronized clocks.
+    """
+
+    def __init__(self, path: os.PathLike) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    then_stage TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (stage, name, url)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (stage, status, id)")
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(
+        self,
+        stage: str,
+        jobs: Iterable[Tuple[str, str]],
+        *,
+        then_stage: Optional[str] = None,
+        max_attempts: int = 3,
+    ) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (stage, name, url, then_stage, max_attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((stage, name, url, then_stage, max_attempts, now) for name, url in jobs),
+            )
+            return conn.total_changes - before
+
+    def claim(
+        self,
+        owner: str,
+        stages: Sequence[str],
+        *,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ) -> Optional[WorkItem]:
+        now = time.time()
+        placeholders = ", ".join("?" for _ in stages)
+        with self._transaction() as conn:
+            self._expire_leases(conn, now)
+            row = conn.execute(
+                f"SELECT id, stage, name, url, attempts, max_attempts, then_stage FROM jobs "
+                f"WHERE status = 'pending' AND stage IN ({placeholders}) ORDER BY id LIMIT 1",
+                tuple(stages),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (owner, now + lease_seconds, now, row[0]),
+            )
+        job_id, stage, name, url, attempts, max_attempts, then_stage = row
+        return WorkItem(job_id, stage, name, url, attempts + 1, max_attempts, then_stage, owner)
+
+    def _expire_leases(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', lease_owner = NULL, updated_at = ?, "
+            "error = 'lease expired after ' || attempts || ' attempts' "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+            (now, now),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'pending', lease_owner = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (now, now),
+        )
+
+    def heartbeat(self, item: WorkItem, *, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + lease_seconds, now, item.id, item.owner),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, item: WorkItem, result: str) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (result, now, item.id, item.owner),
+            )
+            if cursor.rowcount != 1:
+                return False
+            if item.then_stage and result:
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs (stage, name, url, max_attempts, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (item.then_stage, item.name, result, item.max_attempts, now),
+                )
+            return True
+
+    def fail(self, item: WorkItem, error: str, *, retry: bool = True) -> bool:
+        status = "pending" if retry and item.attempts < item.max_attempts else "failed"
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (status, error, time.time(), item.id, item.owner),
+            )
+            return cursor.rowcount == 1
+
+    def counts(self) -> Dict[Tuple[str, str], int]:
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, now)
+            rows = conn.execute("SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status").fetchall()
+        return {(stage, status): count for stage, status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
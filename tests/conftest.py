@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Tuple, Union
+
+import pytest
+
+Route = Union[str, bytes, Tuple[int, Dict[str, str], bytes]]
+
+
+class LocalServer:
+    """``http.server`` on a free port that answers from a ``path -> response`` table, optionally after a delay."""
+
+    def __init__(self) -> None:
+        self.routes: Dict[str, Route] = {}
+        self.delays: Dict[str, float] = {}
+        self.hits: Dict[str, int] = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # noqa: N802
+                server.hits[self.path] = server.hits.get(self.path, 0) + 1
+                time.sleep(server.delays.get(self.path, 0))
+                route = server.routes.get(self.path)
+                if route is None:
+                    status, headers, body = 404, {}, b"not found"
+                elif isinstance(route, tuple):
+                    status, headers, body = route
+                else:
+                    status, headers, body = 200, {}, route.encode() if isinstance(route, str) else route
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args: object) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def server() -> Iterator[LocalServer]:
+    local = LocalServer()
+    try:
+        yield local
+    finally:
+        local.close()
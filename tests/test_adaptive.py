@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import pytest
+
+from download_m3u8.adaptive import is_throttle
+from download_m3u8.httpclient import HttpError
+from download_m3u8.progress import FfmpegError
+
+from test_retry import FFMPEG_STDERR
+
+
+@pytest.mark.parametrize("status, throttle", [(403, False), (404, False), (408, False), (429, True), (503, True)])
+def test_ffmpeg_throttle_statuses(status, throttle):
+    assert is_throttle(FfmpegError(8, FFMPEG_STDERR[status])) is throttle
+
+
+def test_http_error_throttle():
+    assert is_throttle(HttpError("https://cdn.example.com/a.ts", 429))
+    assert not is_throttle(HttpError("https://cdn.example.com/a.ts", 500))
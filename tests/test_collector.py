@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from download_m3u8.capture import CapturedRequest
+from download_m3u8.collector import _extract_from_page
+from download_m3u8.driver_pool import PooledDriver
+
+
+class _SlowPage:
+    """A page that takes ``load_seconds`` to load and whose player requests ``stream_url`` shortly after."""
+
+    def __init__(self, load_seconds: float, stream_url: str) -> None:
+        self.load_seconds = load_seconds
+        self.stream_url = stream_url
+        self.pooled: PooledDriver
+
+    def get(self, _url: str) -> None:
+        time.sleep(self.load_seconds)
+        threading.Timer(0.1, self._player_request).start()
+
+    def _player_request(self) -> None:
+        with self.pooled._pending_lock:
+            self.pooled._pending.append(CapturedRequest(self.stream_url, {"status": 200}))
+
+    def execute_script(self, _script: str) -> list:
+        return []
+
+
+def test_watch_window_starts_after_page_load():
+    stream_url = "https://cdn.jwplayer.com/manifests/AbCd1234.m3u8"
+    page = _SlowPage(load_seconds=0.5, stream_url=stream_url)
+    pooled = PooledDriver(driver=page)  # type: ignore[arg-type]
+    page.pooled = pooled
+
+    capture = _extract_from_page(pooled, "https://example.com/session", wait_timeout=0.4, poll_interval=0.02)
+
+    assert capture.m3u8_url == stream_url
+    assert capture.candidates == [stream_url]
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+from download_m3u8.downloader import download_aac_from_m3u8, download_from_csv
+from download_m3u8.httpclient import HttpClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from fixtures import generate_hls_stream  # noqa: E402
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is needed to generate the stream")
+
+MASTER = (
+    "#EXTM3U\n"
+    '#EXT-X-STREAM-INF:BANDWIDTH=140000,CODECS="mp4a.40.2"\n'
+    "audio/audio.m3u8\n"
+    '#EXT-X-STREAM-INF:BANDWIDTH=2000000,CODECS="avc1.64001f,mp4a.40.2",RESOLUTION=1280x720\n'
+    "video/audio.m3u8\n"
+)
+
+
+@pytest.fixture(scope="module")
+def stream_dir(tmp_path_factory) -> Path:
+    master = generate_hls_stream(tmp_path_factory.mktemp("media"), "talk", duration=8, segment_seconds=4)
+    return master.parent
+
+
+@pytest.mark.parametrize("prefer_audio_only, variant, other", [(True, "audio", "video"), (False, "video", "audio")])
+def test_native_engine_follows_rendition_preference(
+    server, stream_dir, tmp_path, monkeypatch, prefer_audio_only, variant, other
+):
+    # Both variants serve the same audio; only the playlist that gets fetched tells them apart.
+    server.routes["/talk/master.m3u8"] = MASTER
+    for name in ("audio", "video"):
+        for path in stream_dir.glob("*.ts"):
+            server.routes[f"/talk/{name}/{path.name}"] = path.read_bytes()
+        server.routes[f"/talk/{name}/audio.m3u8"] = (stream_dir / "audio.m3u8").read_bytes()
+    monkeypatch.chdir(tmp_path)
+
+    with HttpClient() as client:
+        success, _name = download_aac_from_m3u8(
+            f"{server.url}/talk/master.m3u8",
+            "talk",
+            output_dir=str(tmp_path / "out"),
+            engine="native",
+            http_client=client,
+            prefer_audio_only=prefer_audio_only,
+        )
+    assert success
+    assert server.hits.get(f"/talk/{variant}/audio.m3u8")
+    assert not server.hits.get(f"/talk/{other}/audio.m3u8")
+
+
+def _serve_talk(server, stream_dir: Path) -> str:
+    for path in stream_dir.iterdir():
+        server.routes[f"/talk/{path.name}"] = path.read_bytes()
+    return f"{server.url}/talk/audio.m3u8"
+
+
+def _download_csv(tmp_path: Path, m3u8_url: str):
+    csv_path = tmp_path / "tasks.csv"
+    csv_path.write_text(f"file,m3u8\ntalk,{m3u8_url}\n", encoding="utf-8")
+    return download_from_csv(str(csv_path), output_dir=str(tmp_path / "out"), engine="native", max_retries=1)
+
+
+def test_mismatched_output_survives_a_dead_row(server, stream_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert _download_csv(tmp_path, _serve_talk(server, stream_dir)).successful == 1
+    output = tmp_path / "out" / "talk.aac"
+    original = output.read_bytes()
+
+    # The row now points at another source whose URL is already dead: preflight fails it.
+    stats = _download_csv(tmp_path, f"{server.url}/expired/audio.m3u8")
+
+    assert stats.failed == 1
+    assert output.read_bytes() == original
+
+
+def test_damaged_output_is_downloaded_again(server, stream_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    url = _serve_talk(server, stream_dir)
+    assert _download_csv(tmp_path, url).successful == 1
+    output = tmp_path / "out" / "talk.aac"
+    original = output.read_bytes()
+    output.write_bytes(original[: len(original) // 2])
+
+    stats = _download_csv(tmp_path, url)
+
+    assert (stats.successful, stats.skipped) == (1, 0)
+    assert output.read_bytes() == original
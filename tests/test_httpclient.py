@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import pytest
+
+from download_m3u8.httpclient import HttpClient, HttpError, TooManyRedirects
+from download_m3u8.retry import is_transient
+
+
+def test_follows_redirects(server):
+    server.routes["/old"] = (302, {"Location": "/new"}, b"")
+    server.routes["/new"] = "moved here"
+    with HttpClient() as client:
+        response = client.get(f"{server.url}/old")
+    assert response.status == 200
+    assert response.text == "moved here"
+
+
+def test_redirect_loop_raises_too_many_redirects(server):
+    server.routes["/a"] = (301, {"Location": "/b"}, b"")
+    server.routes["/b"] = (301, {"Location": "/a"}, b"")
+    with HttpClient(max_redirects=3) as client:
+        with pytest.raises(TooManyRedirects) as info:
+            client.get(f"{server.url}/a")
+    assert not isinstance(info.value, HttpError)
+    assert info.value.redirects == 3
+    assert info.value.url == f"{server.url}/a"
+    assert not is_transient(info.value)
+    assert server.hits["/a"] + server.hits["/b"] == 4
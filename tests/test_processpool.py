@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import os
+import signal
+import threading
+import time
+from typing import Callable
+
+from download_m3u8.processpool import ResolverProcessPool, WorkerConfig
+
+PLAYLIST = "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=140000\naudio.m3u8\n"
+
+
+def _serve_rows(server, count: int) -> list:
+    rows = []
+    for idx in range(count):
+        server.routes[f"/session/{idx}"] = f'<video src="{server.url}/media/{idx}/index.m3u8"></video>'
+        server.routes[f"/media/{idx}/index.m3u8"] = PLAYLIST
+        rows.append((idx, f"{server.url}/session/{idx}", f"row{idx}"))
+    return rows
+
+
+def _in_background(target: Callable[[], None]) -> threading.Thread:
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def _run(pool: ResolverProcessPool, rows: list) -> dict:
+    return {task[0]: (result, error) for task, result, error in pool.run(rows)}
+
+
+def _config(total: int) -> WorkerConfig:
+    return WorkerConfig(total=total, use_cache=False, max_retries=1)
+
+
+def test_row_of_worker_killed_mid_task_is_retried_then_failed(server):
+    rows = _serve_rows(server, 3)
+    server.delays["/session/0"] = 10
+    pool = ResolverProcessPool(1, config=_config(len(rows)))
+
+    def kill_whoever_loads_row_0() -> None:
+        for attempt in (1, 2):
+            while server.hits.get("/session/0", 0) < attempt:
+                time.sleep(0.05)
+            (pid,) = list(pool._workers)
+            os.kill(pid, signal.SIGKILL)
+
+    killer = _in_background(kill_whoever_loads_row_0)
+    with pool:
+        outcomes = _run(pool, rows)
+    killer.join(timeout=5)
+
+    assert outcomes[0] == ("", "worker process died")
+    assert outcomes[1] == (f"{server.url}/media/1/index.m3u8", "")
+    assert outcomes[2] == (f"{server.url}/media/2/index.m3u8", "")
+    assert server.hits["/session/0"] == 2
+
+
+def test_row_of_worker_killed_before_reading_it_goes_to_the_replacement(server):
+    rows = _serve_rows(server, 2)
+    pool = ResolverProcessPool(1, config=_config(len(rows)))
+
+    def kill_first_worker_while_starting() -> None:
+        while not pool._workers:
+            time.sleep(0.001)
+        os.kill(next(iter(pool._workers)), signal.SIGKILL)
+
+    killer = _in_background(kill_first_worker_while_starting)
+    with pool:
+        outcomes = _run(pool, rows)
+    killer.join(timeout=5)
+
+    assert outcomes == {idx: (f"{server.url}/media/{idx}/index.m3u8", "") for idx in range(2)}
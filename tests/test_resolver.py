@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import contextlib
+import urllib.request
+from typing import Iterator, List
+
+from download_m3u8.collector import get_m3u8_url
+from download_m3u8.driver_pool import PooledDriver
+from download_m3u8.resolver import _media_id_to_manifest, extract_candidates, resolve_via_http
+
+PLAYLIST = "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=140000\naudio.m3u8\n"
+
+
+def _page(body: str) -> str:
+    return f"<html><head><title>Session</title></head><body>{body}</body></html>"
+
+
+def test_regex_finds_escaped_m3u8_in_inline_script(server):
+    escaped = f"{server.url}/hls/stream.m3u8?token=abc".replace("/", "\\/")
+    server.routes["/session"] = _page(f'<script>var player = {{"src": "{escaped}"}};</script>')
+    server.routes["/hls/stream.m3u8?token=abc"] = PLAYLIST
+    assert resolve_via_http(f"{server.url}/session") == f"{server.url}/hls/stream.m3u8?token=abc"
+
+
+def test_json_ld_content_url(server):
+    server.routes["/session"] = _page(
+        '<script type="application/ld+json">'
+        f'{{"@context": "https://schema.org", "@type": "VideoObject", "contentUrl": "{server.url}/vod/master.m3u8"}}'
+        "</script>"
+    )
+    server.routes["/vod/master.m3u8"] = PLAYLIST
+    assert resolve_via_http(f"{server.url}/session") == f"{server.url}/vod/master.m3u8"
+
+
+def test_json_ld_jwplayer_embed_url():
+    page = _page(
+        '<script type="application/ld+json">'
+        '{"@type": "VideoObject", "embedUrl": "https://cdn.jwplayer.com/players/AbCd1234-XyZw9876.html"}'
+        "</script>"
+    )
+    assert extract_candidates(page)[0] == _media_id_to_manifest("AbCd1234")
+
+
+def test_jwplayer_setup_file(server):
+    server.routes["/session"] = _page(
+        '<div id="player"></div><script>'
+        f'jwplayer("player").setup({{file: "{server.url}/jw/index.m3u8", width: "100%", tracks: [{{}}]}});'
+        "</script>"
+    )
+    server.routes["/jw/index.m3u8"] = PLAYLIST
+    assert resolve_via_http(f"{server.url}/session") == f"{server.url}/jw/index.m3u8"
+
+
+def test_jwplayer_setup_media_id(server):
+    server.routes["/session"] = _page(
+        '<script>jwplayer("player").setup({"playlist": "https://cdn.jwplayer.com/v2/media/AbCd1234"});</script>'
+    )
+    assert resolve_via_http(f"{server.url}/session", verify=False) == _media_id_to_manifest("AbCd1234")
+
+
+def test_candidate_that_is_not_a_playlist_is_skipped(server):
+    server.routes["/session"] = _page(
+        f'<a href="{server.url}/media/broken.m3u8">a</a> <a href="{server.url}/other/good.m3u8">b</a>'
+    )
+    server.routes["/media/broken.m3u8"] = "<html>expired</html>"
+    server.routes["/other/good.m3u8"] = PLAYLIST
+    assert resolve_via_http(f"{server.url}/session") == f"{server.url}/other/good.m3u8"
+    assert server.hits["/media/broken.m3u8"] == 1
+
+
+def test_page_error_returns_none(server):
+    assert resolve_via_http(f"{server.url}/missing") is None
+
+
+class _FakeBrowser:
+    """Stands in for Chrome: loads the page and "plays" it by requesting the stream URL it was given."""
+
+    def __init__(self, stream_urls: List[str]) -> None:
+        self.stream_urls = stream_urls
+        self.loaded: List[str] = []
+        self.pooled: PooledDriver
+
+    def get(self, url: str) -> None:
+        with urllib.request.urlopen(url) as response:
+            response.read()
+        self.loaded.append(url)
+        for stream_url in self.stream_urls:
+            with urllib.request.urlopen(stream_url) as response:
+                self.pooled._on_response(_Request(stream_url), _Response(response.status))
+
+    def execute_script(self, _script: str) -> list:
+        return []
+
+
+class _Request:
+    def __init__(self, url: str) -> None:
+        self.url = url
+
+
+class _Response:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+
+
+class _FakePool:
+    def __init__(self, browser: _FakeBrowser) -> None:
+        self.pooled = PooledDriver(driver=browser)  # type: ignore[arg-type]
+        browser.pooled = self.pooled
+        self.leases = 0
+
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[PooledDriver]:
+        self.leases += 1
+        yield self.pooled
+
+
+def test_browser_fallback_when_markup_has_no_candidate(server):
+    # The player builds the URL at runtime, so only the network traffic reveals it.
+    server.routes["/session"] = _page('<script src="/player.js"></script>')
+    server.routes["/media/abc/index.m3u8"] = PLAYLIST
+    browser = _FakeBrowser([f"{server.url}/media/abc/index.m3u8"])
+    pool = _FakePool(browser)
+
+    found = get_m3u8_url(f"{server.url}/session", pool=pool, wait_timeout=2, poll_interval=0.01)
+
+    assert found == f"{server.url}/media/abc/index.m3u8"
+    assert pool.leases == 1
+    assert browser.loaded == [f"{server.url}/session"]
+    assert server.hits["/session"] == 2  # once by the HTTP stage, once by the browser
+
+
+def test_browser_not_used_when_http_stage_resolves(server):
+    server.routes["/session"] = _page(f'<video src="{server.url}/media/abc/index.m3u8"></video>')
+    server.routes["/media/abc/index.m3u8"] = PLAYLIST
+    pool = _FakePool(_FakeBrowser([]))
+
+    assert get_m3u8_url(f"{server.url}/session", pool=pool) == f"{server.url}/media/abc/index.m3u8"
+    assert pool.leases == 0
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from download_m3u8.progress import FfmpegError
+from download_m3u8.retry import is_transient
+
+# stderr of ffmpeg 7.0.2 opening an HLS URL that answers with the given status.
+FFMPEG_STDERR = {
+    status: (
+        f"[http @ 0x195a1640] HTTP error {status} {reason}\n"
+        f"[in#0 @ 0x195a0ac0] Error opening input: {message}\n"
+        "Error opening input file https://cdn.example.com/audio.m3u8.\n"
+        f"Error opening input files: {message}\n"
+    )
+    for status, reason, message in (
+        (403, "Forbidden", "Server returned 403 Forbidden (access denied)"),
+        (404, "Not Found", "Server returned 404 Not Found"),
+        (408, "Request Timeout", "Server returned 4XX Client Error, but not one of 40{0,1,3,4}"),
+        (410, "Gone", "Server returned 4XX Client Error, but not one of 40{0,1,3,4}"),
+        (429, "Too Many Requests", "Server returned 4XX Client Error, but not one of 40{0,1,3,4}"),
+        (503, "Service Unavailable", "Server returned 5XX Server Error reply"),
+    )
+}
+
+
+@pytest.mark.parametrize(
+    "status, transient",
+    [(403, False), (404, False), (408, True), (410, False), (429, True), (503, True)],
+)
+def test_ffmpeg_http_errors(status, transient):
+    error = FfmpegError(8, FFMPEG_STDERR[status])
+    assert error.http_statuses == {status}
+    assert is_transient(error) is transient
+
+
+def test_ffmpeg_generic_message_without_http_error_line():
+    # With -loglevel error only the generic message is printed.
+    assert not is_transient(FfmpegError(8, "Server returned 4XX Client Error, but not one of 40{0,1,3,4}\n"))
+    assert is_transient(FfmpegError(8, "Server returned 5XX Server Error reply\n"))
+    assert is_transient(FfmpegError(8, "Connection reset by peer\n"))
+    assert not is_transient(FfmpegError(1, "Invalid data found when processing input\n"))
+
+
+def test_stalled_ffmpeg_is_transient():
+    assert is_transient(FfmpegError(-9, FFMPEG_STDERR[404], stalled=True))
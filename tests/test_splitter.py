@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+from download_m3u8 import splitter
+from download_m3u8.hls import MediaPlaylist, Segment
+from download_m3u8.progress import ProgressTracker
+from download_m3u8.scheduler import DownloadSlots, run_fair
+
+HOST = "cdn.example.com"
+
+
+class _FakeFfmpeg:
+    """Stands in for the range ffmpeg runs and records how many overlap."""
+
+    def __init__(self, seconds: float = 0.3) -> None:
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, cmd, *, name, tracker, stall_timeout):
+        with self._lock:
+            self.running += 1
+            self.calls += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        output = re.findall(r'"([^"]+)"', cmd)[-1]
+        with open(output, "wb") as handle:
+            handle.write(b"range")
+        with self._lock:
+            self.running -= 1
+        return 0, "", False
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    fake = _FakeFfmpeg()
+    monkeypatch.setattr(splitter, "run_ffmpeg_with_progress", fake)
+
+    def concat(cmd, **_kwargs):
+        with open(cmd[-1], "wb") as handle:
+            handle.write(b"joined")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(splitter.subprocess, "run", concat)
+    return fake
+
+
+def _playlist() -> MediaPlaylist:
+    segments = [Segment(f"https://{HOST}/seg_{number:03d}.ts", 10.0, number) for number in range(8)]
+    return MediaPlaylist(f"https://{HOST}/index.m3u8", segments, target_duration=10.0, endlist=True)
+
+
+def _split(tmp_path, slots=None, name="long.aac"):
+    output = tmp_path / name
+    splitter.download_split(_playlist(), output, chunks=4, name=name, tracker=ProgressTracker(), slots=slots, host=HOST)
+    return output
+
+
+def test_ranges_run_in_parallel_without_slots(tmp_path, ffmpeg):
+    output = _split(tmp_path)
+    assert output.read_bytes() == b"joined"
+    assert ffmpeg.calls == 4
+    assert ffmpeg.peak == 4
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_concat_handles_quotes_in_output_name(tmp_path, monkeypatch):
+    chunk = tmp_path / "tone.aac"
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=1",
+         "-c:a", "aac", "-b:a", "64k", "-f", "adts", str(chunk)],
+        check=True,
+    )
+
+    def fetch(cmd, *, name, tracker, stall_timeout):
+        shutil.copyfile(chunk, re.findall(r'"([^"]+)"', cmd)[-1])
+        return 0, "", False
+
+    monkeypatch.setattr(splitter, "run_ffmpeg_with_progress", fetch)
+    output = _split(tmp_path, name="Institutional: Predictions and What's Next.aac")
+    assert output.read_bytes() == chunk.read_bytes() * 4
+    assert not output.with_name(output.name + ".chunks").exists()
+
+
+@pytest.mark.parametrize(
+    "slots, peak",
+    [
+        (DownloadSlots(2), 2),
+        (DownloadSlots(8, per_host_limit=3), 3),
+        (DownloadSlots(1), 1),
+    ],
+)
+def test_ranges_take_free_slots_only(tmp_path, ffmpeg, slots, peak):
+    assert slots.try_acquire(HOST)  # the slot run_fair gave the job itself
+    output = _split(tmp_path, slots)
+    assert output.read_bytes() == b"joined"
+    assert ffmpeg.calls == 4
+    assert ffmpeg.peak == peak
+    assert len(slots) == 1
+
+
+def test_ranges_follow_adaptive_limit(tmp_path, ffmpeg):
+    class Controller:
+        limit = 2
+
+    slots = DownloadSlots(8, controller=Controller())
+    assert slots.try_acquire(HOST)
+    _split(tmp_path, slots)
+    assert ffmpeg.peak == 2
+
+
+def test_run_fair_counts_slots_taken_outside():
+    slots = DownloadSlots(3, per_host_limit=2)
+    assert slots.try_acquire("a.example.com")  # e.g. a split range of an earlier job
+    running = {"count": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def worker(job):
+        with lock:
+            running["count"] += 1
+            running["peak"] = max(running["peak"], running["count"])
+        time.sleep(0.1)
+        with lock:
+            running["count"] -= 1
+        return job
+
+    jobs = [("a.example.com", number) for number in range(4)] + [("b.example.com", number) for number in range(4)]
+    results = asyncio.run(run_fair(jobs, worker, host=lambda job: job[0], max_concurrency=3, slots=slots))
+    assert sorted(results) == sorted(jobs)
+    assert running["peak"] == 2
+    assert len(slots) == 1
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import csv
+
+import pytest
+
+from download_m3u8.journal import ResultJournal, journal_path_for
+from download_m3u8.sources import ResultSink, TaskSource
+from download_m3u8.tasks import process_csv
+
+PLAYLIST = "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=140000\naudio.m3u8\n"
+
+
+class _Crash(Exception):
+    pass
+
+
+def _write_tasks(server, path, count: int) -> str:
+    lines = ["name,url"]
+    for idx in range(count):
+        server.routes[f"/session/{idx}"] = f'<video src="{server.url}/media/{idx}/index.m3u8"></video>'
+        server.routes[f"/media/{idx}/index.m3u8"] = PLAYLIST
+        lines.append(f"row{idx},{server.url}/session/{idx}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path.read_text(encoding="utf-8")
+
+
+def test_interrupted_run_leaves_output_alone_and_resumes_from_journal(server, tmp_path):
+    tasks = tmp_path / "tasks.csv"
+    original = _write_tasks(server, tasks, 6)
+    resolved = []
+
+    def crash_after_four(idx: int, _name: str, _m3u8: str) -> None:
+        resolved.append(idx)
+        if len(resolved) == 4:
+            raise _Crash()
+
+    with pytest.raises(_Crash):
+        process_csv(str(tasks), max_workers=1, save_interval=2, use_cache=False, on_resolved=crash_after_four)
+
+    # save_interval only flushed the temporary output; the destination (here the input) is untouched.
+    assert tasks.read_text(encoding="utf-8") == original
+    assert not tasks.with_name("tasks.csv.tmp").exists()
+    assert sorted(ResultJournal(journal_path_for(tasks)).replay()) == [0, 1, 2, 3]
+
+    process_csv(str(tasks), max_workers=1, save_interval=2, use_cache=False)
+
+    with open(tasks, encoding="utf-8", newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    assert [row["m3u8"] for row in rows] == [f"{server.url}/media/{idx}/index.m3u8" for idx in range(6)]
+    assert [server.hits[f"/session/{idx}"] for idx in range(6)] == [1] * 6
+    assert not journal_path_for(tasks).exists()
+
+
+def test_bases_are_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        TaskSource(tmp_path / "tasks.csv")  # type: ignore[abstract]
+    with pytest.raises(TypeError):
+        ResultSink(tmp_path / "out.csv", ["name"])  # type: ignore[abstract]
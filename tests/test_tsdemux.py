@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from download_m3u8.native import remux_to_aac
+from download_m3u8.tsdemux import TS_PACKET_SIZE, DemuxUnsupported, demux_to_adts
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from fixtures import generate_hls_stream  # noqa: E402
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is needed to generate the streams")
+
+AUDIO_PID = 0x100  # what ffmpeg's mpegts muxer assigns to the first stream
+
+Frame = Tuple[int, int, bytes]
+
+
+def adts_frames(data: bytes) -> List[Frame]:
+    """Split an ADTS stream into ``(sample rate index, channel config, raw AAC payload)`` frames."""
+    frames = []
+    offset = 0
+    while offset < len(data):
+        header = data[offset : offset + 9]
+        assert len(header) >= 7 and header[0] == 0xFF and header[1] & 0xF6 == 0xF0, f"no ADTS frame at {offset}"
+        header_length = 7 if header[1] & 0x01 else 9
+        length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+        rate_index = (header[2] >> 2) & 0x0F
+        channels = ((header[2] & 0x01) << 2) | (header[3] >> 6)
+        frames.append((rate_index, channels, data[offset + header_length : offset + length]))
+        offset += length
+    return frames
+
+
+def _segments(master: Path) -> List[Path]:
+    return sorted(master.parent.glob("seg_*.ts"))
+
+
+def _demux(segments: List[Path], output: Path) -> bytes:
+    demux_to_adts(segments, output)
+    return output.read_bytes()
+
+
+def _audio_packets(data: bytes) -> List[int]:
+    """Offsets of the audio packets that carry a payload."""
+    return [
+        start
+        for start in range(0, len(data), TS_PACKET_SIZE)
+        if ((data[start + 1] & 0x1F) << 8) | data[start + 2] == AUDIO_PID and data[start + 3] & 0x10
+    ]
+
+
+@pytest.mark.parametrize(
+    "sample_rate, channels, bitrate, segment_seconds",
+    [(44100, 1, "128k", 4.0), (48000, 2, "96k", 6.0), (22050, 1, "32k", 2.0)],
+)
+def test_ts_matches_ffmpeg(tmp_path, sample_rate, channels, bitrate, segment_seconds):
+    master = generate_hls_stream(
+        tmp_path, "ts", duration=12, segment_seconds=segment_seconds, bitrate=bitrate,
+        sample_rate=sample_rate, channels=channels,
+    )
+    ours = _demux(_segments(master), tmp_path / "builtin.aac")
+
+    spool = tmp_path / "spool.ts"
+    spool.write_bytes(b"".join(segment.read_bytes() for segment in _segments(master)))
+    remux_to_aac(spool, tmp_path / "ffmpeg.aac")
+    # Same audio frames; ffmpeg may rewrite the ADTS headers (e.g. drop CRCs).
+    assert adts_frames(ours) == adts_frames((tmp_path / "ffmpeg.aac").read_bytes())
+
+
+def _id3_timestamp_tag(pts: int) -> bytes:
+    """ID3v2.4 tag with the PRIV timestamp frame that starts every packed-audio segment."""
+
+    def syncsafe(value: int) -> bytes:
+        return bytes(((value >> shift) & 0x7F) for shift in (21, 14, 7, 0))
+
+    data = b"com.apple.streaming.transportStreamTimestamp\x00" + pts.to_bytes(8, "big")
+    frame = b"PRIV" + syncsafe(len(data)) + b"\x00\x00" + data
+    return b"ID3\x04\x00\x00" + syncsafe(len(frame)) + frame
+
+
+def test_packed_audio_strips_id3_tags(tmp_path):
+    source = tmp_path / "source.aac"
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=330:duration=8",
+            "-ar", "44100", "-ac", "2", "-c:a", "aac", "-b:a", "128k", "-f", "adts", str(source),
+        ],
+        check=True,
+    )
+    data = source.read_bytes()
+    frames = adts_frames(data)
+    segments = []
+    offset = 0
+    for number, start in enumerate(range(0, len(frames), 100)):
+        size = sum(len(payload) + 7 for _, _, payload in frames[start : start + 100])
+        segment = tmp_path / f"seg_{number:05d}.aac"
+        segment.write_bytes(_id3_timestamp_tag(start * 1024 * 90000 // 44100) + data[offset : offset + size])
+        segments.append(segment)
+        offset += size
+    assert offset == len(data), "fixture assumes 7-byte ADTS headers"
+
+    assert _demux(segments, tmp_path / "builtin.aac") == data
+
+
+def test_mp2_is_refused(tmp_path):
+    master = generate_hls_stream(tmp_path, "mp2", duration=4, bitrate="128k", codec="mp2")
+    with pytest.raises(DemuxUnsupported, match="MPEG-1 audio"):
+        demux_to_adts(_segments(master), tmp_path / "out.aac")
+
+
+@pytest.fixture
+def stream(tmp_path) -> Tuple[List[Path], bytes]:
+    master = generate_hls_stream(tmp_path / "media", "ts", duration=8, segment_seconds=4)
+    segments = _segments(master)
+    return segments, _demux(segments, tmp_path / "reference.aac")
+
+
+def _rewrite(segment: Path, data: bytearray) -> List[Path]:
+    segment.write_bytes(bytes(data))
+    return sorted(segment.parent.glob("seg_*.ts"))
+
+
+def test_duplicate_packets_are_dropped(stream, tmp_path):
+    segments, reference = stream
+    data = bytearray(segments[0].read_bytes())
+    audio = _audio_packets(data)
+    # Repeat a PES start packet and a continuation packet, each right after the original.
+    for start in sorted((audio[0], audio[5]), reverse=True):
+        data[start + TS_PACKET_SIZE : start + TS_PACKET_SIZE] = data[start : start + TS_PACKET_SIZE]
+
+    assert _demux(_rewrite(segments[0], data), tmp_path / "out.aac") == reference
+
+
+def _pes_start_with_adaptation_field(data: bytearray, audio: List[int]) -> int:
+    return next(
+        start
+        for start in audio[1:]
+        if data[start + 1] & 0x40 and data[start + 3] & 0x20 and data[start + 4] > 0
+    )
+
+
+def _jump_counters(data: bytearray, audio: List[int], first: int, by: int) -> None:
+    for start in audio:
+        if start >= first:
+            data[start + 3] = (data[start + 3] & 0xF0) | ((data[start + 3] + by) & 0x0F)
+
+
+def test_signalled_discontinuity_resets_continuity(stream, tmp_path):
+    segments, reference = stream
+    data = bytearray(segments[0].read_bytes())
+    audio = _audio_packets(data)
+    jump = _pes_start_with_adaptation_field(data, audio)
+    _jump_counters(data, audio, jump, 5)
+    data[jump + 5] |= 0x80  # discontinuity_indicator
+
+    assert _demux(_rewrite(segments[0], data), tmp_path / "out.aac") == reference
+
+
+def test_unsignalled_continuity_gap_is_refused(stream, tmp_path):
+    segments, _reference = stream
+    data = bytearray(segments[0].read_bytes())
+    audio = _audio_packets(data)
+    _jump_counters(data, audio, _pes_start_with_adaptation_field(data, audio), 5)
+
+    with pytest.raises(DemuxUnsupported, match="continuity gap"):
+        demux_to_adts(_rewrite(segments[0], data), tmp_path / "out.aac")
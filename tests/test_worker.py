@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from download_m3u8.index import DownloadIndex
+from download_m3u8.worker import STAGING_DIRNAME, run_worker
+from download_m3u8.workqueue import SqliteWorkQueue, WorkQueue
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from fixtures import generate_hls_stream  # noqa: E402
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is needed to generate the stream")
+
+
+@pytest.fixture(scope="module")
+def stream_dir(tmp_path_factory) -> Path:
+    master = generate_hls_stream(tmp_path_factory.mktemp("media"), "talk", duration=12, segment_seconds=4)
+    return master.parent
+
+
+def _serve_stream(server, stream_dir: Path) -> str:
+    for path in stream_dir.iterdir():
+        server.routes[f"/talk/{path.name}"] = path.read_bytes()
+    return f"{server.url}/talk/audio.m3u8"
+
+
+def _run(queue_path: Path, output_dir: Path, *, stages=("download",), **options):
+    return run_worker(
+        str(queue_path),
+        stages=list(stages),
+        worker_id="node-a:1",
+        download_workers=1,
+        output_dir=str(output_dir),
+        engine="native",
+        max_retries=1,
+        use_cache=False,
+        **options,
+    )
+
+
+def _job(queue_path: Path, column: str):
+    with sqlite3.connect(str(queue_path)) as conn:
+        return conn.execute(f"SELECT {column} FROM jobs").fetchone()
+
+
+def test_download_is_published_after_complete(server, stream_dir, tmp_path):
+    url = _serve_stream(server, stream_dir)
+    queue_path = tmp_path / "queue.sqlite"
+    with SqliteWorkQueue(queue_path) as queue:
+        queue.enqueue("download", [("talk", url)])
+
+    counts = _run(queue_path, tmp_path / "out")
+
+    assert counts == {("download", "done"): 1}
+    output = tmp_path / "out" / "talk.aac"
+    assert output.stat().st_size > 0
+    assert (tmp_path / "out" / "talk.aac.manifest.jsonl").exists()
+    assert not (tmp_path / "out" / STAGING_DIRNAME / "node-a_1").exists()
+    with DownloadIndex(tmp_path / "out") as index:
+        assert index.verify(output, url) is None
+
+
+def test_download_of_a_lost_lease_is_discarded(server, stream_dir, tmp_path):
+    url = _serve_stream(server, stream_dir)
+    server.delays["/talk/seg_00002.ts"] = 1.0
+    queue_path = tmp_path / "queue.sqlite"
+    with SqliteWorkQueue(queue_path) as queue:
+        queue.enqueue("download", [("talk", url)])
+
+    def take_over_while_downloading() -> None:
+        while not server.hits.get("/talk/seg_00002.ts"):
+            time.sleep(0.01)
+        with sqlite3.connect(str(queue_path)) as conn:
+            conn.execute("UPDATE jobs SET lease_expires = 0")
+        with SqliteWorkQueue(queue_path) as queue:
+            item = queue.claim("node-b:2", ["download"])
+            assert item is not None
+            queue.complete(item, "written by node-b")
+
+    thief = threading.Thread(target=take_over_while_downloading, daemon=True)
+    thief.start()
+    counts = _run(queue_path, tmp_path / "out")
+    thief.join(timeout=5)
+
+    assert counts == {("download", "done"): 1}
+    assert _job(queue_path, "result") == ("written by node-b",)
+    assert not (tmp_path / "out" / "talk.aac").exists()
+    assert not (tmp_path / "out" / STAGING_DIRNAME / "node-a_1").exists()
+
+
+def test_permanent_download_error_is_not_requeued(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # failed downloads are appended to ./error_log.txt
+    queue_path = tmp_path / "queue.sqlite"
+    with SqliteWorkQueue(queue_path) as queue:
+        queue.enqueue("download", [("gone", f"{server.url}/gone/audio.m3u8")], max_attempts=3)
+
+    counts = _run(queue_path, tmp_path / "out")
+
+    assert counts == {("download", "failed"): 1}
+    assert _job(queue_path, "attempts") == (1,)
+    assert "404" in _job(queue_path, "error")[0]
+
+
+def test_stage_worker_exits_when_its_own_stage_is_drained(tmp_path):
+    queue_path = tmp_path / "queue.sqlite"
+    with SqliteWorkQueue(queue_path) as queue:
+        queue.enqueue("download", [("talk", "https://cdn.example.com/talk.m3u8")])
+        assert queue.has_unfinished()
+        assert queue.has_unfinished(["download"])
+        assert not queue.has_unfinished(["collect"])
+
+    result = {}
+    collector = threading.Thread(
+        target=lambda: result.update(_run(queue_path, tmp_path / "out", stages=["collect"], poll_interval=0.1)),
+        daemon=True,
+    )
+    collector.start()
+    collector.join(timeout=10)
+
+    assert not collector.is_alive()
+    assert result == {("download", "pending"): 1}
+
+
+def test_work_queue_is_abstract():
+    with pytest.raises(TypeError):
+        WorkQueue()  # type: ignore[abstract]